@@ -1,6 +1,21 @@
 """AI Agents package"""
 
-from .paradigms import ReActParadigm, ReWOOParadigm
-from .types import SimpleReflexAgent, ModelBasedReflexAgent
+import importlib
+from typing import Any
+
+# Exports are imported on first access so that importing a submodule such as
+# src.agents.registry does not load every paradigm and its dependencies
+_EXPORTS = {
+    "ReActParadigm": ".paradigms",
+    "ReWOOParadigm": ".paradigms",
+    "SimpleReflexAgent": ".types",
+    "ModelBasedReflexAgent": ".types",
+}
 
 __all__ = ["ReActParadigm", "ReWOOParadigm", "SimpleReflexAgent", "ModelBasedReflexAgent"]
+
+
+def __getattr__(name: str) -> Any:
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
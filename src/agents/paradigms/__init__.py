@@ -1,7 +1,7 @@
 """AI Agent paradigms package"""
 
-from .base import BaseParadigm
+from .base import BaseParadigm, RunResult
 from .react import ReActParadigm
 from .rewoo import ReWOOParadigm
 
-__all__ = ["BaseParadigm", "ReActParadigm", "ReWOOParadigm"]
+__all__ = ["BaseParadigm", "RunResult", "ReActParadigm", "ReWOOParadigm"]
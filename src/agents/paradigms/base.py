@@ -1,24 +1,1019 @@
+import asyncio
+import json
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+from contextlib import aclosing, contextmanager, nullcontext, suppress
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Set,
+    Type,
+    TypeVar,
+)
 
-from src.clients.ollama_client import OllamaClient
+import httpx
+from pydantic import BaseModel, ValidationError
+from rich.console import Console
+
+from src.agents.tools import ToolRegistry, builtin_tools
+from src.clients.cache import make_key
+from src.clients.chat import ChatSession
+from src.clients.hedging import Hedging
+from src.clients.limiter import Overloaded, admission
+from src.clients.ollama_client import (
+    AsyncOllamaClient,
+    OllamaClient,
+    get_default_client,
+)
+from src.clients.routing import ModelRouter
+from src.clients.run_context import RunContext, RunStopped
+from src.clients.runner import run_sync
+from src.clients.semantic_cache import SemanticCache, SemanticMatch
+from src.clients.telemetry import (
+    CallTimer,
+    Telemetry,
+    TelemetryReport,
+    current_tags,
+    scope,
+)
+
+from .checkpoint import EventLog
+from .context import ContextWindow
+from .history import HistoryStore
+
+default_console = Console()
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# Built-in action that ends a run, with the final answer as its "answer" arg
+FINAL_ANSWER = "final_answer"
+
+_MISSING = object()
+
+
+class RunResult(BaseModel):
+    """Outcome of a paradigm run"""
+
+    goal: str
+    steps: List[Dict[str, Any]]
+    final_answer: str | None = None
+    plan: List[str] | None = None
+    llm_calls: int = 0
+    duration: float = 0.0
+    step_durations: List[float] = []
+    telemetry: TelemetryReport | None = None
+    # Why the run's context stopped it early ("deadline", "calls", ...)
+    stopped: str | None = None
+    # Whether the run ended because the goal was met, by a final_answer
+    # action or the completion check
+    goal_achieved: bool = False
+    # The result as processed by the agent type (see BaseAgentType)
+    outcome: Any = None
+
+
+class Completion(BaseModel):
+    """Whether the steps so far achieve the goal, and the answer if they do"""
+
+    done: bool
+    answer: str = ""
+
+
+class FieldPrinter:
+    """Print the fields of a JSON reply as soon as they close
+
+    Passed as ``on_field`` to ``_generate_model``. ``render`` formats the
+    value of each field to print; the other fields are ignored. ``header``
+    is printed before the first field. Fields that were not streamed, e.g.
+    from a cache hit, or that a repair changed are printed by ``finish``.
+    """
+
+    def __init__(
+        self,
+        console: Console,
+        render: Dict[str, Callable[[Any], str]],
+        header: str | None = None,
+    ):
+        self.console = console
+        self.render = render
+        self.header = header
+        self.shown: Dict[str, Any] = {}
+
+    def __call__(self, field: str, value: Any) -> None:
+        if field not in self.render or field in self.shown:
+            return
+        if self.header is not None and not self.shown:
+            self.console.print(self.header)
+        self.shown[field] = value
+        self.console.print(self.render[field](value))
+
+    def finish(self, fields: Dict[str, Any]) -> None:
+        """Print the final ``fields`` that were not shown as they are"""
+        for field in self.render:
+            if field in fields and self.shown.get(field, _MISSING) != fields[field]:
+                self.shown.pop(field, None)
+                self(field, fields[field])
 
 
 class BaseParadigm(ABC):
-    """Base class for reasoning paradigms"""
+    """Base class for reasoning paradigms
 
-    def __init__(self, model_name: str, language: str = "en"):
+    Paradigms are implemented with async methods (``_arun`` and friends);
+    the sync methods of the same name are thin wrappers around them.
+    """
+
+    # Tags the paradigm's LLM calls in telemetry
+    name = "paradigm"
+    # History item classes by kind, to restore items from an event log
+    item_types: Dict[str, Type[BaseModel]] = {}
+
+    def __init__(
+        self,
+        model_name: str,
+        language: str = "en",
+        llm: AsyncOllamaClient | OllamaClient | None = None,
+        options: Dict[str, Any] | None = None,
+        context_tokens: int | None = 2048,
+        chat_session: bool = False,
+        console: Console | None = None,
+        structured_output: bool = True,
+        max_repairs: int = 2,
+        tools: ToolRegistry | None = None,
+        router: ModelRouter | None = None,
+        max_history: int | None = 1000,
+        history_path: Path | str | None = None,
+        event_log: EventLog | Path | str | None = None,
+        semantic_cache: SemanticCache | None = None,
+        hedging: Hedging | None = None,
+        check_completion: bool = False,
+        summarize_at: int | None = None,
+    ):
         self.model_name = model_name
         self.language = language
-        self.history: List[Any] = []
-        self.llm = OllamaClient()
+        # Ollama model options, e.g. {"temperature": 0, "seed": 42}
+        self.options = options
+        # Compact record of every step; beyond max_history records the oldest
+        # are appended to history_path, or dropped without one
+        self.history = HistoryStore(max_records=max_history, spill_path=history_path)
+        # Every plan, item and completed step is logged here as it happens; a
+        # run given a log with events resumes after its last completed step
+        if event_log is not None and not isinstance(event_log, EventLog):
+            event_log = EventLog(event_log)
+        self.event_log = event_log
+        # Prompt view of the history, rendered incrementally within a budget;
+        # from summarize_at tokens on, older entries are summarized in the
+        # background (in the "summarize" phase, which can go to a small model)
+        self.context = ContextWindow(
+            max_tokens=context_tokens, summarize_at=summarize_at
+        )
+        self._summarizing: asyncio.Future | None = None
+        if isinstance(llm, OllamaClient):
+            llm = llm.aclient
+        # Share one pooled client across paradigms unless one is injected
+        self.llm = llm or get_default_client()
+        # In session mode each run is one append-only chat, so Ollama can
+        # reuse the prompt state of the previous call
+        self.chat_session = chat_session
+        self.chat: ChatSession | None = None
+        # Pass Console(quiet=True) to run without output
+        self.console = console or default_console
+        # Constrain JSON replies to the schema of the expected model, and
+        # re-ask up to max_repairs times for fields that are still invalid
+        self.structured_output = structured_output
+        self.max_repairs = max_repairs
+        # Actions naming a tool run locally; others are simulated by the LLM.
+        # Pass an empty ToolRegistry to simulate every action.
+        self.tools = builtin_tools() if tools is None else tools
+        # Picks the model of each call by phase (default: model_name for all)
+        # and keeps the routed models loaded
+        self.router = router
+        # Reuses replies to requests similar to earlier ones, in its phases
+        self.semantic_cache = semantic_cache
+        # Sends duplicates of structured calls that are slower than usual
+        self.hedging = hedging
+        # Ask after each step whether the goal is achieved and stop as soon as
+        # it is; the "check" phase can be routed to a small model
+        self.check_completion = check_completion
+        self._preloading: asyncio.Future | None = None
+        # Priority class of the run's LLM calls for a concurrency limiter
+        self._priority = "interactive"
+        self.llm_calls = 0
+        self.step_durations: List[float] = []
+        # Server metrics and timings of every LLM call, tagged by phase and step
+        self.telemetry = Telemetry()
 
-    @abstractmethod
-    def run(self, goal: str, max_steps: int = 5, verbose: bool = False) -> None:
+    def _print_token(self, token: str) -> None:
+        """Print a streamed token without a trailing newline"""
+        self.console.print(token, end="", markup=False, highlight=False)
+
+    @staticmethod
+    async def _confirm_continue(interactive: bool = True) -> bool:
+        """Ask the user whether to continue, without blocking the event loop
+
+        The prompt is read on a daemon thread: a thread blocked in ``input``
+        cannot be interrupted, and the default executor's threads would keep
+        the process from exiting after Ctrl-C.
+        """
+        if not interactive:
+            return True
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def settle(answer: str | None, error: BaseException | None) -> None:
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(answer)
+
+        def read() -> None:
+            answer, error = None, None
+            try:
+                answer = input("\nPress Enter to continue, or 'q' to quit: ")
+            except BaseException as e:
+                error = e
+            # The loop is closed if the run ended while waiting for the user
+            with suppress(RuntimeError):
+                loop.call_soon_threadsafe(settle, answer, error)
+
+        threading.Thread(target=read, name="confirm-continue", daemon=True).start()
+        answer = await future
+        return not answer.lower().startswith("q")
+
+    def run(
+        self,
+        goal: str,
+        max_steps: int = 5,
+        verbose: bool = False,
+        interactive: bool = True,
+        run_context: RunContext | None = None,
+    ) -> RunResult:
         """Run the paradigm"""
-        pass
+        return run_sync(self.arun(goal, max_steps, verbose, interactive, run_context))
+
+    async def arun(
+        self,
+        goal: str,
+        max_steps: int = 5,
+        verbose: bool = False,
+        interactive: bool = True,
+        run_context: RunContext | None = None,
+    ) -> RunResult:
+        """Run the paradigm asynchronously
+
+        With ``interactive=False`` the run never waits for user input. With a
+        ``run_context`` the LLM calls are held to its deadline and budget; a
+        run it stops returns what was done so far, with ``stopped`` set.
+        """
+        started = time.perf_counter()
+        try:
+            with run_context.activate() if run_context else nullcontext():
+                return await self._arun(goal, max_steps, verbose, interactive)
+        except RunStopped as e:
+            self.console.print(f"\n[bold red]Run stopped:[/] {e}")
+            self._log("stopped", reason=e.reason)
+            return self._result(goal, started, stopped=e.reason)
+        finally:
+            await self._stop_summarizing()
 
     @abstractmethod
+    async def _arun(
+        self, goal: str, max_steps: int, verbose: bool, interactive: bool
+    ) -> RunResult:
+        """Run the paradigm until it is done or ``max_steps`` are taken"""
+        pass
+
+    def _result(self, goal: str, started: float, **fields: Any) -> RunResult:
+        """Summarize the run that started at ``started`` (perf_counter)"""
+        return RunResult(
+            goal=goal,
+            steps=self.history.to_list(),
+            llm_calls=self.llm_calls,
+            duration=time.perf_counter() - started,
+            step_durations=list(self.step_durations),
+            telemetry=self.telemetry.report(),
+            **fields,
+        )
+
+    def _start_run(self, system: str, interactive: bool = True) -> None:
+        """Reset the per-run state and begin the run's chat session
+
+        The history and context start empty, so a paradigm can run one goal
+        after another without earlier steps leaking into the new run.
+
+        The chat session is only started when session mode is on. Calls of
+        runs without user interaction are batch work for a concurrency limiter.
+        """
+        self._priority = "interactive" if interactive else "batch"
+        self.history.reset()
+        self.context.clear()
+        self.llm_calls = 0
+        self.step_durations = []
+        self.telemetry = Telemetry()
+        self.chat = None
+        if self.chat_session:
+            self.chat = ChatSession(
+                self.llm, self.model_name, system=system, options=self.options
+            )
+        if self.router is not None:
+            # Load the routed models in the background while the run starts
+            self._preloading = asyncio.ensure_future(self._preload())
+
+    def _resume(self, goal: str) -> Set[Any]:
+        """Restore the completed steps of an interrupted run from the event log
+
+        Items of completed steps are put back in the history and context;
+        those of the step that was interrupted are dropped, so it runs again.
+        Without a log, or with an empty one, nothing is restored and the run
+        is logged from its start.
+
+        Returns:
+            Ids of the completed steps
+
+        Raises:
+            ValueError: If the log belongs to another paradigm or goal
+        """
+        if self.event_log is None:
+            return set()
+        events = self.event_log.events()
+        if not events:
+            self.event_log.append("start", paradigm=self.name, goal=goal)
+            return set()
+
+        start = events[0]
+        if start.get("paradigm") != self.name or start.get("goal") != goal:
+            raise ValueError(
+                f"{self.event_log.path} logs a {start.get('paradigm')} run of "
+                f"{start.get('goal')!r}, not a {self.name} run of {goal!r}"
+            )
+        completed = {event["step"] for event in events if event["event"] == "step"}
+        for event in events:
+            if event["event"] == "item" and event["step"] in completed:
+                item = self.item_types[event["kind"]].model_validate(event["data"])
+                with scope(step=event["step"]):
+                    self._record(item, log=False)
+        self.event_log.append("resume", completed=len(completed))
+        return completed
+
+    def _restore_chat(self, summary: str) -> None:
+        """Give a resumed run's chat session what it knew before
+
+        The conversation itself is not logged, so the restored state is
+        summarized in one message instead.
+        """
+        if self.chat is not None:
+            self.chat.append("user", summary)
+
+    def _log(self, event: str, **fields: Any) -> None:
+        """Write an event to the event log, if there is one"""
+        if self.event_log is not None:
+            self.event_log.append(event, **fields)
+
+    async def _preload(self) -> None:
+        with scope(self.telemetry, paradigm=self.name):
+            await self.router.preload(self.llm, self.model_name)
+
+    def _route(self, phase: str | None) -> str:
+        """The model for calls made in ``phase``"""
+        if self.router is None:
+            return self.model_name
+        return self.router.model_for(phase, self.model_name)
+
+    def _hold(self, model: str) -> Any:
+        """Context manager holding ``model`` for one call (see ``ModelRouter``)"""
+        return nullcontext() if self.router is None else self.router.use(model)
+
+    @contextmanager
+    def _counted(self) -> Iterator[None]:
+        """Count one LLM call, unless it is refused before being sent
+
+        The run's budget (``RunStopped``) and the limiter (``Overloaded``)
+        refuse calls before anything is sent, so those are not counted.
+        """
+        self.llm_calls += 1
+        try:
+            yield
+        except (RunStopped, Overloaded):
+            self.llm_calls -= 1
+            raise
+
+    async def _generate_json(
+        self,
+        prompt: str,
+        chat: ChatSession | None = None,
+        phase: str | None = None,
+        schema: Dict[str, Any] | None = None,
+        model: str | None = None,
+        options: Dict[str, Any] | None = None,
+        on_field: Callable[[str, Any], None] | None = None,
+    ) -> Dict[str, Any]:
+        """Ask for a JSON object, continuing the chat session if there is one
+
+        With a JSON ``schema`` Ollama constrains the output to match it.
+        ``model`` and ``options`` replace the routed model and the paradigm's
+        options for this call. ``on_field`` is called with each top-level
+        field as soon as it closes.
+        """
+        chat = chat or self.chat
+        model = model or self._route(phase)
+        keep_alive = self.router.keep_alive if self.router else None
+        with self._counted(), scope(
+            self.telemetry, paradigm=self.name, phase=phase
+        ), admission(self._priority):
+            async with self._hold(model):
+                if chat is not None:
+                    return await chat.send_json(
+                        prompt,
+                        on_field,
+                        model_name=model,
+                        format=schema,
+                        keep_alive=keep_alive,
+                    )
+                return await self.llm.generate_json(
+                    model,
+                    prompt,
+                    on_field=on_field,
+                    options=self.options if options is None else options,
+                    format=schema,
+                    keep_alive=keep_alive,
+                )
+
+    async def _generate_model(
+        self,
+        prompt: str,
+        model: Type[ModelT],
+        chat: ChatSession | None = None,
+        phase: str | None = None,
+        parse: Callable[[Dict[str, Any]], ModelT] | None = None,
+        label: str | None = None,
+        similar: str | None = None,
+        samples: int = 1,
+        on_field: Callable[[str, Any], None] | None = None,
+    ) -> ModelT:
+        """Ask for a JSON object and parse it as ``model``
+
+        The reply is constrained to the model's JSON schema when structured
+        output is on. If it still does not parse, only the missing or invalid
+        fields are asked for again, at most ``max_repairs`` times.
+
+        With a semantic cache covering ``phase``, the reply to an earlier
+        request whose ``similar`` text meant the same is reused, and parsed
+        replies are stored for later requests.
+
+        Outside chat sessions, ``samples`` replies are asked for at once and
+        the first one that parses is used; with ``hedging`` a call that is
+        slower than usual is sent again and the first valid reply wins.
+
+        Args:
+            prompt: The prompt asking for the object
+            model: The expected model, whose schema constrains the reply
+            chat: Chat session to continue instead of the run's one
+            phase: Telemetry phase of the calls
+            parse: Builds the result from the reply (default: validate it)
+            label: Name of the object in errors (default: the model name)
+            similar: The part of the prompt that identifies the request, e.g.
+                the goal of a plan, compared with earlier ones by meaning
+            samples: Replies to sample in parallel (see ``_first_valid``)
+            on_field: Called with each top-level field of the reply as soon as
+                it closes (see ``FieldPrinter``); not with sampled or hedged
+                replies, which race each other, nor with repairs
+
+        Raises:
+            ValueError: If the reply is still invalid after the repairs
+        """
+        parse = parse or model.model_validate
+        schema = model.model_json_schema()
+        match = await self._semantic_lookup(prompt, schema, chat, phase, similar)
+        if match is not None and match.value is not None:
+            try:
+                result = parse(json.loads(match.value))
+            except (ValueError, KeyError, TypeError):
+                self.semantic_cache.invalidate(match)
+            else:
+                with scope(self.telemetry, paradigm=self.name, phase=phase):
+                    CallTimer(self._route(phase), "/api/generate").finish(cached=True)
+                return result
+
+        if (chat or self.chat) is None and (samples > 1 or self.hedging is not None):
+            data = await self._first_valid(prompt, phase, schema, parse, samples)
+        else:
+            try:
+                data = await self._generate_json(
+                    prompt, chat, phase, schema=self._schema(schema), on_field=on_field
+                )
+            except ValueError:
+                # No object at all; the first repair asks for every field
+                data = {}
+
+        for attempt in range(self.max_repairs + 1):
+            try:
+                result = parse(data)
+            except (ValueError, KeyError, TypeError) as e:
+                error = e
+            else:
+                if match is not None:
+                    await self.semantic_cache.store(
+                        match, json.dumps(data, ensure_ascii=False)
+                    )
+                return result
+            if attempt == self.max_repairs:
+                break
+            fields = self._invalid_fields(error, schema, data)
+            repair_schema = {
+                **schema,
+                "properties": {
+                    field: schema["properties"][field]
+                    for field in fields
+                    if field in schema["properties"]
+                },
+                "required": fields,
+            }
+            try:
+                data = {
+                    **data,
+                    **await self._generate_json(
+                        self._repair_prompt(prompt, data, fields, error, chat),
+                        chat,
+                        phase,
+                        schema=self._schema(repair_schema),
+                    ),
+                }
+            except ValueError:
+                continue
+
+        label = label or model.__name__.lower()
+        raise ValueError(f"Invalid {label} format from LLM: {data}")
+
+    async def _first_valid(
+        self,
+        prompt: str,
+        phase: str | None,
+        schema: Dict[str, Any],
+        parse: Callable[[Dict[str, Any]], Any],
+        samples: int,
+    ) -> Dict[str, Any]:
+        """Race several requests for one JSON object, first valid reply wins
+
+        ``samples`` requests are sent at once; a fixed seed is offset for each
+        extra sample so they differ. With ``hedging`` another request is sent
+        whenever none has answered within the policy's delay, or all that
+        answered were invalid, up to its ``max_hedges``. The requests still
+        running when a reply parses are cancelled.
+
+        Returns:
+            The first reply that parses, else the first reply (``{}`` if no
+            request produced an object) for the repairs to fix
+
+        Raises:
+            httpx.HTTPError: If every request failed, the first failure
+        """
+        hedging = self.hedging
+        primary = self._route(phase)
+        budget = samples + (hedging.max_hedges if hedging else 0)
+        # Running requests with their model, send time and whether they hedge
+        running: Dict[asyncio.Future, tuple[str, float, bool]] = {}
+        invalid: List[Dict[str, Any]] = []
+        failures: List[Exception] = []
+
+        def send(model: str, options: Dict[str, Any] | None, hedged: bool) -> None:
+            request = self._generate_json(
+                prompt, None, phase, self._schema(schema), model, options
+            )
+            running[asyncio.ensure_future(request)] = (
+                model,
+                time.perf_counter(),
+                hedged,
+            )
+
+        def hedge() -> None:
+            hedging.stats.hedges += 1
+            send(hedging.model or primary, None, hedged=True)
+
+        for sample in range(samples):
+            options = self.options
+            if sample and options and options.get("seed") is not None:
+                options = {**options, "seed": options["seed"] + sample}
+            send(primary, options, hedged=False)
+        if hedging is not None:
+            hedging.stats.calls += 1
+        sent = samples
+        last_sent = time.perf_counter()
+        try:
+            while running:
+                timeout = None
+                if hedging is not None and sent < budget:
+                    delay = hedging.delay(primary, phase)
+                    timeout = max(0.0, last_sent + delay - time.perf_counter())
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedge()
+                    sent += 1
+                    last_sent = time.perf_counter()
+                    continue
+                for request in done:
+                    model, started, hedged = running.pop(request)
+                    try:
+                        data = request.result()
+                    except ValueError:
+                        data = {}
+                    except (httpx.HTTPError, Overloaded) as e:
+                        failures.append(e)
+                        continue
+                    if hedging is not None:
+                        hedging.observe(model, phase, time.perf_counter() - started)
+                    try:
+                        parse(data)
+                    except (ValueError, KeyError, TypeError):
+                        invalid.append(data)
+                        continue
+                    if hedged:
+                        hedging.stats.hedge_wins += 1
+                    return data
+                if not running and hedging is not None and sent < budget:
+                    # Every request so far failed or was invalid: retry now
+                    hedge()
+                    sent += 1
+                    last_sent = time.perf_counter()
+        finally:
+            for request in running:
+                request.cancel()
+            if running and hedging is not None:
+                hedging.stats.cancelled += len(running)
+            await asyncio.gather(*running, return_exceptions=True)
+        if invalid:
+            return invalid[0]
+        if failures:
+            raise failures[0]
+        return {}
+
+    async def _semantic_lookup(
+        self,
+        prompt: str,
+        schema: Dict[str, Any],
+        chat: ChatSession | None,
+        phase: str | None,
+        similar: str | None,
+    ) -> SemanticMatch | None:
+        """Look the request up in the semantic cache, if it covers it
+
+        Replies in a chat session depend on the whole conversation, so they
+        are never shared. Requests only match within the same model, options,
+        schema and prompt around the ``similar`` text.
+        """
+        if (
+            self.semantic_cache is None
+            or not similar
+            or phase not in self.semantic_cache.phases
+            or (chat or self.chat) is not None
+        ):
+            return None
+        model = self._route(phase)
+        request_scope = make_key(
+            model=model,
+            phase=phase,
+            options=self.options,
+            schema=self._schema(schema),
+            template=prompt.replace(similar, "\0"),
+        )
+        with scope(self.telemetry, paradigm=self.name, phase=phase), admission(
+            self._priority
+        ):
+            return await self.semantic_cache.lookup(self.llm, request_scope, similar)
+
+    def _schema(self, schema: Dict[str, Any]) -> Dict[str, Any] | None:
+        """The schema to constrain a reply with, if structured output is on"""
+        return schema if self.structured_output else None
+
+    @staticmethod
+    def _invalid_fields(
+        error: Exception, schema: Dict[str, Any], data: Dict[str, Any]
+    ) -> List[str]:
+        """Top-level fields to ask for again after ``error``"""
+        fields: List[str] = []
+        if isinstance(error, ValidationError):
+            for detail in error.errors():
+                if detail["loc"] and str(detail["loc"][0]) not in fields:
+                    fields.append(str(detail["loc"][0]))
+        # Unknown cause: re-ask the required fields, or all of them if those
+        # are present but still do not parse
+        required = [field for field in schema.get("required", []) if field not in data]
+        return fields or required or list(schema.get("properties", {}))
+
+    def _repair_prompt(
+        self,
+        prompt: str,
+        data: Dict[str, Any],
+        fields: List[str],
+        error: Exception,
+        chat: ChatSession | None,
+    ) -> str:
+        """Ask only for the fields of ``data`` that are missing or invalid"""
+        if isinstance(error, ValidationError):
+            problems = "; ".join(
+                f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}"
+                for detail in error.errors()
+            )
+        else:
+            problems = f"{type(error).__name__}: {error}"
+        instruction = f"""Your previous reply was not valid:
+{json.dumps(data, ensure_ascii=False)}
+
+Problems: {problems}
+
+Respond with a JSON object containing only these fields, corrected: {", ".join(fields)}. Please respond in {self.language} language. Do not include any other text, only return the JSON object."""
+
+        if (chat or self.chat) is not None:
+            # The original request is earlier in the conversation
+            return instruction
+        return f"""{prompt}
+
+{instruction}"""
+
+    async def _generate_text(
+        self,
+        prompt: str,
+        on_token: Callable[[str], None] | None = None,
+        chat: ChatSession | None = None,
+        phase: str | None = None,
+    ) -> str:
+        """Ask for free text, passing tokens to ``on_token`` as they arrive
+
+        With ``hedging`` (outside chat sessions) a reply whose first token is
+        late is asked for again, see ``_hedged_stream``.
+        """
+        chat = chat or self.chat
+        model = self._route(phase)
+        keep_alive = self.router.keep_alive if self.router else None
+        if chat is not None:
+            stream = chat.send_stream(prompt, model_name=model, keep_alive=keep_alive)
+        elif self.hedging is not None:
+            stream = self._hedged_stream(prompt, model, keep_alive, phase)
+        else:
+            stream = self.llm.generate_stream(
+                model, prompt, options=self.options, keep_alive=keep_alive
+            )
+        tokens = []
+        with self._counted(), scope(
+            self.telemetry, paradigm=self.name, phase=phase
+        ), admission(self._priority):
+            async with self._hold(model), aclosing(stream):
+                async for token in stream:
+                    tokens.append(token)
+                    if on_token:
+                        on_token(token)
+        return "".join(tokens).strip()
+
+    async def _hedged_stream(
+        self,
+        prompt: str,
+        model: str,
+        keep_alive: str | None,
+        phase: str | None,
+    ) -> AsyncIterator[str]:
+        """Stream free text, racing duplicate requests for the first token
+
+        Another request is sent whenever none has produced a token within the
+        hedging delay (time to first token, for text), or all have failed, up
+        to the policy's ``max_hedges``. The first stream to produce a token is
+        the reply; the others are cancelled.
+
+        Raises:
+            httpx.HTTPError: If every request failed, the first failure
+        """
+        hedging = self.hedging
+        budget = 1 + hedging.max_hedges
+        # First-token requests with their stream, model, send time and
+        # whether they hedge
+        pending: Dict[asyncio.Future, tuple[AsyncIterator[str], str, float, bool]] = {}
+        failures: List[Exception] = []
+        winner: tuple[AsyncIterator[str], str | None, bool] | None = None
+
+        def send(name: str, hedged: bool) -> None:
+            stream = self.llm.generate_stream(
+                name, prompt, options=self.options, keep_alive=keep_alive
+            )
+            first = asyncio.ensure_future(anext(stream))
+            pending[first] = (stream, name, time.perf_counter(), hedged)
+
+        def hedge() -> None:
+            self.llm_calls += 1
+            hedging.stats.hedges += 1
+            send(hedging.model or model, hedged=True)
+
+        hedging.stats.calls += 1
+        send(model, hedged=False)
+        sent = 1
+        last_sent = time.perf_counter()
+        try:
+            while pending and winner is None:
+                timeout = None
+                if sent < budget:
+                    delay = hedging.delay(model, phase)
+                    timeout = max(0.0, last_sent + delay - time.perf_counter())
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedge()
+                    sent += 1
+                    last_sent = time.perf_counter()
+                    continue
+                for first in done:
+                    stream, name, started, hedged = pending.pop(first)
+                    try:
+                        token = first.result()
+                    except StopAsyncIteration:
+                        # An empty reply is still a reply
+                        token = None
+                    except (httpx.HTTPError, Overloaded) as e:
+                        failures.append(e)
+                        continue
+                    hedging.observe(name, phase, time.perf_counter() - started)
+                    winner = (stream, token, hedged)
+                    break
+                if winner is None and not pending and sent < budget:
+                    hedge()
+                    sent += 1
+                    last_sent = time.perf_counter()
+        finally:
+            for first in pending:
+                first.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for stream, *_ in pending.values():
+                await stream.aclose()
+            hedging.stats.cancelled += len(pending)
+
+        if winner is None:
+            if failures:
+                raise failures[0]
+            return
+        stream, token, hedged = winner
+        hedging.stats.hedge_wins += hedged
+        async with aclosing(stream):
+            if token is None:
+                return
+            yield token
+            async for token in stream:
+                yield token
+
+    def _tools_prompt(self) -> str:
+        """Tool list to put in front of prompts that choose actions
+
+        It always offers the built-in ``final_answer`` action, which ends the
+        run.
+        """
+        finish = f"""Once the goal is achieved, take the action "{FINAL_ANSWER}" with args {{"answer": "..."}} to finish with the answer.
+
+"""
+        if not self.tools:
+            return finish
+        return f"""Available tools (an action named after a tool runs it; other actions are simulated):
+{self.tools.describe()}
+
+{finish}"""
+
+    @staticmethod
+    def _answer(action: Any) -> str:
+        """The answer given by a ``final_answer`` action"""
+        answer = action.args.get("answer")
+        if answer is None:
+            # Models sometimes name the argument differently
+            answer = " ".join(str(value) for value in action.args.values())
+        return str(answer)
+
+    async def _acheck_completion(self, goal: str) -> Completion:
+        """Ask whether the steps so far achieve the goal
+
+        In session mode the question goes to a fork of the run's chat, which
+        shares its prefix without adding the exchange to it. A reply that is
+        still invalid after the repairs counts as not done.
+        """
+        prompt = f"""Goal: {goal}
+
+Steps so far:
+{self._build_context()}
+
+Do the steps so far achieve the goal? If they do, give the final answer. Please respond in {self.language} language. Respond in JSON format:
+{{
+    "done": true,
+    "answer": "The final answer, or empty if the goal is not achieved yet"
+}}
+
+Do not include any other text, only return the JSON object."""
+
+        chat = self.chat.fork() if self.chat is not None else None
+        try:
+            return await self._generate_model(
+                prompt, Completion, chat=chat, phase="check", label="completion check"
+            )
+        except ValueError:
+            return Completion(done=False)
+
+    async def _run_tool(
+        self,
+        action: Any,
+        on_token: Callable[[str], None] | None = None,
+        chat: ChatSession | None = None,
+    ) -> str | None:
+        """Run the tool named by the action, or return None if there is none
+
+        The result is added to the chat session so later calls can see it.
+        """
+        if action.name not in self.tools:
+            return None
+        content = await self.tools.execute(action.name, action.args)
+        if on_token:
+            on_token(content)
+        chat = chat or self.chat
+        if chat is not None:
+            chat.append("user", f"Result of {action.name}: {content}")
+        return content
+
+    def _record(self, *items: Any, log: bool = True) -> None:
+        """Append items to the history and render them into the context once
+
+        Records are tagged with the step and phase of the current scope, and
+        written to the event log unless ``log`` is off.
+        """
+        tags = current_tags()
+        for item in items:
+            record = self.history.append(
+                item, step=tags.get("step"), phase=tags.get("phase")
+            )
+            if log:
+                self._log(
+                    "item", kind=record.kind, step=record.step, data=record.fields()
+                )
+            self.context.append(self._render(item))
+        self._summarize_if_due()
+
+    def _summarize_if_due(self) -> None:
+        """Start summarizing older context lines in the background if due
+
+        The run carries on meanwhile; the summary replaces the lines in the
+        context when it is ready. Chat sessions resend the conversation
+        rather than the context, so there is nothing to summarize for them.
+        """
+        if self.chat is not None or (
+            self._summarizing is not None and not self._summarizing.done()
+        ):
+            return
+        batch = self.context.take_summary_batch()
+        if batch is None:
+            return
+        # Summaries yield to the run's own calls under a concurrency limit
+        with admission("background"):
+            self._summarizing = asyncio.ensure_future(self._summarize(*batch))
+
+    async def _summarize(
+        self, summary: str | None, lines: List[str], upto: int
+    ) -> None:
+        """Fold context lines into the summary and swap it into the context"""
+        earlier = f"Summary of the steps before:\n{summary}\n\n" if summary else ""
+        steps = "\n".join(lines)
+        prompt = f"""{earlier}Steps:
+{steps}
+
+Summarize these steps in a few sentences, keeping every fact, result and decision that later steps may need. Please respond in {self.language} language. Respond directly with the summary."""
+
+        text = ""
+        try:
+            text = await self._generate_text(prompt, phase="summarize")
+        except RunStopped:
+            pass
+        except Exception as e:
+            # Runs as a background task: an error would go unnoticed, and the
+            # raw history is still good to use
+            self.console.print(
+                f"\n[yellow]Summary failed, keeping the full history:[/] {e}"
+            )
+        finally:
+            if text:
+                self.context.apply_summary(upto, text)
+            else:
+                self.context.cancel_summary()
+
+    async def _stop_summarizing(self) -> None:
+        """Cancel a summary still being written when the run ends"""
+        if self._summarizing is not None and not self._summarizing.done():
+            self._summarizing.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._summarizing
+        self._summarizing = None
+
     def _build_context(self) -> str:
         """Build context from history"""
+        return self.context.render()
+
+    @abstractmethod
+    def _render(self, item: Any) -> str:
+        """Render a history item as a context line"""
         pass
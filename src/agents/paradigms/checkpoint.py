@@ -0,0 +1,103 @@
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+
+class EventLog:
+    """Append-only JSONL log of a paradigm run, for resuming and forking
+
+    Events are written as they happen, one JSON object per line:
+
+    - ``start``: the paradigm and goal of the run
+    - ``plan``: a ReWOO plan
+    - ``item``: a history item (thought, action, observation, result) with
+      its kind, step and fields
+    - ``step``: a step whose items are all logged
+    - ``resume``: a later attempt picked the run up
+    - ``stopped``: the run's context stopped it (deadline, budget, cancel)
+
+    A run given a log that already has events skips the completed steps and
+    continues from there, without calling the model for them again.
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self._truncate_torn_line()
+
+    def _truncate_torn_line(self) -> None:
+        """Cut off a last line left unfinished by a crash
+
+        Otherwise the next event would be appended to it and unreadable.
+        """
+        if not self.path.exists():
+            return
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def append(self, event: str, **fields: Any) -> None:
+        """Write one event and flush it, so it survives a crash"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"event": event, **fields}, ensure_ascii=False) + "\n")
+
+    def events(self) -> List[Dict[str, Any]]:
+        """Every event logged so far, oldest first
+
+        Lines that cannot be read, e.g. one cut short by a crash, are skipped.
+        """
+        if not self.path.exists():
+            return []
+        events = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+        return events
+
+    def last(self, event: str) -> Dict[str, Any] | None:
+        """The most recent event of a type, e.g. ``"plan"``"""
+        for logged in reversed(self.events()):
+            if logged["event"] == event:
+                return logged
+        return None
+
+    @property
+    def goal(self) -> str | None:
+        """The goal of the logged run, if one was started"""
+        events = self.events()
+        return events[0].get("goal") if events else None
+
+    def completed_steps(self) -> List[Any]:
+        """Ids of the completed steps, in completion order"""
+        return [event["step"] for event in self.events() if event["event"] == "step"]
+
+    def fork(self, path: Path | str, step: Any) -> "EventLog":
+        """Copy the run up to the completion of ``step`` into a new log
+
+        Running with the new log continues from there, e.g. with another
+        model or sampling options, while this log is left untouched.
+
+        Raises:
+            ValueError: If ``step`` has not completed in this log, or ``path``
+                already exists
+        """
+        events = self.events()
+        for end, event in enumerate(events):
+            if event["event"] == "step" and event["step"] == step:
+                break
+        else:
+            raise ValueError(f"Step {step!r} has not completed in {self.path}")
+        forked = EventLog(path)
+        if forked.path.exists():
+            raise ValueError(f"{forked.path} already exists")
+        forked.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(forked.path, "w", encoding="utf-8") as f:
+            f.writelines(
+                json.dumps(event, ensure_ascii=False) + "\n"
+                for event in events[: end + 1]
+            )
+        return forked
@@ -0,0 +1,169 @@
+from collections import deque
+from typing import Deque, List, Tuple
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (roughly four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class ContextWindow:
+    """Incrementally rendered history that fits a token budget
+
+    Each history entry is rendered to a line once, when it is appended. The
+    window slides forward as entries arrive: the oldest lines are dropped once
+    the budget is exceeded, but the ``keep_recent`` newest lines and any
+    pinned lines are always kept. The goal is not part of the window; the
+    paradigms put it at the head of every prompt.
+
+    With ``summarize_at``, older lines are summarized before they would be
+    dropped: once the lines reach that many tokens, ``take_summary_batch``
+    hands out all but the ``keep_recent`` newest ones, and ``apply_summary``
+    later replaces them with their summary in one go. Lines appended in the
+    meantime stay in the window, and lines that slide out of it were handed
+    out already, so nothing is lost while the summary is written.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int | None = 2048,
+        keep_recent: int = 3,
+        summarize_at: int | None = None,
+    ):
+        if (
+            summarize_at is not None
+            and max_tokens is not None
+            and summarize_at >= max_tokens
+        ):
+            raise ValueError(
+                f"summarize_at ({summarize_at}) must be below max_tokens ({max_tokens})"
+            )
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.summarize_at = summarize_at
+        self.pinned: List[str] = []
+        # Summary of the lines before the window, once one was applied
+        self.summary: str | None = None
+        # Lines that left the window without being summarized
+        self.dropped = 0
+        self._lines: Deque[Tuple[str, int]] = deque()
+        self._tokens = 0
+        self._rendered: str | None = ""
+        # Lines are numbered as appended: the next number, the first line the
+        # summary does not cover, and the first and last-plus-one lines handed
+        # out to summarize
+        self._next = 0
+        self._summarized = 0
+        self._batch = (0, 0)
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    @property
+    def tokens(self) -> int:
+        """Approximate token count of the rendered window"""
+        return self._tokens + self._fixed_tokens()
+
+    def _fixed_tokens(self) -> int:
+        """Tokens of the pinned lines and the summary, which never slide"""
+        tokens = sum(estimate_tokens(line) for line in self.pinned)
+        if self.summary:
+            tokens += estimate_tokens(self.summary)
+        return tokens
+
+    @property
+    def _start(self) -> int:
+        """Number of the oldest line in the window"""
+        return self._next - len(self._lines)
+
+    def append(self, line: str) -> None:
+        """Add a rendered history line, sliding the window if needed"""
+        tokens = estimate_tokens(line)
+        self._lines.append((line, tokens))
+        self._tokens += tokens
+        self._next += 1
+        self._slide()
+        self._rendered = None
+
+    def _slide(self) -> None:
+        """Drop the oldest lines while the window is over budget"""
+        if self.max_tokens is None:
+            return
+        budget = self.max_tokens - self._fixed_tokens()
+        while self._tokens > budget and len(self._lines) > self.keep_recent:
+            _, old_tokens = self._lines.popleft()
+            self._tokens -= old_tokens
+            if self._start > self._batch[1]:
+                self.dropped += 1
+
+    def pin(self, line: str) -> None:
+        """Keep a line at the head of the window regardless of the budget"""
+        self.pinned.append(line)
+        self._rendered = None
+
+    def take_summary_batch(self) -> Tuple[str | None, List[str], int] | None:
+        """Hand out the older lines to summarize, if they are due
+
+        They are due once the lines reach ``summarize_at`` tokens, unless a
+        batch is still being summarized.
+
+        Returns:
+            The current summary, the lines to fold into it and the number to
+            pass to ``apply_summary``, or None if nothing is due
+        """
+        if (
+            self.summarize_at is None
+            or self._batch[1] > self._summarized
+            or self._tokens < self.summarize_at
+        ):
+            return None
+        upto = self._next - self.keep_recent
+        start = max(self._start, self._summarized)
+        if upto <= start:
+            return None
+        window = list(self._lines)
+        lines = [line for line, _ in window[start - self._start : upto - self._start]]
+        self._batch = (start, upto)
+        return self.summary, lines, upto
+
+    def apply_summary(self, upto: int, summary: str) -> None:
+        """Replace the lines before ``upto`` by their summary"""
+        while self._lines and self._start < upto:
+            _, old_tokens = self._lines.popleft()
+            self._tokens -= old_tokens
+        self.summary = summary
+        self._summarized = upto
+        self._batch = (upto, upto)
+        self._slide()
+        self._rendered = None
+
+    def cancel_summary(self) -> None:
+        """Give up on the batch being summarized, e.g. after an error"""
+        # Lines of the batch that slid out meanwhile are now lost
+        first, upto = self._batch
+        self.dropped += max(0, min(self._start, upto) - first)
+        self._batch = (self._summarized, self._summarized)
+        self._rendered = None
+
+    def render(self) -> str:
+        """The window as prompt text; cached until the next change"""
+        if self._rendered is None:
+            lines = list(self.pinned)
+            if self.summary:
+                lines.append(f"Summary of earlier steps: {self.summary}")
+            if self.dropped:
+                lines.append(f"({self.dropped} earlier entries omitted)")
+            lines.extend(line for line, _ in self._lines)
+            self._rendered = "\n".join(lines)
+        return self._rendered
+
+    def clear(self) -> None:
+        """Forget every line, including pinned ones and the summary"""
+        self.pinned.clear()
+        self._lines.clear()
+        self._tokens = 0
+        self.dropped = 0
+        self.summary = None
+        self._summarized = self._next
+        self._batch = (self._next, self._next)
+        self._rendered = ""
@@ -0,0 +1,214 @@
+import json
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List
+
+from pydantic import BaseModel
+
+# Approximate per-record overhead on top of the JSON payload (bytes)
+RECORD_OVERHEAD = 120
+
+
+class HistoryRecord:
+    """One history entry: its kind, where it was made and its JSON payload
+
+    The item is kept as its JSON text rather than as a live object, so
+    records are small, immutable and never share state with the caller.
+    """
+
+    __slots__ = ("seq", "kind", "step", "phase", "data")
+
+    def __init__(self, seq: int, kind: str, step: Any, phase: str | None, data: str):
+        self.seq = seq
+        self.kind = kind
+        self.step = step
+        self.phase = phase
+        self.data = data
+
+    def __repr__(self) -> str:
+        return f"HistoryRecord({self.seq}, {self.kind!r}, step={self.step!r})"
+
+    @property
+    def size(self) -> int:
+        """Approximate memory held by the record (bytes)"""
+        return len(self.data) + RECORD_OVERHEAD
+
+    def fields(self) -> Dict[str, Any]:
+        """The item's fields, decoded"""
+        return json.loads(self.data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The item as ``{"type": kind, **fields}``, the ``RunResult`` format"""
+        return {"type": self.kind, **self.fields()}
+
+    def to_json(self) -> str:
+        """The record as one line of the spill file"""
+        return json.dumps(
+            {
+                "seq": self.seq,
+                "type": self.kind,
+                "step": self.step,
+                "phase": self.phase,
+                "data": self.fields(),
+            },
+            ensure_ascii=False,
+        )
+
+    @classmethod
+    def from_json(cls, line: str) -> "HistoryRecord":
+        entry = json.loads(line)
+        return cls(
+            entry["seq"],
+            entry["type"],
+            entry["step"],
+            entry["phase"],
+            json.dumps(entry["data"], ensure_ascii=False),
+        )
+
+
+class HistoryStore:
+    """Append-only run history with bounded memory
+
+    Items are stored as compact ``HistoryRecord``s. Once more than
+    ``max_records`` records or ``max_bytes`` of payload are held, the oldest
+    ones leave memory: they are appended to ``spill_path`` when one is given
+    and dropped otherwise. Records in memory are indexed by kind, step and
+    phase.
+    """
+
+    def __init__(
+        self,
+        max_records: int | None = 1000,
+        max_bytes: int | None = 1_000_000,
+        spill_path: Path | str | None = None,
+    ):
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.spill_path = Path(spill_path) if spill_path is not None else None
+        # Records that left memory, spilled or not
+        self.evicted = 0
+        self._records: Deque[HistoryRecord] = deque()
+        self._bytes = 0
+        self._next_seq = 0
+        # Sequence numbers of the records in memory, by field value
+        self._index: Dict[str, Dict[Any, Deque[int]]] = {
+            "kind": {},
+            "step": {},
+            "phase": {},
+        }
+
+    def __len__(self) -> int:
+        """Number of records ever appended"""
+        return self._next_seq
+
+    def __iter__(self) -> Iterator[HistoryRecord]:
+        """Records in memory, oldest first"""
+        return iter(self._records)
+
+    def __bool__(self) -> bool:
+        return self._next_seq > 0
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the records in memory"""
+        return self._bytes
+
+    def append(
+        self,
+        item: BaseModel,
+        step: Any = None,
+        phase: str | None = None,
+        kind: str | None = None,
+    ) -> HistoryRecord:
+        """Add an item; ``kind`` defaults to its lowercased class name"""
+        record = HistoryRecord(
+            self._next_seq,
+            kind or type(item).__name__.lower(),
+            step,
+            phase,
+            item.model_dump_json(),
+        )
+        self._next_seq += 1
+        self._records.append(record)
+        self._bytes += record.size
+        for field, index in self._index.items():
+            index.setdefault(getattr(record, field), deque()).append(record.seq)
+        self._evict()
+        return record
+
+    def find(self, **criteria: Any) -> List[HistoryRecord]:
+        """Records in memory matching every criterion (``kind``, ``step``, ``phase``)
+
+        Raises:
+            ValueError: If a criterion is not an indexed field
+        """
+        unknown = set(criteria) - set(self._index)
+        if unknown:
+            raise ValueError(f"Cannot look up history by {', '.join(sorted(unknown))}")
+        if not criteria:
+            return list(self._records)
+        matches = None
+        for field, value in criteria.items():
+            seqs = set(self._index[field].get(value, ()))
+            matches = seqs if matches is None else matches & seqs
+        first = self._records[0].seq if self._records else 0
+        return [self._records[seq - first] for seq in sorted(matches)]
+
+    def last(self, kind: str | None = None) -> HistoryRecord | None:
+        """The newest record in memory, optionally of one kind"""
+        if kind is None:
+            return self._records[-1] if self._records else None
+        seqs = self._index["kind"].get(kind)
+        if not seqs:
+            return None
+        return self._records[seqs[-1] - self._records[0].seq]
+
+    def records(self) -> Iterator[HistoryRecord]:
+        """Every record still available: spilled ones, then those in memory"""
+        if self.spill_path is not None and self.spill_path.exists():
+            with open(self.spill_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield HistoryRecord.from_json(line)
+        yield from self._records
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Every available item as ``{"type": kind, **fields}``"""
+        return [record.to_dict() for record in self.records()]
+
+    def clear(self) -> None:
+        """Forget the records in memory; the spill file is left as is"""
+        self._records.clear()
+        self._bytes = 0
+        for index in self._index.values():
+            index.clear()
+
+    def reset(self) -> None:
+        """Start over empty, for a new run: the spill file is emptied too"""
+        self.clear()
+        self.evicted = 0
+        self._next_seq = 0
+        if self.spill_path is not None and self.spill_path.exists():
+            self.spill_path.write_text("", encoding="utf-8")
+
+    def _evict(self) -> None:
+        """Move the oldest records out of memory while over a limit"""
+        spilled: List[HistoryRecord] = []
+        # The newest record stays, however large
+        while len(self._records) > 1 and (
+            (self.max_records is not None and len(self._records) > self.max_records)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            record = self._records.popleft()
+            self._bytes -= record.size
+            self.evicted += 1
+            for field, index in self._index.items():
+                value = getattr(record, field)
+                seqs = index[value]
+                seqs.popleft()
+                if not seqs:
+                    del index[value]
+            spilled.append(record)
+        if spilled and self.spill_path is not None:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.writelines(record.to_json() + "\n" for record in spilled)
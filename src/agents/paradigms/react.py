@@ -1,12 +1,15 @@
-import json
-from typing import Any, Dict, List
+import asyncio
+import contextlib
+import time
+from typing import Any, Callable, Dict, Tuple
 
 from pydantic import BaseModel
-from rich.console import Console
 
-from .base import BaseParadigm
+from src.clients.limiter import Overloaded, admission
+from src.clients.runner import run_sync
+from src.clients.telemetry import scope
 
-console = Console()
+from .base import FINAL_ANSWER, BaseParadigm, FieldPrinter, RunResult
 
 
 class Thought(BaseModel):
@@ -28,85 +31,288 @@ class Observation(BaseModel):
     content: str
 
 
-class ReActParadigm(BaseParadigm):
-    """ReACT (Reasoning and Acting) Agent"""
+class ThoughtAction(BaseModel):
+    """Thought and action decided together in one call (fused mode)"""
+
+    thought: Thought
+    action: Action
 
-    def __init__(self, model_name: str, language: str = "en"):
-        super().__init__(model_name=model_name, language=language)
-        self.history: List[Thought | Action | Observation] = []
 
-    def run(self, goal: str, max_steps: int = 5, verbose: bool = False) -> None:
+class ReActParadigm(BaseParadigm):
+    """ReACT (Reasoning and Acting) Agent
+
+    With ``fused=True`` each step decides its thought and action in a single
+    schema-constrained call, so a step takes two LLM calls instead of three
+    and the action is chosen with the goal and history in view.
+
+    In interactive runs the next thought is generated while the user reads
+    the current step; it is used if they continue and dropped if they quit.
+
+    With ``think_samples`` above 1 every thought is sampled that many times
+    in parallel and the first valid one is used, so a stalled or malformed
+    generation does not hold up the step (outside chat sessions; samples
+    only differ with a sampling temperature).
+
+    The run ends before ``max_steps`` when the model takes the built-in
+    ``final_answer`` action, or, with ``check_completion``, when the check
+    after a step finds the goal achieved.
+    """
+
+    name = "react"
+    item_types = {"thought": Thought, "action": Action, "observation": Observation}
+
+    def __init__(
+        self,
+        model_name: str,
+        language: str = "en",
+        fused: bool = False,
+        think_samples: int = 1,
+        **kwargs: Any,
+    ):
+        super().__init__(model_name=model_name, language=language, **kwargs)
+        self.fused = fused
+        self.think_samples = think_samples
+
+    async def _arun(
+        self, goal: str, max_steps: int, verbose: bool, interactive: bool
+    ) -> RunResult:
         """Run ReACT Agent"""
         step = 0
+        started = time.perf_counter()
+        observation: Observation | None = None
+        # Set once the goal is achieved
+        answer: str | None = None
+        # Next thought (and action when fused), speculated during the pause
+        prefetched: asyncio.Future | None = None
+        self._start_run(
+            f"""Goal: {goal}
+
+You work towards this goal step by step, alternating between thinking, acting and observing. Please respond in {self.language} language.""",
+            interactive,
+        )
+
+        completed = self._resume(goal)
+        step = len(completed)
+        if completed:
+            last = self.history.last("observation")
+            observation = Observation.model_validate(last.fields()) if last else None
+            last = self.history.last("action")
+            if last is not None and last.fields()["name"] == FINAL_ANSWER:
+                # The interrupted run had already finished
+                answer = self._answer(Action.model_validate(last.fields()))
+            self._restore_chat(f"Steps done so far:\n{self._build_context()}")
+
+        self.console.print("\n[bold blue]Goal:[/]")
+        self.console.print(goal)
+        self.console.print()
+        if completed:
+            self.console.print(f"[dim]Resuming after step {step}[/]")
 
-        console.print("\n[bold blue]Goal:[/]")
-        console.print(goal)
-        console.print()
-
-        while step < max_steps:
-            step += 1
-            console.print(f"\n[bold]Step {step}[/]")
+        try:
+            while step < max_steps and answer is None:
+                step += 1
+                step_started = time.perf_counter()
+                self.console.print(f"\n[bold]Step {step}[/]")
+
+                with scope(step=step):
+                    # Think (and act in the same call when fused), printing
+                    # the fields of the replies as soon as they close
+                    self.console.print("\n[bold green]Thought:[/]")
+                    show_thought = FieldPrinter(self.console, {"content": str})
+                    show_action = FieldPrinter(
+                        self.console,
+                        {"name": "Name: {}".format, "args": "Args: {}".format},
+                        header="\n[bold yellow]Action:[/]",
+                    )
+                    if prefetched is not None:
+                        next_thought, prefetched = prefetched, None
+                        try:
+                            thought, action = await next_thought
+                        except Overloaded:
+                            # Speculative calls are shed first under load
+                            thought, action = await self._athink_next(
+                                goal, show_thought, show_action
+                            )
+                    else:
+                        thought, action = await self._athink_next(
+                            goal, show_thought, show_action
+                        )
+                    self._record(thought, *([action] if action else []))
+                    show_thought.finish(thought.model_dump())
+
+                    # Act
+                    if action is None:
+                        action = await self.aact(thought, on_field=show_action)
+                    show_action.finish(action.model_dump())
+
+                    if action.name == FINAL_ANSWER:
+                        answer = self._answer(action)
+                    else:
+                        # Observe, printing tokens as they arrive
+                        self.console.print("\n[bold magenta]Observation:[/]")
+                        observation = await self.aobserve(
+                            action, on_token=self._print_token
+                        )
+                        self.console.print()
+                        if self.check_completion and step < max_steps:
+                            completion = await self._acheck_completion(goal)
+                            if completion.done:
+                                answer = completion.answer or observation.content
+                self._log("step", step=step)
+                self.step_durations.append(time.perf_counter() - step_started)
+
+                if answer is not None:
+                    self.console.print("\n[bold green]Final Answer:[/]")
+                    self.console.print(answer)
+                    break
+
+                if interactive and step < max_steps:
+                    # The next thought only depends on the history so far, so
+                    # it can be generated while the user reads this step; it
+                    # yields to other runs' calls under a concurrency limit
+                    with scope(step=step + 1), admission("background"):
+                        prefetched = asyncio.ensure_future(self._athink_next(goal))
+
+                if verbose:
+                    self.console.print("\n[bold]Current State:[/]")
+                    self.console.print(self._build_context())
+
+                if await self._confirm_continue(interactive):
+                    continue
+                break
+        finally:
+            if prefetched is not None:
+                # The user quit: stop generating the unused thought
+                prefetched.cancel()
+                with contextlib.suppress(asyncio.CancelledError, Exception):
+                    await prefetched
+
+        self.console.print("\n[bold]Agent run completed![/]")
+        if answer is not None:
+            return self._result(goal, started, final_answer=answer, goal_achieved=True)
+        return self._result(
+            goal, started, final_answer=observation.content if observation else None
+        )
 
-            # Think
-            thought = self.think(goal)
-            console.print("\n[bold green]Thought:[/]")
-            console.print(thought.content)
+    def think(self, goal: str) -> Thought:
+        """Think about the current situation"""
+        return run_sync(self.athink(goal))
 
-            # Act
-            action = self.act(thought)
-            console.print("\n[bold yellow]Action:[/]")
-            console.print(f"Name: {action.name}")
-            console.print(f"Args: {action.args}")
+    def think_act(self, goal: str) -> Tuple[Thought, Action]:
+        """Think and decide the next action in a single call"""
+        return run_sync(self.athink_act(goal))
 
-            # Observe
-            observation = self.observe(action)
-            console.print("\n[bold magenta]Observation:[/]")
-            console.print(observation.content)
+    def act(self, thought: Thought) -> Action:
+        """Determine the next action"""
+        return run_sync(self.aact(thought))
 
-            if verbose:
-                console.print("\n[bold]Current State:[/]")
-                console.print(self._build_context())
+    def observe(
+        self, action: Action, on_token: Callable[[str], None] | None = None
+    ) -> Observation:
+        """Observe the result of the action"""
+        return run_sync(self.aobserve(action, on_token))
 
-            if (
-                not input("\nPress Enter to continue, or 'q' to quit: ")
-                .lower()
-                .startswith("q")
-            ):
-                continue
-            break
+    async def athink(self, goal: str) -> Thought:
+        """Think about the current situation"""
+        thought = await self._athink(goal)
+        self._record(thought)
+        return thought
+
+    async def _athink(
+        self, goal: str, on_field: Callable[[str, Any], None] | None = None
+    ) -> Thought:
+        instruction = f"""Take a deep breath and think about what to do next to achieve the goal step by step. Please respond in {self.language} language. Respond in JSON format:
+{{
+    "content": "I think ..."
+}}
 
-        console.print("\n[bold]Agent run completed![/]")
+Do not include any other text, only return the JSON object."""
 
-    def think(self, goal: str) -> Thought:
-        """Think about the current situation"""
-        context = self._build_context()
-        prompt = f"""Goal: {goal}
+        if self.chat is not None:
+            # Goal and previous steps are already in the conversation
+            prompt = instruction
+        else:
+            context = self._build_context()
+            prompt = f"""Goal: {goal}
 
 Previous steps:
 {context}
 
-Take a deep breath and think about what to do next to achieve the goal step by step. Please respond in {self.language} language. Respond in JSON format:
+{instruction}"""
+
+        return await self._generate_model(
+            prompt,
+            Thought,
+            phase="think",
+            samples=self.think_samples,
+            on_field=on_field,
+        )
+
+    async def athink_act(self, goal: str) -> Tuple[Thought, Action]:
+        """Think and decide the next action in a single call"""
+        thought, action = await self._athink_act(goal)
+        self._record(thought, action)
+        return thought, action
+
+    async def _athink_act(
+        self, goal: str, on_field: Callable[[str, Any], None] | None = None
+    ) -> Tuple[Thought, Action]:
+        instruction = f"""{self._tools_prompt()}Take a deep breath and think about what to do next to achieve the goal step by step, then decide which action to take. Please respond in {self.language} language. Respond in JSON format:
 {{
-    "content": "I think ..."
+    "thought": {{"content": "I think ..."}},
+    "action": {{"name": "action_name", "args": {{"arg1": "value1"}}}}
 }}
 
 Do not include any other text, only return the JSON object."""
 
-        response = self.llm.generate(self.model_name, prompt)
-        try:
-            thought_content = json.loads(response)["content"]
-            thought = Thought(content=thought_content)
-            self.history.append(thought)
-            return thought
-        except json.JSONDecodeError:
-            raise ValueError(f"Invalid thought format from LLM: {response}")
+        if self.chat is not None:
+            prompt = instruction
+        else:
+            context = self._build_context()
+            prompt = f"""Goal: {goal}
 
-    def act(self, thought: Thought) -> Action:
-        """Determine the next action"""
-        prompt = f"""Based on this thought:
-{thought.content}
+Previous steps:
+{context}
 
-What action should be taken? Please respond in {self.language} language. Respond in JSON format:
+{instruction}"""
+
+        step = await self._generate_model(
+            prompt,
+            ThoughtAction,
+            phase="think_act",
+            label="thought and action",
+            samples=self.think_samples,
+            on_field=on_field,
+        )
+        return step.thought, step.action
+
+    async def _athink_next(
+        self,
+        goal: str,
+        show_thought: Callable[[str, Any], None] | None = None,
+        show_action: Callable[[str, Any], None] | None = None,
+    ) -> Tuple[Thought, Action | None]:
+        """The next thought, and action in fused mode, without recording them
+
+        ``show_thought`` and ``show_action`` are called with the fields of the
+        thought and the action as soon as they close.
+        """
+        if not self.fused:
+            return await self._athink(goal, show_thought), None
+        shows = {"thought": show_thought, "action": show_action}
+
+        def show(field: str, value: Any) -> None:
+            if shows.get(field) is not None and isinstance(value, dict):
+                for name, item in value.items():
+                    shows[field](name, item)
+
+        return await self._athink_act(goal, show)
+
+    async def aact(
+        self, thought: Thought, on_field: Callable[[str, Any], None] | None = None
+    ) -> Action:
+        """Determine the next action, passing its fields to ``on_field``"""
+        instruction = f"""{self._tools_prompt()}What action should be taken? Please respond in {self.language} language. Respond in JSON format:
 {{
     "name": "action_name",
     "args": {{
@@ -116,35 +322,48 @@ What action should be taken? Please respond in {self.language} language. Respond
 
 Do not include any other text, only return the JSON object."""
 
-        response = self.llm.generate(self.model_name, prompt)
-        try:
-            action_data = json.loads(response)
-            action = Action(name=action_data["name"], args=action_data["args"])
-            self.history.append(action)
-            return action
-        except json.JSONDecodeError:
-            raise ValueError(f"Invalid action format from LLM: {response}")
-
-    def observe(self, action: Action) -> Observation:
-        """Observe the result of the action"""
-        prompt = f"""After taking this action:
+        if self.chat is not None:
+            prompt = instruction
+        else:
+            prompt = f"""Based on this thought:
+{thought.content}
+
+{instruction}"""
+
+        action = await self._generate_model(
+            prompt, Action, phase="act", on_field=on_field
+        )
+        self._record(action)
+        return action
+
+    async def aobserve(
+        self, action: Action, on_token: Callable[[str], None] | None = None
+    ) -> Observation:
+        """Observe the result of the action
+
+        Tools run locally; the LLM only imagines the result of other actions.
+        """
+        content = await self._run_tool(action, on_token)
+        if content is None:
+            instruction = f"What would be observed? Please respond in {self.language} language. Respond directly with the observation."
+
+            if self.chat is not None:
+                prompt = instruction
+            else:
+                prompt = f"""After taking this action:
 {action.name} with args {action.args}
 
-What would be observed? Please respond in {self.language} language. Respond directly with the observation."""
+{instruction}"""
 
-        response = self.llm.generate(self.model_name, prompt)
-        observation = Observation(content=response.strip())
-        self.history.append(observation)
+            content = await self._generate_text(prompt, on_token, phase="observe")
+        observation = Observation(content=content)
+        self._record(observation)
         return observation
 
-    def _build_context(self) -> str:
-        """Build context from history"""
-        context = []
-        for item in self.history:
-            if isinstance(item, Thought):
-                context.append(f"Thought: {item.content}")
-            elif isinstance(item, Action):
-                context.append(f"Action: {item.name} ({item.args})")
-            elif isinstance(item, Observation):
-                context.append(f"Observation: {item.content}")
-        return "\n".join(context)
+    def _render(self, item: Thought | Action | Observation) -> str:
+        """Render a history item as a context line"""
+        if isinstance(item, Thought):
+            return f"Thought: {item.content}"
+        if isinstance(item, Action):
+            return f"Action: {item.name} ({item.args})"
+        return f"Observation: {item.content}"
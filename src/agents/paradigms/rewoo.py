@@ -1,18 +1,38 @@
-import json
-from typing import Any, Dict, List
+import re
+import time
+from typing import Any, Callable, Dict, List, Set, Tuple
 
 from pydantic import BaseModel
-from rich.console import Console
 
-from .base import BaseParadigm
+from src.clients.chat import ChatSession
+from src.clients.runner import run_sync
+from src.clients.telemetry import scope
 
-console = Console()
+from .base import FINAL_ANSWER, BaseParadigm, RunResult
+from .scheduler import DAGScheduler
+
+EVIDENCE_PATTERN = re.compile(r"#(E\d+)")
+
+
+class PlanStep(BaseModel):
+    """Represent a single step of the plan
+
+    ``depends_on`` lists the ids of steps whose results (evidence) this step
+    needs, referenced in the description as ``#E1``, ``#E2``, ...
+    """
+
+    id: str
+    description: str
+    depends_on: List[str] = []
+
+    def __str__(self) -> str:
+        return f"#{self.id}: {self.description}"
 
 
 class Plan(BaseModel):
     """Represent agent's plan"""
 
-    steps: List[str]
+    steps: List[PlanStep]
 
 
 class Action(BaseModel):
@@ -29,91 +49,261 @@ class Result(BaseModel):
 
 
 class ReWOOParadigm(BaseParadigm):
-    """ReWOO (Reasoning Without Observation) Paradigm"""
-
-    def __init__(self, model_name: str, language: str = "en"):
-        super().__init__(model_name=model_name, language=language)
+    """ReWOO (Reasoning Without Observation) Paradigm
+
+    The rest of the plan is skipped, and its running steps cancelled, once a
+    step takes the built-in ``final_answer`` action or, with
+    ``check_completion``, once the check after a step finds the goal achieved.
+    """
+
+    name = "rewoo"
+    item_types = {"action": Action, "result": Result}
+
+    def __init__(
+        self,
+        model_name: str,
+        language: str = "en",
+        max_workers: int = 4,
+        **kwargs: Any,
+    ):
+        super().__init__(model_name=model_name, language=language, **kwargs)
         self.plan: Plan | None = None
+        self.scheduler: DAGScheduler[PlanStep, Tuple[Action, Result]] = DAGScheduler(
+            max_workers=max_workers
+        )
 
-    def run(self, goal: str, max_steps: int = 5, verbose: bool = False) -> None:
+    async def _arun(
+        self, goal: str, max_steps: int, verbose: bool, interactive: bool
+    ) -> RunResult:
         """Run ReWOO Paradigm"""
-        console.print("\n[bold blue]Goal:[/]")
-        console.print(goal)
-        console.print()
-
-        # Plan phase
-        self.plan = self._create_plan(goal)
-        console.print("[bold green]Plan:[/]")
-        for i, step in enumerate(self.plan.steps, 1):
-            console.print(f"{i}. {step}")
-
-        # Execute phase
-        for step_num, step in enumerate(self.plan.steps, 1):
-            if step_num > max_steps:
+        started = time.perf_counter()
+        self._start_run(
+            f"""Goal: {goal}
+
+You plan how to achieve this goal and then carry out the plan one step at a time. Please respond in {self.language} language.""",
+            interactive,
+        )
+
+        restored = self._resume(goal)
+
+        self.console.print("\n[bold blue]Goal:[/]")
+        self.console.print(goal)
+        self.console.print()
+
+        # Plan phase, unless an interrupted run already made the plan
+        plan_event = self.event_log.last("plan") if self.event_log else None
+        if plan_event is not None:
+            self.plan = Plan.model_validate(plan_event["plan"])
+        else:
+            self.plan = await self._acreate_plan(goal)
+            self._log("plan", plan=self.plan.model_dump())
+        self.console.print("[bold green]Plan:[/]")
+        for step in self.plan.steps:
+            self.console.print(str(step))
+
+        # Execute phase: independent steps run concurrently, results are
+        # shown as they complete
+        steps = self.plan.steps[:max_steps]
+        done = self._restored_steps(restored & {step.id for step in steps})
+        completed: Dict[str, Result] = {
+            step_id: result for step_id, (_, result) in done.items()
+        }
+        if plan_event is not None:
+            self.console.print(f"[dim]Resuming with {len(done)} steps done[/]")
+            plan_text = "\n".join(str(step) for step in self.plan.steps)
+            self._restore_chat(
+                f"Plan:\n{plan_text}\n\nSteps done so far:\n{self._build_context()}"
+            )
+        # Set once the goal is achieved
+        answer = next(
+            (
+                result.content
+                for action, result in done.values()
+                if action.name == FINAL_ANSWER
+            ),
+            None,
+        )
+        results = self.scheduler.run(
+            steps if answer is None else [], self._aexecute_step, done=done
+        )
+        try:
+            async for step, (action, result) in results:
+                completed[step.id] = result
+                self.console.print(f"\n[bold]Executed Step #{step.id}[/]")
+
+                self.console.print("\n[bold yellow]Action:[/]")
+                self.console.print(f"Name: {action.name}")
+                self.console.print(f"Args: {action.args}")
+
+                self.console.print("\n[bold magenta]Result:[/]")
+                self.console.print(result.content)
+
+                if action.name == FINAL_ANSWER:
+                    answer = result.content
+                elif self.check_completion and len(completed) < len(steps):
+                    completion = await self._acheck_completion(goal)
+                    if completion.done:
+                        answer = completion.answer or result.content
+                if answer is not None:
+                    self.console.print("\n[bold green]Final Answer:[/]")
+                    self.console.print(answer)
+                    break
+
+                if verbose:
+                    self.console.print("\n[bold]Current State:[/]")
+                    self.console.print(self._build_context())
+
+                if await self._confirm_continue(interactive):
+                    continue
                 break
-
-            console.print(f"\n[bold]Executing Step {step_num}[/]")
-
-            # Create action
-            action = self._create_action(step)
-            console.print("\n[bold yellow]Action:[/]")
-            console.print(f"Name: {action.name}")
-            console.print(f"Args: {action.args}")
-
-            # Execute action
-            result = self._execute_action(action)
-            console.print("\n[bold magenta]Result:[/]")
-            console.print(result.content)
-
-            if verbose:
-                console.print("\n[bold]Current State:[/]")
-                console.print(self._build_context())
-
-            if (
-                not input("\nPress Enter to continue, or 'q' to quit: ")
-                .lower()
-                .startswith("q")
-            ):
-                continue
-            break
-
-        console.print("\n[bold]Execution completed![/]")
+        finally:
+            # Cancel steps still running when the user quits or the goal is met
+            await results.aclose()
+
+        self.console.print("\n[bold]Execution completed![/]")
+        plan = [str(step) for step in self.plan.steps]
+        if answer is not None:
+            return self._result(
+                goal, started, final_answer=answer, plan=plan, goal_achieved=True
+            )
+        # Otherwise the answer is the result of the last plan step that ran
+        final = [completed[step.id] for step in steps if step.id in completed]
+        return self._result(
+            goal,
+            started,
+            final_answer=final[-1].content if final else None,
+            plan=plan,
+        )
+
+    def _restored_steps(self, step_ids: Set[str]) -> Dict[str, Tuple[Action, Result]]:
+        """Actions and results of completed steps, read from the event log"""
+        if not step_ids:
+            return {}
+        items: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for event in self.event_log.events():
+            if event["event"] == "item" and event["step"] in step_ids:
+                items[event["step"], event["kind"]] = event["data"]
+        return {
+            step_id: (
+                Action.model_validate(items[step_id, "action"]),
+                Result.model_validate(items[step_id, "result"]),
+            )
+            for step_id in step_ids
+        }
 
     def _create_plan(self, goal: str) -> Plan:
         """Create a plan to achieve the goal"""
-        prompt = f"""Goal: {goal}
+        return run_sync(self._acreate_plan(goal))
+
+    def _create_action(self, step: str) -> Action:
+        """Create an action for the given step"""
+        return run_sync(self._acreate_action(step))
 
-Create a step-by-step plan to achieve this goal. Please respond in {self.language} language. Respond in JSON format:
+    def _execute_action(
+        self, action: Action, on_token: Callable[[str], None] | None = None
+    ) -> Result:
+        """Execute the action and get result"""
+        return run_sync(self._aexecute_action(action, on_token))
+
+    async def _aexecute_step(
+        self, step: PlanStep, evidence: Dict[str, Tuple[Action, Result]]
+    ) -> Tuple[Action, Result]:
+        """Create and execute the action for a plan step
+
+        References to earlier steps (``#E1``) are replaced by their results.
+        """
+        description = EVIDENCE_PATTERN.sub(
+            lambda match: (
+                evidence[match.group(1)][1].content
+                if match.group(1) in evidence
+                else match.group(0)
+            ),
+            step.description,
+        )
+        step_started = time.perf_counter()
+        # Every step continues from the planning conversation as shared prefix
+        chat = self.chat.fork() if self.chat is not None else None
+        with scope(step=step.id):
+            action = await self._acreate_action(description, chat=chat)
+            if action.name == FINAL_ANSWER:
+                # Nothing to execute: the answer is the step's result
+                result = Result(content=self._answer(action))
+            else:
+                result = await self._aexecute_action(action, chat=chat)
+            # Record the pair together so concurrent steps do not interleave
+            self._record(action, result)
+            self._log("step", step=step.id)
+        self.step_durations.append(time.perf_counter() - step_started)
+        return action, result
+
+    async def _acreate_plan(self, goal: str) -> Plan:
+        """Create a plan to achieve the goal"""
+        instruction = f"""{self._tools_prompt()}Create a step-by-step plan to achieve this goal. Please respond in {self.language} language. Respond in JSON format:
 {{
     "steps": [
-        "Step 1: ...",
-        "Step 2: ...",
+        {{"id": "E1", "description": "...", "depends_on": []}},
+        {{"id": "E2", "description": "... using #E1 ...", "depends_on": ["E1"]}},
         ...
     ]
 }}
 
-The steps should be simple strings, not objects. Do not include any other text, only return the JSON object."""
-
-        response = self.llm.generate(self.model_name, prompt)
-        try:
-            plan_data = json.loads(response)
-            # 応答が辞書のリストの場合は文字列に変換
-            if plan_data["steps"] and isinstance(plan_data["steps"][0], dict):
-                steps = [
-                    f"Step {step['id']}: {step['description']}"
-                    for step in plan_data["steps"]
-                ]
-                plan_data["steps"] = steps
-            plan = Plan(steps=plan_data["steps"])
-            return plan
-        except json.JSONDecodeError:
-            raise ValueError(f"Invalid plan format from LLM: {response}")
-        except (KeyError, TypeError) as e:
-            raise ValueError(f"Invalid plan structure from LLM: {str(e)}")
-
-    def _create_action(self, step: str) -> Action:
+Number the step ids E1, E2, ... in order. When a step needs the result of an earlier step, refer to it as #E1, #E2, ... in the description and list its id in "depends_on". Steps that need no earlier results must have an empty "depends_on" so they can run in parallel. Do not include any other text, only return the JSON object."""
+
+        if self.chat is not None:
+            prompt = instruction
+        else:
+            prompt = f"""Goal: {goal}
+
+{instruction}"""
+
+        # Steps given as plain strings or with loose ids are still accepted
+        return await self._generate_model(
+            prompt,
+            Plan,
+            phase="plan",
+            parse=lambda data: Plan(steps=self._parse_plan_steps(data["steps"])),
+            similar=goal,
+        )
+
+    @staticmethod
+    def _parse_plan_steps(raw_steps: List[Any]) -> List[PlanStep]:
+        """Normalize plan steps given as objects or plain strings
+
+        Ids become ``E<n>``, ``#E<n>`` references in descriptions are added to
+        the dependencies, and only references to earlier steps are kept so the
+        plan is always acyclic.
+        """
+
+        def normalize_id(value: Any) -> str:
+            value = str(value).strip().lstrip("#")
+            return f"E{value}" if value.isdigit() else value
+
+        steps: List[PlanStep] = []
+        seen: set[str] = set()
+        for index, raw in enumerate(raw_steps, 1):
+            if isinstance(raw, dict):
+                step_id = normalize_id(raw.get("id", index))
+                description = str(raw["description"])
+                declared = [normalize_id(dep) for dep in raw.get("depends_on") or []]
+            else:
+                step_id, description, declared = f"E{index}", str(raw), []
+
+            depends_on: List[str] = []
+            for dep in declared + EVIDENCE_PATTERN.findall(description):
+                if dep in seen and dep not in depends_on:
+                    depends_on.append(dep)
+
+            steps.append(
+                PlanStep(id=step_id, description=description, depends_on=depends_on)
+            )
+            seen.add(step_id)
+        return steps
+
+    async def _acreate_action(
+        self, step: str, chat: ChatSession | None = None
+    ) -> Action:
         """Create an action for the given step"""
-        prompt = f"""For this step:
+        prompt = f"""{self._tools_prompt()}For this step:
 {step}
 
 What action should be taken? Please respond in {self.language} language. Respond in JSON format:
@@ -126,33 +316,41 @@ What action should be taken? Please respond in {self.language} language. Respond
 
 Do not include any other text, only return the JSON object."""
 
-        response = self.llm.generate(self.model_name, prompt)
-        try:
-            action_data = json.loads(response)
-            action = Action(name=action_data["name"], args=action_data["args"])
-            self.history.append(action)
-            return action
-        except json.JSONDecodeError:
-            raise ValueError(f"Invalid action format from LLM: {response}")
-
-    def _execute_action(self, action: Action) -> Result:
-        """Execute the action and get result"""
-        prompt = f"""After taking this action:
+        return await self._generate_model(
+            prompt, Action, chat=chat, phase="act", similar=step
+        )
+
+    async def _aexecute_action(
+        self,
+        action: Action,
+        on_token: Callable[[str], None] | None = None,
+        chat: ChatSession | None = None,
+    ) -> Result:
+        """Execute the action and get result
+
+        Tools run locally; the LLM only imagines the result of other actions.
+        """
+        content = await self._run_tool(action, on_token, chat=chat)
+        if content is None:
+            instruction = f"What would be the result? Please respond in {self.language} language. Respond directly with the result."
+
+            if chat is not None:
+                # The action is the previous message of the step's conversation
+                prompt = instruction
+            else:
+                prompt = f"""After taking this action:
 {action.name} with args {action.args}
 
-What would be the result? Please respond in {self.language} language. Respond directly with the result."""
+{instruction}"""
 
-        response = self.llm.generate(self.model_name, prompt)
-        result = Result(content=response.strip())
-        self.history.append(result)
+            content = await self._generate_text(
+                prompt, on_token, chat=chat, phase="execute"
+            )
+        result = Result(content=content)
         return result
 
-    def _build_context(self) -> str:
-        """Build context from history"""
-        context = []
-        for item in self.history:
-            if isinstance(item, Action):
-                context.append(f"Action: {item.name} ({item.args})")
-            elif isinstance(item, Result):
-                context.append(f"Result: {item.content}")
-        return "\n".join(context)
+    def _render(self, item: Action | Result) -> str:
+        """Render a history item as a context line"""
+        if isinstance(item, Action):
+            return f"Action: {item.name} ({item.args})"
+        return f"Result: {item.content}"
@@ -0,0 +1,118 @@
+import asyncio
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    Protocol,
+    Tuple,
+    TypeVar,
+)
+
+
+class Task(Protocol):
+    """A unit of work with dependencies on other units"""
+
+    id: str
+    depends_on: List[str]
+
+
+S = TypeVar("S", bound=Task)
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class DAGScheduler(Generic[S, T]):
+    """Run dependent tasks concurrently as soon as their dependencies complete
+
+    Wall-clock time approaches the critical path of the graph instead of the
+    sum of all tasks. Results of dependencies are passed to the tasks that
+    need them.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+
+    async def run(
+        self,
+        tasks: List[S],
+        execute: Callable[[S, Dict[str, T]], Awaitable[T]],
+        done: Dict[str, T] | None = None,
+    ) -> AsyncIterator[Tuple[S, T]]:
+        """Execute tasks and yield ``(task, result)`` pairs in completion order
+
+        Scheduling carries on while the consumer handles a yielded result;
+        closing the iterator early cancels everything still running.
+
+        Args:
+            tasks: Tasks to run. Dependencies on unknown ids are ignored
+            execute: Coroutine function called with a task and the results of
+                its dependencies, keyed by dependency id
+            done: Results of tasks that already ran, e.g. before a resume;
+                those tasks are not run or yielded again
+
+        Raises:
+            ValueError: If the dependencies contain a cycle
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        driver = asyncio.create_task(self._drive(tasks, execute, queue, done or {}))
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                yield item
+            # Surface errors raised while scheduling or executing
+            await driver
+        finally:
+            if not driver.done():
+                driver.cancel()
+                try:
+                    await driver
+                except asyncio.CancelledError:
+                    pass
+
+    async def _drive(
+        self,
+        tasks: List[S],
+        execute: Callable[[S, Dict[str, T]], Awaitable[T]],
+        queue: asyncio.Queue,
+        done: Dict[str, T],
+    ) -> None:
+        """Launch ready tasks up to the worker limit and report completions"""
+        known = {task.id for task in tasks}
+        pending = [task for task in tasks if task.id not in done]
+        results: Dict[str, T] = dict(done)
+        running: Dict[asyncio.Task, S] = {}
+        try:
+            while pending or running:
+                for task in list(pending):
+                    if len(running) >= self.max_workers:
+                        break
+                    deps = [dep for dep in task.depends_on if dep in known]
+                    if all(dep in results for dep in deps):
+                        pending.remove(task)
+                        evidence = {dep: results[dep] for dep in deps}
+                        running[asyncio.create_task(execute(task, evidence))] = task
+
+                if not running:
+                    ids = ", ".join(task.id for task in pending)
+                    raise ValueError(f"Circular dependencies between steps: {ids}")
+
+                finished, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+                for future in finished:
+                    task = running.pop(future)
+                    results[task.id] = future.result()
+                    await queue.put((task, results[task.id]))
+        finally:
+            for future in running:
+                future.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            await queue.put(_DONE)
@@ -0,0 +1,78 @@
+import importlib
+from typing import TYPE_CHECKING, Any, Dict, Type
+
+if TYPE_CHECKING:
+    from .paradigms import BaseParadigm
+    from .types import BaseAgentType
+
+# Names map to "module:attribute" paths that are only imported when used, so
+# listing the choices (e.g. for --help) stays cheap
+PARADIGMS: Dict[str, str] = {
+    "react": "src.agents.paradigms.react:ReActParadigm",
+    "rewoo": "src.agents.paradigms.rewoo:ReWOOParadigm",
+}
+
+AGENT_TYPES: Dict[str, str] = {
+    "simple-reflex": "src.agents.types.simple_reflex:SimpleReflexAgent",
+    "model-based-reflex": "src.agents.types.model_based_reflex:ModelBasedReflexAgent",
+    # TODO: Add other agent types after implementation
+}
+
+
+def _load(path: str) -> Any:
+    """Import the attribute named by a "module:attribute" path"""
+    module_name, _, attribute = path.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def register_paradigm(name: str, path: str) -> None:
+    """Register a paradigm class by its "module:attribute" path"""
+    PARADIGMS[name] = path
+
+
+def register_agent_type(name: str, path: str) -> None:
+    """Register an agent type class by its "module:attribute" path"""
+    AGENT_TYPES[name] = path
+
+
+def get_paradigm(name: str) -> Type["BaseParadigm"]:
+    """Import and return the paradigm class registered under ``name``
+
+    Raises:
+        ValueError: If the paradigm is unknown
+    """
+    if name not in PARADIGMS:
+        raise ValueError(f"Unknown paradigm: {name}")
+    return _load(PARADIGMS[name])
+
+
+def get_agent_type(name: str) -> Type["BaseAgentType"]:
+    """Import and return the agent type class registered under ``name``
+
+    Raises:
+        ValueError: If the agent type is unknown
+    """
+    if name not in AGENT_TYPES:
+        raise ValueError(f"Unknown agent type: {name}")
+    return _load(AGENT_TYPES[name])
+
+
+def create_agent(
+    paradigm: str, agent_type: str, model_name: str, **paradigm_kwargs: Any
+) -> "BaseAgentType":
+    """Instantiate an agent type driving the named paradigm
+
+    Args:
+        paradigm: Key of ``PARADIGMS``
+        agent_type: Key of ``AGENT_TYPES``
+        model_name: Ollama model used by the paradigm
+        **paradigm_kwargs: Passed to the paradigm (language, llm, options, ...)
+
+    Raises:
+        ValueError: If the paradigm or agent type is unknown
+    """
+    paradigm_class = get_paradigm(paradigm)
+    agent_class = get_agent_type(agent_type)
+    return agent_class(
+        paradigm=paradigm_class(model_name=model_name, **paradigm_kwargs)
+    )
@@ -0,0 +1,6 @@
+"""Tools executed locally as agent actions"""
+
+from .base import Tool, ToolRegistry
+from .builtin import builtin_tools
+
+__all__ = ["Tool", "ToolRegistry", "builtin_tools"]
@@ -0,0 +1,203 @@
+import asyncio
+import inspect
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Type
+
+from pydantic import BaseModel, ValidationError, create_model
+
+
+class Tool:
+    """A local Python callable the agent can use as an action
+
+    Arguments are validated against ``args_model``, built from the function
+    signature unless given. ``timeout`` bounds how long a call is awaited and
+    ``max_concurrency`` how many calls run at once. Results of tools marked
+    ``pure`` (same arguments, same result, no side effects) are memoized.
+    """
+
+    def __init__(
+        self,
+        func: Callable[..., Any],
+        name: str | None = None,
+        description: str | None = None,
+        args_model: Type[BaseModel] | None = None,
+        timeout: float = 10.0,
+        max_concurrency: int | None = None,
+        pure: bool = False,
+    ):
+        self.func = func
+        self.name = name or func.__name__
+        self.description = description or (inspect.getdoc(func) or "").split("\n")[0]
+        self.args_model = args_model or self._args_model(func)
+        self.timeout = timeout
+        self.pure = pure
+        self._semaphore = (
+            asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        )
+
+    async def run(self, args: Dict[str, Any], executor: Executor) -> Any:
+        """Call the function on ``executor`` within the limits of the tool
+
+        Raises:
+            asyncio.TimeoutError: If the call takes longer than ``timeout``;
+                the worker thread cannot be stopped and its result is dropped
+        """
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None:
+            return await asyncio.wait_for(
+                loop.run_in_executor(executor, lambda: self.func(**args)),
+                self.timeout,
+            )
+        # The timeout starts once a slot is free
+        async with self._semaphore:
+            return await asyncio.wait_for(
+                loop.run_in_executor(executor, lambda: self.func(**args)),
+                self.timeout,
+            )
+
+    @staticmethod
+    def _args_model(func: Callable[..., Any]) -> Type[BaseModel]:
+        fields: Dict[str, Any] = {}
+        for parameter in inspect.signature(func).parameters.values():
+            annotation = (
+                Any
+                if parameter.annotation is inspect.Parameter.empty
+                else parameter.annotation
+            )
+            default = (
+                ...
+                if parameter.default is inspect.Parameter.empty
+                else parameter.default
+            )
+            fields[parameter.name] = (annotation, default)
+        return create_model(f"{func.__name__}_args", **fields)
+
+    @property
+    def schema(self) -> Dict[str, Any]:
+        """JSON schema of the arguments"""
+        return self.args_model.model_json_schema()
+
+    def signature(self) -> str:
+        """One-line description for prompts, e.g. ``calculate(expression: string)``"""
+        schema = self.schema
+        required = set(schema.get("required", []))
+        args = ", ".join(
+            f"{name}: {spec.get('type', 'any')}{'' if name in required else '?'}"
+            for name, spec in schema.get("properties", {}).items()
+        )
+        return f"{self.name}({args}): {self.description}"
+
+
+class ToolRegistry:
+    """Named tools executed locally on a shared thread pool
+
+    Actions naming a registered tool are run instead of asking the LLM to
+    imagine their result. Tool failures, timeouts and invalid arguments are
+    returned as error text, so the agent can observe them and adjust.
+    """
+
+    def __init__(self, max_workers: int = 8, memo_size: int = 256):
+        self.max_workers = max_workers
+        self.memo_size = memo_size
+        self._tools: Dict[str, Tool] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+        # Results of pure tools by tool and arguments, and calls in flight
+        self._memo: OrderedDict[str, str] = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def __iter__(self) -> Iterator[Tool]:
+        return iter(self._tools.values())
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    def register(self, tool: Tool) -> Tool:
+        self._tools[tool.name] = tool
+        return tool
+
+    def tool(self, name: str | None = None, **options: Any) -> Callable:
+        """Decorator registering a function as a tool (see ``Tool``)"""
+
+        def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+            self.register(Tool(func, name=name, **options))
+            return func
+
+        return decorator
+
+    def get(self, name: str) -> Tool | None:
+        return self._tools.get(name)
+
+    def describe(self) -> str:
+        """Tool list for prompts, one tool per line"""
+        return "\n".join(f"- {tool.signature()}" for tool in self)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="tool"
+                )
+            return self._executor
+
+    async def execute(self, name: str, args: Dict[str, Any]) -> str:
+        """Run a tool and describe its result
+
+        Raises:
+            KeyError: If no tool is registered under ``name``
+        """
+        tool = self._tools[name]
+        try:
+            validated = tool.args_model.model_validate(args).model_dump()
+        except ValidationError as e:
+            return f"Error: invalid arguments for {name}: {e.errors()}"
+
+        if not tool.pure:
+            return await self._run(tool, validated)
+
+        key = json.dumps([name, validated], sort_keys=True, default=str)
+        if key in self._memo:
+            self._memo.move_to_end(key)
+            return self._memo[key]
+        # Identical calls made while the first is running share its result
+        if key not in self._pending:
+            self._pending[key] = asyncio.ensure_future(self._run(tool, validated))
+        future = self._pending[key]
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            if future.done():
+                self._pending.pop(key, None)
+        # Failures such as timeouts are not remembered
+        if not result.startswith("Error:"):
+            self._memo[key] = result
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return result
+
+    async def _run(self, tool: Tool, args: Dict[str, Any]) -> str:
+        try:
+            result = await tool.run(args, self.executor)
+        except asyncio.TimeoutError:
+            return f"Error: {tool.name} timed out after {tool.timeout}s"
+        except Exception as e:
+            return f"Error: {type(e).__name__}: {e}"
+        return self._format(result)
+
+    @staticmethod
+    def _format(result: Any) -> str:
+        if isinstance(result, str):
+            return result
+        if isinstance(result, BaseModel):
+            return result.model_dump_json()
+        try:
+            return json.dumps(result, ensure_ascii=False)
+        except TypeError:
+            return str(result)
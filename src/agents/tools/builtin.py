@@ -0,0 +1,98 @@
+import ast
+import math
+import operator
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from .base import ToolRegistry
+
+_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+_FUNCTIONS = {
+    name: getattr(math, name)
+    for name in ("sqrt", "log", "log10", "exp", "sin", "cos", "tan", "floor", "ceil")
+}
+_FUNCTIONS.update(abs=abs, round=round, min=min, max=max)
+_CONSTANTS = {"pi": math.pi, "e": math.e}
+
+# Integer results with more digits than this are refused before they are
+# computed: a pool thread running a tool cannot be stopped by its timeout, and
+# Python does not convert longer integers to text anyway
+MAX_DIGITS = 4000
+
+
+def _result_digits(op: ast.operator, left: float, right: float) -> float:
+    """Decimal digits of an integer ``left op right``, estimated from its operands
+
+    Only products and positive powers of integers grow without bound; float
+    results overflow instead, so they are counted as 0.
+    """
+    if not (isinstance(left, int) and isinstance(right, int)):
+        return 0
+    if isinstance(op, ast.Pow):
+        if right <= 0 or abs(left) <= 1:
+            return 0
+        return right * math.log10(abs(left))
+    if isinstance(op, ast.Mult):
+        return math.log10(max(abs(left), 1)) + math.log10(max(abs(right), 1))
+    return 0
+
+
+def _evaluate(node: ast.AST) -> float:
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return node.value
+    if isinstance(node, ast.Name) and node.id in _CONSTANTS:
+        return _CONSTANTS[node.id]
+    if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+        left, right = _evaluate(node.left), _evaluate(node.right)
+        if _result_digits(node.op, left, right) > MAX_DIGITS:
+            raise ValueError(f"result too large (over {MAX_DIGITS} digits)")
+        return _OPERATORS[type(node.op)](left, right)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _OPERATORS:
+        return _OPERATORS[type(node.op)](_evaluate(node.operand))
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in _FUNCTIONS
+        and not node.keywords
+    ):
+        return _FUNCTIONS[node.func.id](*(_evaluate(arg) for arg in node.args))
+    raise ValueError(f"unsupported expression: {ast.unparse(node)}")
+
+
+def calculate(expression: str) -> float:
+    """Evaluate an arithmetic expression, e.g. "sqrt(2) * (3 + 4) ** 2"
+
+    Supports + - * / // % **, parentheses, pi, e and common math functions.
+    """
+    return _evaluate(ast.parse(expression, mode="eval"))
+
+
+def current_time(timezone: str = "UTC") -> str:
+    """Get the current date and time in an IANA timezone, e.g. "Asia/Tokyo" """
+    return datetime.now(ZoneInfo(timezone)).isoformat(timespec="seconds")
+
+
+def word_count(text: str) -> int:
+    """Count the words in a text"""
+    return len(text.split())
+
+
+def builtin_tools() -> ToolRegistry:
+    """A registry with the bundled tools"""
+    registry = ToolRegistry()
+    registry.tool(pure=True, timeout=1.0)(calculate)
+    registry.tool(timeout=1.0)(current_time)
+    registry.tool(pure=True, timeout=1.0)(word_count)
+    return registry
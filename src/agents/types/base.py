@@ -1,7 +1,10 @@
 from abc import ABC, abstractmethod
 from typing import Any
 
-from ..paradigms.base import BaseParadigm
+from src.clients.run_context import RunContext
+from src.clients.runner import run_sync
+
+from ..paradigms.base import BaseParadigm, RunResult
 
 
 class BaseAgentType(ABC):
@@ -10,9 +13,44 @@ class BaseAgentType(ABC):
     def __init__(self, paradigm: BaseParadigm):
         self.paradigm = paradigm
 
-    def run(self, goal: str, max_steps: int = 5, verbose: bool = False) -> None:
+    def run(
+        self,
+        goal: str,
+        max_steps: int = 5,
+        verbose: bool = False,
+        interactive: bool = True,
+        run_context: RunContext | None = None,
+    ) -> RunResult:
         """Run the agent with the specified paradigm"""
-        self.paradigm.run(goal, max_steps, verbose)
+        return run_sync(self.arun(goal, max_steps, verbose, interactive, run_context))
+
+    async def arun(
+        self,
+        goal: str,
+        max_steps: int = 5,
+        verbose: bool = False,
+        interactive: bool = True,
+        run_context: RunContext | None = None,
+    ) -> RunResult:
+        """Run the agent with the specified paradigm asynchronously
+
+        ``run_context`` bounds the run's time, LLM calls and tokens, and can
+        cancel it (see ``RunContext``). The outcome of the run is passed to
+        ``process_result`` and what it returns is the result's ``outcome``.
+        """
+        result = await self.paradigm.arun(
+            goal, max_steps, verbose, interactive, run_context
+        )
+        result.outcome = self.process_result(
+            {
+                "goal": result.goal,
+                "final_answer": result.final_answer,
+                "goal_achieved": result.goal_achieved,
+                "steps": len(result.step_durations),
+                "stopped": result.stopped,
+            }
+        )
+        return result
 
     @abstractmethod
     def process_result(self, result: Any) -> Any:
@@ -1,17 +1,46 @@
-from typing import Any, Dict
+from collections import deque
+from typing import Any, Dict, NoReturn
 
 from .base import BaseAgentType
 
 
+class StateSnapshot(dict):
+    """Read-only environment state
+
+    The agent never changes a snapshot: updates build a new one (copy on
+    write), so a snapshot handed out with a result keeps describing the state
+    at that time and can be shared instead of copied. Values are not copied;
+    treat them as read-only too.
+    """
+
+    def _read_only(self, *args: Any, **kwargs: Any) -> NoReturn:
+        raise TypeError("StateSnapshot is read-only; update the agent's model instead")
+
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+    __ior__ = _read_only
+
+    def __reduce__(self) -> Any:
+        return (type(self), (dict(self),))
+
+    def updated(self, changes: Dict[str, Any]) -> "StateSnapshot":
+        """A new snapshot with ``changes`` applied"""
+        return StateSnapshot({**self, **changes})
+
+
 class ModelBasedReflexAgent(BaseAgentType):
-    """Model-based Reflex Agent implementation"""
+    """Model-based Reflex Agent implementation
+
+    Memory stays bounded however long the agent runs: only the
+    ``max_history`` most recent results are kept in the action history.
+    """
 
-    def __init__(self, paradigm):
+    def __init__(self, paradigm, max_history: int = 100):
         super().__init__(paradigm)
         # Initialize internal model (state)
         self.model: Dict[str, Any] = {
-            "environment_state": {},  # Track environment state
-            "action_history": [],     # History of executed actions
+            "environment_state": StateSnapshot(),  # Track environment state
+            "action_history": deque(maxlen=max_history),  # Recent actions
             "performance_metrics": {   # Performance metrics
                 "actions_taken": 0,
                 "goals_achieved": 0
@@ -24,10 +53,12 @@ class ModelBasedReflexAgent(BaseAgentType):
         Args:
             percept: Perception information from environment
         """
-        # Update environment state
+        # Update environment state; snapshots handed out earlier keep theirs
         if isinstance(percept, dict):
-            self.model["environment_state"].update(percept)
-        
+            self.model["environment_state"] = self.model["environment_state"].updated(
+                percept
+            )
+
         # Update performance metrics
         self.model["performance_metrics"]["actions_taken"] += 1
 
@@ -51,7 +82,7 @@ class ModelBasedReflexAgent(BaseAgentType):
 
         # Process results considering internal model
         processed_result = self._process_with_model(result)
-        
+
         return processed_result
 
     def _is_goal_achieved(self, result: Any) -> bool:
@@ -71,10 +102,12 @@ class ModelBasedReflexAgent(BaseAgentType):
         """
         # Process results based on internal model state
         if isinstance(result, dict):
-            # Add model state to results
-            result.update({
+            # Add model state to a copy of the results; the state is an
+            # immutable snapshot, so it is shared rather than copied
+            result = {
+                **result,
                 "model_state": self.model["environment_state"],
                 "actions_taken": self.model["performance_metrics"]["actions_taken"],
                 "goals_achieved": self.model["performance_metrics"]["goals_achieved"]
-            })
-        return result
\ No newline at end of file
+            }
+        return result
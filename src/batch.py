@@ -0,0 +1,439 @@
+import json
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from functools import lru_cache
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any, Dict, Iterable, Iterator
+
+import click
+
+from src.agents.registry import AGENT_TYPES, PARADIGMS, create_agent
+
+if TYPE_CHECKING:
+    from src.clients.hedging import Hedging
+    from src.clients.ollama_client import AsyncOllamaClient
+    from src.clients.routing import ModelRouter
+    from src.clients.semantic_cache import SemanticCache
+
+# Settings a goal line may override
+GOAL_SETTINGS = (
+    "paradigm",
+    "agent_type",
+    "model",
+    "language",
+    "max_steps",
+    "timeout",
+    "max_calls",
+    "max_tokens",
+)
+
+
+@lru_cache(maxsize=None)
+def get_client(
+    base_urls: tuple[str, ...], cache_dir: str | None, concurrency_limit: int | None
+) -> "AsyncOllamaClient":
+    """One client per worker process, shared by every goal it runs
+
+    With several base URLs the calls are balanced over those servers.
+    """
+    from src.clients.balancer import LoadBalancer
+    from src.clients.cache import ResponseCache
+    from src.clients.limiter import AdaptiveLimiter
+    from src.clients.ollama_client import AsyncOllamaClient
+
+    return AsyncOllamaClient(
+        base_url=base_urls[0],
+        cache=ResponseCache(directory=cache_dir),
+        limiter=AdaptiveLimiter(concurrency_limit) if concurrency_limit else None,
+        balancer=LoadBalancer(base_urls) if len(base_urls) > 1 else None,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_semantic_cache(
+    cache_dir: str | None, embedding_model: str, threshold: float
+) -> "SemanticCache":
+    """One semantic cache per worker process; processes share its directory"""
+    from src.clients.semantic_cache import SemanticCache
+
+    return SemanticCache(
+        directory=cache_dir, embedding_model=embedding_model, threshold=threshold
+    )
+
+
+@lru_cache(maxsize=None)
+def get_hedging(percentile: float | None, model: str | None) -> "Hedging | None":
+    """One hedging policy per worker process, learning from all its calls"""
+    from src.clients.hedging import Hedging
+
+    if percentile is None:
+        return None
+    return Hedging(percentile=percentile, model=model)
+
+
+@lru_cache(maxsize=None)
+def get_router(
+    routes: tuple[str, ...], keep_alive: str | None, exclusive: bool
+) -> "ModelRouter | None":
+    """One router per worker process, so its goals share the loaded models"""
+    from src.clients.routing import ModelRouter, parse_routes
+
+    if not (routes or keep_alive or exclusive):
+        return None
+    return ModelRouter(
+        parse_routes(list(routes)), keep_alive=keep_alive or "30m", exclusive=exclusive
+    )
+
+
+def read_goals(stream: IO[str]) -> Iterator[Dict[str, Any]]:
+    """Lazily parse goals from JSONL
+
+    Each line is either a JSON string (the goal) or an object with a ``goal``
+    field and optional ``id`` and per-goal settings (see ``GOAL_SETTINGS``).
+    Goals without an id are numbered by line. A line that is neither, or an
+    object without a ``goal`` string, gives a spec with only its id and the
+    problem as ``invalid``, so it is reported like a failed goal.
+    """
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            spec = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {
+                "id": line_number,
+                "invalid": f"Line {line_number}: invalid JSON: {e}",
+            }
+            continue
+        if isinstance(spec, str):
+            spec = {"goal": spec}
+        elif not isinstance(spec, dict):
+            yield {
+                "id": line_number,
+                "invalid": f"Line {line_number}: expected a goal string or object, "
+                f"got {type(spec).__name__}",
+            }
+            continue
+        spec.setdefault("id", line_number)
+        if not isinstance(spec.get("goal"), str):
+            yield {
+                "id": spec["id"],
+                "invalid": f"Line {line_number}: expected a goal string "
+                'in the "goal" field',
+            }
+            continue
+        yield spec
+
+
+def run_goal(spec: Dict[str, Any], defaults: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one goal without user interaction and describe the outcome
+
+    Errors are reported in the record instead of raised, so one bad goal does
+    not stop the batch.
+    """
+    from rich.console import Console
+
+    from src.agents.tools import ToolRegistry
+    from src.clients.run_context import RunContext
+
+    settings = {**defaults, **{key: spec[key] for key in GOAL_SETTINGS if key in spec}}
+    record: Dict[str, Any] = {
+        "id": spec["id"],
+        "goal": spec.get("goal"),
+        **{key: settings[key] for key in ("paradigm", "agent_type", "model")},
+    }
+    if "invalid" in spec:
+        record.update(status="error", error=spec["invalid"], duration=0.0)
+        return record
+    react = settings["paradigm"] == "react"
+    started = time.perf_counter()
+    try:
+        agent = create_agent(
+            settings["paradigm"],
+            settings["agent_type"],
+            settings["model"],
+            language=settings["language"],
+            llm=get_client(
+                settings["base_url"],
+                settings["cache_dir"],
+                settings["concurrency_limit"],
+            ),
+            options=settings["options"],
+            context_tokens=settings["context_tokens"],
+            summarize_at=settings["summarize_at"],
+            chat_session=settings["chat_session"],
+            structured_output=not settings["no_structured_output"],
+            tools=ToolRegistry() if settings["no_tools"] else None,
+            router=get_router(
+                settings["route"], settings["keep_alive"], settings["exclusive_models"]
+            ),
+            semantic_cache=(
+                get_semantic_cache(
+                    settings["cache_dir"],
+                    settings["embedding_model"],
+                    settings["similarity_threshold"],
+                )
+                if settings["semantic_cache"]
+                else None
+            ),
+            event_log=(
+                Path(settings["event_log_dir"]) / f"{spec['id']}.jsonl"
+                if settings["event_log_dir"]
+                else None
+            ),
+            hedging=get_hedging(settings["hedge_percentile"], settings["hedge_model"]),
+            check_completion=settings["check_completion"],
+            console=Console(quiet=True),
+            # Only ReAct has a fused mode and samples thoughts
+            **({"fused": True} if settings["fused"] and react else {}),
+            **(
+                {"think_samples": settings["think_samples"]}
+                if settings["think_samples"] > 1 and react
+                else {}
+            ),
+        )
+        limits = {key: settings[key] for key in ("timeout", "max_calls", "max_tokens")}
+        result = agent.run(
+            spec["goal"],
+            max_steps=settings["max_steps"],
+            interactive=False,
+            run_context=(
+                RunContext(**limits)
+                if any(value is not None for value in limits.values())
+                else None
+            ),
+        )
+    except Exception as e:
+        record.update(
+            status="error",
+            error=f"{type(e).__name__}: {e}",
+            duration=time.perf_counter() - started,
+        )
+    else:
+        record.update(status="ok", **result.model_dump(exclude={"goal"}))
+    return record
+
+
+def write_results(futures: Iterable[Future], output: IO[str]) -> int:
+    """Write finished records as JSONL and return how many failed"""
+    errors = 0
+    for future in futures:
+        record = future.result()
+        errors += record["status"] != "ok"
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+    output.flush()
+    return errors
+
+
+@click.command()
+@click.option(
+    "--input",
+    "input_file",
+    type=click.File("r"),
+    default="-",
+    help="JSONL file of goals ('-' for stdin)",
+)
+@click.option(
+    "--output",
+    "output_file",
+    type=click.File("w"),
+    default="-",
+    help="JSONL file for per-goal results ('-' for stdout)",
+)
+@click.option(
+    "--paradigm",
+    type=click.Choice(list(PARADIGMS.keys())),
+    default="react",
+    help="Default reasoning paradigm",
+)
+@click.option(
+    "--agent-type",
+    type=click.Choice(list(AGENT_TYPES.keys())),
+    default="simple-reflex",
+    help="Default AI agent type",
+)
+@click.option("--model", required=True, help="Default Ollama model")
+@click.option("--language", default="en", help="Language for LLM output")
+@click.option("--max-steps", default=5, help="Maximum number of steps per goal")
+@click.option("--workers", default=4, help="Number of goals run concurrently")
+@click.option(
+    "--executor",
+    type=click.Choice(["thread", "process"]),
+    default="thread",
+    help="Run goals in a thread pool or a process pool",
+)
+@click.option(
+    "--base-url",
+    multiple=True,
+    default=["http://localhost:11434"],
+    help="Ollama URL; repeat it to balance the calls over several servers",
+)
+@click.option("--temperature", type=float, help="Sampling temperature for the model")
+@click.option("--seed", type=int, help="Fixed sampling seed for reproducible output")
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    help="Directory of the on-disk response cache (shared between processes)",
+)
+@click.option(
+    "--semantic-cache",
+    is_flag=True,
+    help="Reuse plans and actions of similar earlier requests (stored in --cache-dir)",
+)
+@click.option(
+    "--similarity-threshold",
+    default=0.92,
+    help="Cosine similarity from which --semantic-cache reuses a reply (default: 0.92)",
+)
+@click.option(
+    "--embedding-model",
+    default="nomic-embed-text",
+    help="Ollama embedding model of --semantic-cache",
+)
+@click.option(
+    "--context-tokens",
+    default=2048,
+    help="Approximate token budget for the step history included in prompts",
+)
+@click.option(
+    "--summarize-at",
+    type=click.IntRange(min=1),
+    help="Summarize older steps in the background once the history reaches N tokens",
+)
+@click.option(
+    "--chat-session",
+    is_flag=True,
+    help="Run each goal as one chat so Ollama reuses the prompt prefix",
+)
+@click.option(
+    "--no-structured-output",
+    is_flag=True,
+    help="Do not constrain JSON replies to a schema (for Ollama before 0.5)",
+)
+@click.option(
+    "--fused",
+    is_flag=True,
+    help="Decide thought and action in one call for ReAct goals",
+)
+@click.option(
+    "--no-tools",
+    is_flag=True,
+    help="Simulate every action with the LLM instead of running local tools",
+)
+@click.option(
+    "--route",
+    multiple=True,
+    metavar="PHASE=MODEL",
+    help="Use another model for one phase, e.g. act=llama3.2:1b (repeatable)",
+)
+@click.option(
+    "--keep-alive",
+    help="How long Ollama keeps the models loaded, e.g. 30m (default with --route: 30m)",
+)
+@click.option(
+    "--exclusive-models",
+    is_flag=True,
+    help="Ollama can only hold one model at a time: group calls by model",
+)
+@click.option(
+    "--concurrency-limit",
+    type=click.IntRange(min=1),
+    help="Adapt the number of concurrent Ollama requests (per process), starting at N",
+)
+@click.option(
+    "--hedge-percentile",
+    type=click.FloatRange(0, 100, min_open=True),
+    help="Resend calls slower than this percentile of recent ones; first valid wins",
+)
+@click.option("--hedge-model", help="Model of the resent calls (default: the same)")
+@click.option(
+    "--think-samples",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Sample each thought of ReAct goals N times in parallel, first valid wins",
+)
+@click.option(
+    "--check-completion",
+    is_flag=True,
+    help="Ask after each step whether the goal is achieved and stop once it is",
+)
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Stop each goal after this many seconds, capping each call to the time left",
+)
+@click.option(
+    "--max-calls",
+    type=click.IntRange(min=1),
+    help="Stop each goal after this many LLM calls",
+)
+@click.option(
+    "--max-tokens",
+    type=click.IntRange(min=1),
+    help="Stop each goal once the model generated this many tokens",
+)
+@click.option(
+    "--event-log-dir",
+    type=click.Path(file_okay=False),
+    help="Log each goal's run to <id>.jsonl here; rerunning resumes unfinished goals",
+)
+def main(
+    input_file: IO[str],
+    output_file: IO[str],
+    workers: int,
+    executor: str,
+    temperature: float | None,
+    seed: int | None,
+    **settings: Any,
+) -> None:
+    """Run goals from JSONL without user interaction
+
+    Goals are read lazily and at most twice as many as there are workers are
+    in flight, so memory stays flat however long the input is. Results are
+    written as each goal finishes, in completion order.
+    """
+    from src.clients.routing import keep_alive_seconds, parse_routes
+
+    # Fail before any goal runs rather than once per goal
+    try:
+        parse_routes(list(settings["route"]))
+        keep_alive_seconds(settings["keep_alive"])
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    if settings["hedge_model"] and settings["hedge_percentile"] is None:
+        raise click.UsageError("--hedge-model needs --hedge-percentile")
+    summarize_at = settings["summarize_at"]
+    if summarize_at is not None and summarize_at >= settings["context_tokens"]:
+        raise click.UsageError("--summarize-at must be below --context-tokens")
+
+    options = {}
+    if temperature is not None:
+        options["temperature"] = temperature
+    if seed is not None:
+        options["seed"] = seed
+    defaults = {**settings, "options": options or None}
+
+    executor_class = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+    total = errors = 0
+    with executor_class(max_workers=workers) as pool:
+        pending: set[Future] = set()
+        for spec in read_goals(input_file):
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                errors += write_results(done, output_file)
+            pending.add(pool.submit(run_goal, spec, defaults))
+            total += 1
+        errors += write_results(wait(pending).done, output_file)
+
+    click.echo(f"Completed {total} goals ({errors} failed)", err=True)
+
+
+if __name__ == "__main__":
+    main()
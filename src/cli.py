@@ -1,27 +1,40 @@
+import asyncio
+import json
+import os
 import sys
-from typing import NoReturn
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, NoReturn
 
 import click
-import requests
-from rich.console import Console
-from InquirerPy import inquirer
 
-from src.agents import ReActParadigm, ReWOOParadigm, SimpleReflexAgent, ModelBasedReflexAgent
-from src.clients.ollama_client import OllamaClient
+from src.agents.registry import AGENT_TYPES, PARADIGMS
 
-console = Console()
+# rich, InquirerPy, httpx, pydantic and the paradigms are imported where they
+# are needed so that --help and argument errors return immediately
+if TYPE_CHECKING:
+    from rich.console import Console
 
-PARADIGMS = {"react": ReActParadigm, "rewoo": ReWOOParadigm}
+MODELS_CACHE_PATH = (
+    Path(os.environ.get("XDG_CACHE_HOME", "~/.cache")).expanduser()
+    / "ai-agent"
+    / "models.json"
+)
+MODELS_CACHE_TTL = 300  # seconds
+
+
+@lru_cache(maxsize=None)
+def get_console() -> "Console":
+    """Get the console, importing rich on first use"""
+    from rich.console import Console
 
-AGENT_TYPES = {
-    "simple-reflex": SimpleReflexAgent,
-    "model-based-reflex": ModelBasedReflexAgent,
-    # TODO: Add other agent types after implementation
-}
+    return Console()
 
 
 def exit_with_error(message: str) -> NoReturn:
     """Exit the program with an error message"""
+    console = get_console()
     console.print(f"[red]Error:[/] {message}")
     console.print("\nPlease ensure:")
     console.print("1. Ollama is installed (https://ollama.com)")
@@ -30,21 +43,118 @@ def exit_with_error(message: str) -> NoReturn:
     sys.exit(1)
 
 
-def get_available_models() -> list[str]:
-    """Get list of available models from Ollama"""
+def read_models_cache() -> list[str] | None:
+    """Model names cached on disk, or None if missing or older than the TTL"""
+    try:
+        cached = json.loads(MODELS_CACHE_PATH.read_text())
+        if time.time() - cached["fetched_at"] > MODELS_CACHE_TTL:
+            return None
+        return cached["models"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def write_models_cache(models: list[str]) -> None:
+    """Cache model names on disk; failures only cost a refetch next time"""
     try:
-        client = OllamaClient()
+        MODELS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        temporary = MODELS_CACHE_PATH.with_suffix(f".{os.getpid()}.tmp")
+        temporary.write_text(json.dumps({"fetched_at": time.time(), "models": models}))
+        temporary.replace(MODELS_CACHE_PATH)
+    except OSError:
+        pass
+
+
+def get_available_models(refresh: bool = False) -> list[str]:
+    """Get list of available models from Ollama
+
+    The list is cached on disk for ``MODELS_CACHE_TTL`` seconds; pass
+    ``refresh=True`` to bypass the cache.
+    """
+    if not refresh:
+        cached = read_models_cache()
+        if cached:
+            return cached
+
+    import httpx
+
+    from src.clients.ollama_client import OllamaClient
+    from src.clients.session import SessionConfig
+
+    try:
+        # Fail fast instead of retrying when the service is down
+        client = OllamaClient(config=SessionConfig(max_retries=0, read_timeout=10))
         models = client.models()
         if not models:
             exit_with_error("No models found in Ollama")
-        return [model.name.split(":")[0] for model in models]
-    except requests.exceptions.ConnectionError:
+        names = [model.name for model in models]
+    except httpx.ConnectError:
         exit_with_error("Could not connect to Ollama. Is the service running?")
     except Exception as e:
         exit_with_error(f"Failed to fetch models from Ollama: {str(e)}")
+    write_models_cache(names)
+    return names
+
+
+def is_available(model: str, models: list[str]) -> bool:
+    """Whether ``model`` is one of the ``name:tag`` models
+
+    A name without a tag means its ``latest`` tag, as it does for Ollama.
+    """
+    if ":" not in model:
+        model = f"{model}:latest"
+    return model in models
+
+
+def validate_model(
+    ctx: click.Context, param: click.Parameter, value: str | None
+) -> str | None:
+    """Check --model against the available models, only when it is given"""
+    if value is None:
+        return None
+    models = get_available_models()
+    if not is_available(value, models):
+        # The cached list may be stale, so ask Ollama before rejecting
+        models = get_available_models(refresh=True)
+    if not is_available(value, models):
+        raise click.BadParameter(f"'{value}' is not one of {', '.join(models)}")
+    return value
+
+
+def validate_routes(
+    ctx: click.Context, param: click.Parameter, value: tuple[str, ...]
+) -> dict[str, str]:
+    """Parse --route PHASE=MODEL options and check their models"""
+    from src.clients.routing import parse_routes
+
+    try:
+        routes = parse_routes(list(value))
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    for model in set(routes.values()):
+        validate_model(ctx, param, model)
+    return routes
+
+
+def validate_keep_alive(
+    ctx: click.Context, param: click.Parameter, value: str | None
+) -> str | None:
+    """Check that --keep-alive is a duration Ollama understands"""
+    if value is None:
+        return None
+    from src.clients.routing import keep_alive_seconds
+
+    try:
+        keep_alive_seconds(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    return value
+
 
 def select_paradigm() -> str:
     """Select reasoning paradigm interactively"""
+    from InquirerPy import inquirer
+
     return inquirer.select(
         message="Select reasoning paradigm:",
         choices=list(PARADIGMS.keys()),
@@ -53,6 +163,8 @@ def select_paradigm() -> str:
 
 def select_agent_type() -> str:
     """Select agent type interactively"""
+    from InquirerPy import inquirer
+
     return inquirer.select(
         message="Select agent type:",
         choices=list(AGENT_TYPES.keys()),
@@ -61,6 +173,8 @@ def select_agent_type() -> str:
 
 def select_model() -> str:
     """Select model interactively"""
+    from InquirerPy import inquirer
+
     return inquirer.select(
         message="Select model:",
         choices=get_available_models(),
@@ -68,6 +182,8 @@ def select_model() -> str:
 
 def select_language() -> str:
     """Select language interactively"""
+    from InquirerPy import inquirer
+
     return inquirer.select(
         message="Select language:",
         choices=["en", "ja"],
@@ -88,7 +204,7 @@ def select_language() -> str:
 )
 @click.option(
     "--model",
-    type=click.Choice(get_available_models()),
+    callback=validate_model,
     help="Select LLM model from available Ollama models",
 )
 @click.option("--max-steps", default=5, help="Maximum number of execution steps")
@@ -98,6 +214,125 @@ def select_language() -> str:
     type=str,
     help="Language for LLM output (e.g., en, ja)",
 )
+@click.option("--temperature", type=float, help="Sampling temperature for the model")
+@click.option("--seed", type=int, help="Fixed sampling seed for reproducible output")
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    help="Directory of the on-disk response cache (shared between processes)",
+)
+@click.option(
+    "--semantic-cache",
+    is_flag=True,
+    help="Reuse plans and actions of similar earlier requests (stored in --cache-dir)",
+)
+@click.option(
+    "--similarity-threshold",
+    default=0.92,
+    help="Cosine similarity from which --semantic-cache reuses a reply (default: 0.92)",
+)
+@click.option(
+    "--embedding-model",
+    default="nomic-embed-text",
+    help="Ollama embedding model of --semantic-cache",
+)
+@click.option(
+    "--context-tokens",
+    default=2048,
+    help="Approximate token budget for the step history included in prompts",
+)
+@click.option(
+    "--summarize-at",
+    type=click.IntRange(min=1),
+    help="Summarize older steps in the background once the history reaches N tokens",
+)
+@click.option(
+    "--chat-session",
+    is_flag=True,
+    help="Run each goal as one chat so Ollama reuses the prompt prefix",
+)
+@click.option(
+    "--no-structured-output",
+    is_flag=True,
+    help="Do not constrain JSON replies to a schema (for Ollama before 0.5)",
+)
+@click.option(
+    "--fused",
+    is_flag=True,
+    help="ReAct only: decide thought and action in one schema-constrained call",
+)
+@click.option(
+    "--no-tools",
+    is_flag=True,
+    help="Simulate every action with the LLM instead of running local tools",
+)
+@click.option(
+    "--route",
+    "routes",
+    multiple=True,
+    callback=validate_routes,
+    metavar="PHASE=MODEL",
+    help="Use another model for one phase, e.g. act=llama3.2:1b (repeatable)",
+)
+@click.option(
+    "--keep-alive",
+    callback=validate_keep_alive,
+    help="How long Ollama keeps the models loaded, e.g. 30m (default with --route: 30m)",
+)
+@click.option(
+    "--exclusive-models",
+    is_flag=True,
+    help="Ollama can only hold one model at a time: group calls by model",
+)
+@click.option(
+    "--concurrency-limit",
+    type=click.IntRange(min=1),
+    help="Adapt the number of concurrent Ollama requests to the server, starting at N",
+)
+@click.option(
+    "--hedge-percentile",
+    type=click.FloatRange(0, 100, min_open=True),
+    help="Resend calls slower than this percentile of recent ones; first valid wins",
+)
+@click.option("--hedge-model", help="Model of the resent calls (default: the same)")
+@click.option(
+    "--think-samples",
+    default=1,
+    type=click.IntRange(min=1),
+    help="ReAct only: sample each thought N times in parallel, first valid wins",
+)
+@click.option(
+    "--check-completion",
+    is_flag=True,
+    help="Ask after each step whether the goal is achieved and stop once it is",
+)
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Stop the run after this many seconds, capping each call to the time left",
+)
+@click.option(
+    "--max-calls",
+    type=click.IntRange(min=1),
+    help="Stop the run after this many LLM calls",
+)
+@click.option(
+    "--max-tokens",
+    type=click.IntRange(min=1),
+    help="Stop the run once the model generated this many tokens",
+)
+@click.option(
+    "--event-log",
+    "event_log_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Log the run here as it happens; an existing log is resumed",
+)
+@click.option(
+    "--telemetry",
+    "telemetry_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write per-call LLM metrics to this file (.prom for Prometheus, else JSON)",
+)
 def main(
     paradigm: str,
     agent_type: str,
@@ -105,11 +340,45 @@ def main(
     max_steps: int,
     verbose: bool,
     language: str,
+    temperature: float | None,
+    seed: int | None,
+    cache_dir: str | None,
+    semantic_cache: bool,
+    similarity_threshold: float,
+    embedding_model: str,
+    context_tokens: int,
+    summarize_at: int | None,
+    chat_session: bool,
+    no_structured_output: bool,
+    fused: bool,
+    no_tools: bool,
+    routes: dict[str, str],
+    keep_alive: str | None,
+    exclusive_models: bool,
+    concurrency_limit: int | None,
+    hedge_percentile: float | None,
+    hedge_model: str | None,
+    think_samples: int,
+    check_completion: bool,
+    timeout: float | None,
+    max_calls: int | None,
+    max_tokens: int | None,
+    event_log_path: Path | None,
+    telemetry_path: Path | None,
 ) -> None:
     """CLI for AI Agent experimentation
 
     Allows experimenting with different combinations of reasoning paradigms and agent types.
     """
+    console = get_console()
+    if fused and paradigm not in (None, "react"):
+        raise click.UsageError("--fused only applies to the react paradigm")
+    if think_samples > 1 and paradigm not in (None, "react"):
+        raise click.UsageError("--think-samples only applies to the react paradigm")
+    if hedge_model and hedge_percentile is None:
+        raise click.UsageError("--hedge-model needs --hedge-percentile")
+    if summarize_at is not None and summarize_at >= context_tokens:
+        raise click.UsageError("--summarize-at must be below --context-tokens")
     console.print(f"[bold blue]Selected Configuration:[/]")
     
     # If paradigm is not specified, select interactively
@@ -135,19 +404,117 @@ def main(
     console.print(f"Verbose: {verbose}")
     console.print(f"Language: {language}")
 
-    # Instantiate paradigm
-    paradigm_class = PARADIGMS[paradigm]
-    paradigm_instance = paradigm_class(model_name=model, language=language)
+    from src.agents.paradigms.checkpoint import EventLog
+    from src.agents.registry import create_agent
+    from src.agents.tools import ToolRegistry
+    from src.clients.cache import ResponseCache
+    from src.clients.hedging import Hedging
+    from src.clients.limiter import AdaptiveLimiter
+    from src.clients.ollama_client import AsyncOllamaClient
+    from src.clients.routing import ModelRouter
+    from src.clients.run_context import RunContext
+    from src.clients.semantic_cache import SemanticCache
 
-    # Instantiate agent
-    agent_class = AGENT_TYPES[agent_type]
-    agent = agent_class(paradigm=paradigm_instance)
+    # Only deterministic runs (temperature 0 or a fixed seed) hit the cache
+    options = {}
+    if temperature is not None:
+        options["temperature"] = temperature
+    if seed is not None:
+        options["seed"] = seed
+    llm = AsyncOllamaClient(
+        cache=ResponseCache(directory=cache_dir),
+        limiter=AdaptiveLimiter(concurrency_limit) if concurrency_limit else None,
+    )
+    event_log = EventLog(event_log_path) if event_log_path is not None else None
+    router = None
+    if routes or keep_alive or exclusive_models:
+        router = ModelRouter(
+            routes, keep_alive=keep_alive or "30m", exclusive=exclusive_models
+        )
 
-    # Get goal from user
-    goal = click.prompt("\nEnter your goal", type=str)
+    # Instantiate paradigm and agent
+    agent = create_agent(
+        paradigm,
+        agent_type,
+        model,
+        language=language,
+        llm=llm,
+        options=options or None,
+        context_tokens=context_tokens,
+        summarize_at=summarize_at,
+        chat_session=chat_session,
+        structured_output=not no_structured_output,
+        tools=ToolRegistry() if no_tools else None,
+        router=router,
+        event_log=event_log,
+        semantic_cache=(
+            SemanticCache(
+                directory=cache_dir,
+                embedding_model=embedding_model,
+                threshold=similarity_threshold,
+            )
+            if semantic_cache
+            else None
+        ),
+        hedging=(
+            Hedging(percentile=hedge_percentile, model=hedge_model)
+            if hedge_percentile is not None
+            else None
+        ),
+        check_completion=check_completion,
+        # Interactively chosen paradigms other than ReAct ignore these
+        **({"fused": True} if fused and paradigm == "react" else {}),
+        **(
+            {"think_samples": think_samples}
+            if think_samples > 1 and paradigm == "react"
+            else {}
+        ),
+    )
+
+    if router is not None:
+        # Load the models while the user types the goal
+        from src.clients.runner import get_loop
+
+        asyncio.run_coroutine_threadsafe(router.preload(llm, model), get_loop())
+
+    # Get goal from user, unless an interrupted run is resumed
+    goal = event_log.goal if event_log is not None else None
+    if goal is not None:
+        console.print(f"\nResuming the run logged in {event_log_path}")
+    else:
+        goal = click.prompt("\nEnter your goal", type=str)
+
+    # Run agent; the limits start counting now
+    run_context = None
+    if timeout is not None or max_calls is not None or max_tokens is not None:
+        run_context = RunContext(timeout, max_calls=max_calls, max_tokens=max_tokens)
+    try:
+        result = agent.run(
+            goal=goal, max_steps=max_steps, verbose=verbose, run_context=run_context
+        )
+    except KeyboardInterrupt:
+        # The run's requests were closed, so Ollama stopped generating
+        console.print("\n[bold red]Run cancelled[/]")
+        sys.exit(130)
 
-    # Run agent
-    agent.run(goal=goal, max_steps=max_steps, verbose=verbose)
+    report = result.telemetry
+    if verbose and report is not None:
+        console.print("\n[bold]LLM Time:[/]")
+        console.print(
+            f"{report.calls} calls ({report.cached_calls} cached), "
+            f"{report.wall_time:.2f}s total: {report.load_time:.2f}s loading, "
+            f"{report.prompt_eval_time:.2f}s reading prompts, "
+            f"{report.eval_time:.2f}s generating, {report.other_time:.2f}s other"
+        )
+        if report.tokens_per_second:
+            console.print(f"{report.tokens_per_second:.1f} tokens/s")
+    if telemetry_path is not None:
+        telemetry = agent.paradigm.telemetry
+        telemetry_path.write_text(
+            telemetry.to_prometheus()
+            if telemetry_path.suffix == ".prom"
+            else telemetry.to_json()
+        )
 
 
 if __name__ == "__main__":
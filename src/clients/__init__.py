@@ -1,3 +1,35 @@
-from .ollama_client import OllamaClient
+import importlib
+from typing import Any
 
-__all__ = ["OllamaClient"]
+# Exports are imported on first access to keep startup cheap (httpx, pydantic)
+_EXPORTS = {
+    "AdaptiveLimiter": ".limiter",
+    "AsyncOllamaClient": ".ollama_client",
+    "LoadBalancer": ".balancer",
+    "OllamaClient": ".ollama_client",
+    "RunContext": ".run_context",
+    "get_default_client": ".ollama_client",
+    "Hedging": ".hedging",
+    "SemanticCache": ".semantic_cache",
+    "SessionConfig": ".session",
+    "Telemetry": ".telemetry",
+}
+
+__all__ = [
+    "AdaptiveLimiter",
+    "AsyncOllamaClient",
+    "Hedging",
+    "LoadBalancer",
+    "OllamaClient",
+    "RunContext",
+    "SemanticCache",
+    "SessionConfig",
+    "Telemetry",
+    "get_default_client",
+]
+
+
+def __getattr__(name: str) -> Any:
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
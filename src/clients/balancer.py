@@ -0,0 +1,199 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Sequence, Set
+
+import httpx
+
+from .session import SessionConfig, get_session
+
+# A node without the model loaded counts this many extra requests, so nodes
+# that have it loaded are preferred until they are that much busier
+LOAD_PENALTY = 2
+
+
+def model_key(name: str) -> str:
+    """Model name without the implicit ``:latest`` tag"""
+    return name.removesuffix(":latest")
+
+
+class Node:
+    """One Ollama server of a pool, as last seen by the balancer"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.healthy = True
+        # Failed calls take the node out of rotation until then (monotonic)
+        self.down_until = 0.0
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        # Installed models, unknown until the first health check
+        self.models: Set[str] | None = None
+        self.loaded: Set[str] = set()
+
+    def __repr__(self) -> str:
+        return (
+            f"Node({self.base_url!r}, healthy={self.available}, "
+            f"outstanding={self.outstanding}, loaded={sorted(self.loaded)})"
+        )
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and time.monotonic() >= self.down_until
+
+    def serves(self, model: str) -> bool:
+        """Whether the node may have ``model`` installed"""
+        return self.models is None or model_key(model) in self.models
+
+    def cost(self, model: str | None) -> int:
+        """How busy the node is for a call to ``model``"""
+        if model is None or model_key(model) in self.loaded:
+            return self.outstanding
+        return self.outstanding + LOAD_PENALTY
+
+
+class Lease:
+    """The node serving one call, moved to another one when the call fails"""
+
+    def __init__(self, balancer: "LoadBalancer", model: str | None):
+        self.balancer = balancer
+        self.model = model
+        self.tried: List[Node] = []
+        self.node = balancer._pick(model, ()) or balancer.nodes[0]
+        self._take(self.node)
+
+    @property
+    def base_url(self) -> str:
+        return self.node.base_url
+
+    def _take(self, node: Node) -> None:
+        self.node = node
+        self.tried.append(node)
+        node.outstanding += 1
+        node.requests += 1
+
+    def failed(self) -> bool:
+        """Take the node out for a while and move to another one
+
+        Returns False if every node has been tried, in which case the call
+        stays on its node.
+        """
+        node = self.node
+        node.failures += 1
+        node.down_until = time.monotonic() + self.balancer.cooldown
+        other = self.balancer._pick(self.model, self.tried)
+        if other is None:
+            return False
+        node.outstanding -= 1
+        self._take(other)
+        return True
+
+    def succeeded(self) -> None:
+        """The node answered, so it has the model and keeps it loaded for a while"""
+        if self.model is not None:
+            self.node.loaded.add(model_key(self.model))
+            if self.node.models is not None:
+                self.node.models.add(model_key(self.model))
+
+    def release(self) -> None:
+        self.node.outstanding -= 1
+
+
+class LoadBalancer:
+    """Spreads calls over several Ollama servers
+
+    Each call goes to the available node with the fewest outstanding calls
+    among those that have its model installed, preferring nodes that already
+    have the model loaded (see ``LOAD_PENALTY``), so concurrent sessions
+    share the nodes without waiting for model loads. Nodes are checked every
+    ``check_interval`` seconds: a node that does not answer ``/api/tags`` is
+    taken out of rotation, and ``/api/tags`` and ``/api/ps`` tell which
+    models it has installed and loaded. A call that fails on a node (error,
+    busy status or timeout) moves to another node right away, and the node
+    is left out for ``cooldown`` seconds.
+
+    Nodes are expected to serve the same models under the same names. Like
+    ``ModelRouter``, a balancer must only be used from one event loop.
+    """
+
+    def __init__(
+        self,
+        base_urls: Sequence[str],
+        check_interval: float = 10.0,
+        cooldown: float = 5.0,
+        config: SessionConfig | None = None,
+    ):
+        if not base_urls:
+            raise ValueError("A load balancer needs at least one base URL")
+        self.nodes = [Node(base_url) for base_url in dict.fromkeys(base_urls)]
+        self.check_interval = check_interval
+        self.cooldown = cooldown
+        # Health checks fail fast instead of waiting on a stuck node
+        self.config = config or SessionConfig(
+            connect_timeout=2.0, read_timeout=5.0, max_retries=0
+        )
+        self._checked: float | None = None
+        self._checking: asyncio.Future | None = None
+
+    def _pick(self, model: str | None, exclude: Sequence[Node]) -> Node | None:
+        """The node for a call to ``model``, or None if all are excluded"""
+        candidates = [node for node in self.nodes if node not in exclude]
+        if not candidates:
+            return None
+        # Nodes believed down are only used when nothing else is left
+        candidates = [node for node in candidates if node.available] or candidates
+        if model is not None:
+            serving = [node for node in candidates if node.serves(model)]
+            candidates = serving or candidates
+        return min(candidates, key=lambda node: (node.cost(model), node.requests))
+
+    @asynccontextmanager
+    async def lease(self, model: str | None) -> AsyncIterator[Lease]:
+        """Choose the node of one call to ``model`` (None: any model)"""
+        await self._check_if_due()
+        lease = Lease(self, model)
+        try:
+            yield lease
+        finally:
+            lease.release()
+
+    async def _check_if_due(self) -> None:
+        if self._checking is not None and not self._checking.done():
+            if self._checked is None:
+                # First calls wait to learn where the models are
+                await asyncio.shield(self._checking)
+            return
+        due = self._checked is None or (
+            time.monotonic() - self._checked > self.check_interval
+        )
+        if due:
+            self._checking = asyncio.ensure_future(self.check())
+            if self._checked is None:
+                await asyncio.shield(self._checking)
+
+    async def check(self) -> None:
+        """Check every node now"""
+        try:
+            await asyncio.gather(*(self._check(node) for node in self.nodes))
+        finally:
+            self._checked = time.monotonic()
+
+    async def _check(self, node: Node) -> None:
+        session = get_session(self.config)
+        try:
+            tags = await session.get(f"{node.base_url}/api/tags")
+            tags.raise_for_status()
+            models = {model_key(model["name"]) for model in tags.json()["models"]}
+        except (httpx.HTTPError, ValueError, KeyError):
+            node.healthy = False
+            return
+        node.healthy = True
+        node.models = models
+        try:
+            ps = await session.get(f"{node.base_url}/api/ps")
+            ps.raise_for_status()
+            node.loaded = {model_key(model["name"]) for model in ps.json()["models"]}
+        except (httpx.HTTPError, ValueError, KeyError):
+            # Older servers have no /api/ps; keep what calls have shown
+            pass
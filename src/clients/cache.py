@@ -0,0 +1,181 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from pydantic import BaseModel
+
+
+class CacheStats(BaseModel):
+    """Hit/miss counters of a response cache"""
+
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def is_cacheable(options: Dict[str, Any] | None) -> bool:
+    """Only deterministic generations (temperature 0 or a fixed seed) are cached"""
+    if not options:
+        return False
+    return options.get("temperature") == 0 or options.get("seed") is not None
+
+
+def make_key(**parts: Any) -> str:
+    """Build a stable cache key from the parts of a request"""
+    encoded = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier cache of LLM responses
+
+    An in-memory LRU sits in front of an optional SQLite store. The store runs
+    in WAL mode so several worker processes can share one directory. Entries
+    expire after ``max_age`` seconds and the least recently used ones are
+    evicted once a tier exceeds its size limit.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path | None = None,
+        max_entries: int = 1024,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+        max_age: float | None = 7 * 24 * 3600,
+    ):
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.max_age = max_age
+        self.stats = CacheStats()
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.path: Path | None = None
+        if directory is not None:
+            self.path = Path(directory).expanduser() / "responses.sqlite3"
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connect().execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )"""
+            )
+            self._connect().execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection to the store"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.max_age is not None and now - created > self.max_age
+
+    def get(self, key: str) -> str | None:
+        """Look up a response, promoting disk hits into memory"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self.stats.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+        if self.path is not None:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and not self._expired(row[1], now):
+                connection.execute(
+                    "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+                )
+                self._remember(key, row[0], row[1])
+                with self._lock:
+                    self.stats.disk_hits += 1
+                return row[0]
+
+        with self._lock:
+            self.stats.misses += 1
+        return None
+
+    def put(self, key: str, value: str) -> None:
+        """Store a response in both tiers"""
+        now = time.time()
+        self._remember(key, value, now)
+        if self.path is not None:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now),
+            )
+            self._evict_disk(connection, now)
+        with self._lock:
+            self.stats.stores += 1
+
+    def _remember(self, key: str, value: str, created: float) -> None:
+        """Insert into the memory tier, evicting the least recently used"""
+        with self._lock:
+            self._memory[key] = (value, created)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.stats.evictions += 1
+
+    def _evict_disk(self, connection: sqlite3.Connection, now: float) -> None:
+        """Drop expired entries, then least recently used ones over the size cap"""
+        evicted = 0
+        if self.max_age is not None:
+            evicted += connection.execute(
+                "DELETE FROM responses WHERE created < ?", (now - self.max_age,)
+            ).rowcount
+        (total,) = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if total > self.max_disk_bytes:
+            evicted += connection.execute(
+                """DELETE FROM responses WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY accessed DESC) AS kept
+                        FROM responses
+                    ) WHERE kept > ?
+                )""",
+                (self.max_disk_bytes,),
+            ).rowcount
+        if evicted:
+            with self._lock:
+                self.stats.evictions += evicted
+
+    def clear(self) -> None:
+        """Remove every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+        if self.path is not None:
+            self._connect().execute("DELETE FROM responses")
@@ -0,0 +1,82 @@
+import copy
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Dict, List
+
+from .json_stream import parse_json_stream
+from .ollama_client import AsyncOllamaClient
+
+
+class ChatSession:
+    """Append-only conversation with one model
+
+    Every request resends the conversation so far followed by one new user
+    message. Because earlier messages never change, Ollama can reuse the
+    prompt state it evaluated for the previous request and only has to read
+    the new tokens.
+    """
+
+    def __init__(
+        self,
+        llm: AsyncOllamaClient,
+        model_name: str,
+        system: str | None = None,
+        options: Dict[str, Any] | None = None,
+    ):
+        self.llm = llm
+        self.model_name = model_name
+        self.options = options
+        self.messages: List[Dict[str, str]] = []
+        if system:
+            self.messages.append({"role": "system", "content": system})
+
+    def fork(self) -> "ChatSession":
+        """Branch off a session sharing this conversation as its prefix"""
+        forked = copy.copy(self)
+        forked.messages = list(self.messages)
+        return forked
+
+    def append(self, role: str, content: str) -> None:
+        """Add a message to the conversation without sending anything"""
+        self.messages = self.messages + [{"role": role, "content": content}]
+
+    async def send_stream(
+        self, content: str, model_name: str | None = None, **kwargs: Any
+    ) -> AsyncIterator[str]:
+        """Send a user message and yield the reply tokens as they arrive
+
+        The reply is appended to the conversation once the stream ends or is
+        closed, so a reply cut short keeps exactly the text that was used.
+        ``model_name`` answers this message with another model than the
+        session's; that model has to read the whole conversation.
+        """
+        messages = self.messages + [{"role": "user", "content": content}]
+        tokens = []
+        try:
+            async with aclosing(
+                self.llm.chat_stream(
+                    model_name or self.model_name,
+                    messages,
+                    options=self.options,
+                    **kwargs,
+                )
+            ) as stream:
+                async for token in stream:
+                    tokens.append(token)
+                    yield token
+        finally:
+            if tokens:
+                messages.append({"role": "assistant", "content": "".join(tokens)})
+                self.messages = messages
+
+    async def send(self, content: str, **kwargs: Any) -> str:
+        """Send a user message and return the full reply"""
+        return "".join([token async for token in self.send_stream(content, **kwargs)])
+
+    async def send_json(
+        self,
+        content: str,
+        on_field: Callable[[str, Any], None] | None = None,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        """Send a user message asking for a JSON object and parse the reply"""
+        return await parse_json_stream(self.send_stream(content, **kwargs), on_field)
@@ -0,0 +1,69 @@
+from collections import defaultdict, deque
+from typing import Deque, Dict, Tuple
+
+from pydantic import BaseModel
+
+
+class HedgingStats(BaseModel):
+    """Hedged calls and how they ended"""
+
+    calls: int = 0
+    hedges: int = 0
+    # Calls answered first by a hedge rather than by the original request
+    hedge_wins: int = 0
+    # Requests cancelled because another one answered first
+    cancelled: int = 0
+
+
+class Hedging:
+    """When to send a duplicate of a call that is slower than usual
+
+    A structured call still unanswered after the ``percentile`` of the recent
+    durations of its model and phase (``initial_delay`` until ``min_samples``
+    are known, never less than ``min_delay``) is sent again, at most
+    ``max_hedges`` times, and the first reply that parses wins; the others
+    are cancelled, which stops their generation. A reply that does not parse
+    is hedged right away. Duplicates go to ``model`` when set (e.g. a
+    smaller model), and to another server when the client has a balancer.
+
+    Hedges cost extra calls on the slow path only: with the 95th percentile
+    about one call in twenty is sent twice. Like ``ModelRouter``, a policy
+    can be shared by the paradigms of one event loop.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95,
+        initial_delay: float = 5.0,
+        min_delay: float = 0.1,
+        max_hedges: int = 1,
+        model: str | None = None,
+        window: int = 100,
+        min_samples: int = 10,
+    ):
+        if not 0 < percentile <= 100:
+            raise ValueError(f"Percentile must be in (0, 100], got {percentile}")
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_hedges = max_hedges
+        self.model = model
+        self.min_samples = min_samples
+        self.stats = HedgingStats()
+        # Recent call durations by (model, phase)
+        self._durations: Dict[Tuple[str, str | None], Deque[float]] = defaultdict(
+            lambda: deque(maxlen=window)
+        )
+
+    def delay(self, model: str, phase: str | None) -> float:
+        """Seconds to wait for a call before hedging it"""
+        durations = self._durations[(model, phase)]
+        if len(durations) < self.min_samples:
+            return max(self.min_delay, self.initial_delay)
+        ordered = sorted(durations)
+        rank = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay, ordered[rank])
+
+    def observe(self, model: str, phase: str | None, seconds: float) -> None:
+        """Note how long an answered call took"""
+        self._durations[(model, phase)].append(seconds)
@@ -0,0 +1,214 @@
+import json
+import re
+from typing import Any, AsyncGenerator, Callable, Dict, List, Tuple
+
+# Opening or closing code fence markers, e.g. ```json
+FENCE_PATTERN = re.compile(r"```[\w-]*")
+
+
+class JSONStreamParser:
+    """Incremental parser for a JSON object arriving in chunks
+
+    Text before the first ``{`` (prose, code fence markers) is skipped. Each
+    top-level field is reported as soon as its value closes, and ``done`` is
+    set once the outer object is complete so the caller can stop generating.
+    """
+
+    def __init__(self) -> None:
+        self.result: Dict[str, Any] = {}
+        self.done = False
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._field_start = 0
+        self._value_open = False
+        self._value_depth = 0
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk of text
+
+        Args:
+            chunk: The next piece of generated text
+
+        Returns:
+            The top-level ``(key, value)`` pairs completed by this chunk
+        """
+        fields: List[Tuple[str, Any]] = []
+        for char in chunk:
+            if self.done:
+                break
+            if self._depth == 0:
+                if char == "{":
+                    self._buffer.append(char)
+                    self._depth = 1
+                    self._field_start = 1
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._value_open and self._depth == 1:
+                        fields += self._close_field(len(self._buffer))
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char == ":" and self._depth == 1 and not self._value_open:
+                self._value_open = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    # Scalar values at the end of the object close here
+                    fields += self._close_field(len(self._buffer) - 1)
+                    self.done = True
+                elif self._depth == 1 and self._value_open:
+                    fields += self._close_field(len(self._buffer))
+            elif char == "," and self._depth == 1:
+                fields += self._close_field(len(self._buffer) - 1)
+                self._field_start = len(self._buffer)
+        return fields
+
+    def _close_field(self, end: int) -> List[Tuple[str, Any]]:
+        """Parse the field spanning from the last separator up to ``end``"""
+        if not self._value_open:
+            return []
+        self._value_open = False
+        segment = "".join(self._buffer[self._field_start : end]).strip()
+        if not segment:
+            return []
+        try:
+            field = json.loads("{" + segment + "}")
+        except json.JSONDecodeError:
+            # Scalar still being generated (e.g. a number cut mid-way)
+            self._value_open = True
+            return []
+        pairs = list(field.items())
+        self.result.update(field)
+        return pairs
+
+    @property
+    def text(self) -> str:
+        """The raw JSON text consumed so far"""
+        return "".join(self._buffer)
+
+
+def extract_json(text: str) -> Dict[str, Any] | None:
+    """Recover a JSON object from free text
+
+    Tolerates prose around the object, code fences (complete or not) and an
+    object cut off before its end, whose open string and brackets are closed
+    (dropping a trailing member that cannot be completed).
+
+    Returns:
+        The first object found, or None if there is none
+    """
+    text = FENCE_PATTERN.sub("", text)
+    decoder = json.JSONDecoder()
+    start = text.find("{")
+    while start != -1:
+        try:
+            value, _ = decoder.raw_decode(text, start)
+        except json.JSONDecodeError:
+            value = _close_truncated(text[start:])
+        if isinstance(value, dict):
+            return value
+        start = text.find("{", start + 1)
+    return None
+
+
+def _close_truncated(fragment: str) -> Any:
+    """Parse a JSON value that was cut off, closing whatever is still open"""
+    closers: List[str] = []
+    # Positions of separators where a shorter prefix could be closed instead
+    cuts: List[Tuple[int, str]] = []
+    in_string = escape = False
+    for index, char in enumerate(fragment):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if not closers:
+                return None
+            closers.pop()
+            if not closers:
+                # A complete value that is not valid JSON
+                return None
+        elif char == ",":
+            cuts.append((index, "".join(reversed(closers))))
+
+    candidates = [fragment + ('"' if in_string else "") + "".join(reversed(closers))]
+    candidates += [fragment[:index] + closing for index, closing in reversed(cuts)]
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+async def read_json_stream(
+    tokens: AsyncGenerator[str, None],
+    on_field: Callable[[str, Any], None] | None = None,
+) -> Tuple[Dict[str, Any], bool]:
+    """Read a streamed JSON object, closing the stream once the object is complete
+
+    Args:
+        tokens: Streamed completion; closed early to cancel any trailing text
+        on_field: Called with each top-level field as soon as it closes
+
+    Returns:
+        The parsed object, and whether it was complete; an incomplete one was
+        recovered from text cut off before its end (see ``extract_json``)
+
+    Raises:
+        ValueError: If the stream ends without an object that can be recovered
+    """
+    parser = JSONStreamParser()
+    text = []
+    try:
+        async for token in tokens:
+            text.append(token)
+            for key, value in parser.feed(token):
+                if on_field:
+                    on_field(key, value)
+            if parser.done:
+                break
+    finally:
+        # Cancel whatever the model would have generated after the object
+        await tokens.aclose()
+
+    if not parser.done:
+        recovered = extract_json("".join(text))
+        if recovered is None:
+            raise ValueError(f"Incomplete JSON from LLM: {''.join(text)}")
+        return recovered, False
+    return parser.result, True
+
+
+async def parse_json_stream(
+    tokens: AsyncGenerator[str, None],
+    on_field: Callable[[str, Any], None] | None = None,
+) -> Dict[str, Any]:
+    """Read a streamed JSON object, complete or recovered (see ``read_json_stream``)
+
+    Raises:
+        ValueError: If the stream ends without an object that can be recovered
+    """
+    result, _ = await read_json_stream(tokens, on_field)
+    return result
@@ -0,0 +1,311 @@
+import asyncio
+import itertools
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Deque, Dict, Iterator, List, Tuple
+
+import httpx
+from pydantic import BaseModel
+
+# Priority classes, most urgent first
+PRIORITIES = {"interactive": 0, "batch": 1, "background": 2}
+
+# Statuses with which Ollama says it is too busy for the request
+OVERLOAD_STATUS_CODES = (429, 503)
+
+# Queueing delays shorter than this are noise, not congestion (seconds)
+MIN_QUEUE_DELAY = 0.05
+
+# Weight of the newest call in the average time a call holds its slot
+SERVICE_TIME_WEIGHT = 0.2
+
+
+class Overloaded(RuntimeError):
+    """The limiter rejected a call instead of letting it wait
+
+    Raised when the queue is full and the call is the least urgent one, or
+    when it could not be sent before its deadline.
+    """
+
+
+_admission: ContextVar[Tuple[str, float | None]] = ContextVar(
+    "admission", default=("interactive", None)
+)
+
+
+@contextmanager
+def admission(
+    priority: str | None = None, deadline: float | None = None
+) -> Iterator[None]:
+    """Set the priority class and deadline of the LLM calls made inside the block
+
+    ``priority`` is a key of ``PRIORITIES`` (calls outside any block are
+    interactive) and ``deadline`` a ``time.monotonic()`` time after which a
+    call still waiting for the limiter is rejected. Blocks nest: the least
+    urgent priority and the earliest deadline apply, so calls made for
+    background work stay in the background. Like telemetry scopes, blocks
+    follow the asyncio task they were entered in.
+
+    Raises:
+        ValueError: If the priority is unknown
+    """
+    if priority is not None and priority not in PRIORITIES:
+        raise ValueError(
+            f"Unknown priority {priority!r}, expected one of {', '.join(PRIORITIES)}"
+        )
+    current_priority, current_deadline = _admission.get()
+    if priority is None or PRIORITIES[priority] < PRIORITIES[current_priority]:
+        priority = current_priority
+    if current_deadline is not None and (
+        deadline is None or current_deadline < deadline
+    ):
+        deadline = current_deadline
+    token = _admission.set((priority, deadline))
+    try:
+        yield
+    finally:
+        _admission.reset(token)
+
+
+class LimiterStats(BaseModel):
+    """Calls seen by a limiter; times are summed over calls, in seconds"""
+
+    admitted: int = 0
+    queued: int = 0
+    rejected: int = 0
+    congested: int = 0
+    queue_time: float = 0.0
+
+
+class Permit:
+    """A call admitted by the limiter, reporting how the server coped with it"""
+
+    __slots__ = ("model", "admitted", "queue_time", "saturated", "latency", "congested")
+
+    def __init__(self, model: str, queue_time: float, saturated: bool):
+        self.model = model
+        self.admitted = time.monotonic()
+        self.queue_time = queue_time
+        # Whether the call used the last free slot, i.e. the limit was reached
+        self.saturated = saturated
+        self.latency: float | None = None
+        self.congested = False
+
+    def responded(self, discount: float = 0.0) -> None:
+        """Note the first response; ``discount`` is server time that is not queueing"""
+        if self.latency is None:
+            self.latency = max(0.0, time.monotonic() - self.admitted - discount)
+
+    def discount(self, seconds: float) -> None:
+        """Remove server time learned later (e.g. a model load) from the latency"""
+        if self.latency is not None:
+            self.latency = max(0.0, self.latency - seconds)
+
+    def overloaded(self) -> None:
+        """The server turned the call away as busy or did not answer in time"""
+        self.congested = True
+
+
+class AdaptiveLimiter:
+    """Client-side admission control for one Ollama server
+
+    At most ``limit`` calls are sent at a time; the others wait, most urgent
+    priority class first, then in arrival order. The limit adapts to the
+    server (AIMD): it grows by about one per round of calls that fill it, and
+    shrinks by ``backoff`` when a call finds the server congested, i.e. it is
+    rejected as busy (429/503), times out, or waits for its first token more
+    than ``tolerance`` times the lowest recent wait for its model (the server
+    queued it). Extra calls thus wait in the client, by priority, instead of
+    in the server's queue, where every call slows down alike.
+
+    Calls are rejected with ``Overloaded`` rather than left waiting when the
+    queue already holds ``max_queue`` calls (a less urgent waiting call is
+    shed instead if there is one), or when they would not be sent before
+    their deadline (see ``admission``).
+
+    Share one limiter between the clients of a server. Like ``ModelRouter``,
+    it must only be used from one event loop.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        backoff: float = 0.75,
+        tolerance: float = 2.0,
+        max_queue: int | None = 256,
+        window: int = 50,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.max_queue = max_queue
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.in_flight = 0
+        self.stats = LimiterStats()
+        # Waiting calls as (priority, arrival, future)
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+        # Recent latencies by model; their minimum is the unloaded latency
+        self._latencies: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=window)
+        )
+        self._last_decrease = 0.0
+        # Average seconds a call holds its slot, to estimate waits
+        self._service_time: float | None = None
+
+    @property
+    def current_limit(self) -> int:
+        """Calls sent at once right now"""
+        return max(self.min_limit, int(self.limit))
+
+    @property
+    def waiting(self) -> int:
+        return sum(not entry[2].done() for entry in self._queue)
+
+    @asynccontextmanager
+    async def slot(self, model: str) -> AsyncIterator[Permit]:
+        """Hold a slot for one call to ``model``, waiting for one if needed
+
+        Raises:
+            Overloaded: If the call is rejected instead of sent
+        """
+        priority, deadline = _admission.get()
+        queued_at = time.monotonic()
+        await self._acquire(PRIORITIES[priority], deadline)
+        permit = Permit(
+            model,
+            queue_time=time.monotonic() - queued_at,
+            saturated=self.in_flight >= self.current_limit,
+        )
+        self.stats.admitted += 1
+        self.stats.queue_time += permit.queue_time
+        try:
+            yield permit
+        except httpx.TimeoutException:
+            permit.overloaded()
+            raise
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code in OVERLOAD_STATUS_CODES:
+                permit.overloaded()
+            raise
+        finally:
+            self._release(permit)
+
+    def _reject(self, reason: str) -> Overloaded:
+        self.stats.rejected += 1
+        return Overloaded(reason)
+
+    async def _acquire(self, priority: int, deadline: float | None) -> None:
+        now = time.monotonic()
+        if deadline is not None and deadline <= now:
+            raise self._reject("Deadline passed before the call was sent")
+        if self.in_flight < self.current_limit and not self.waiting:
+            self.in_flight += 1
+            return
+
+        ahead = sum(
+            entry[0] <= priority for entry in self._queue if not entry[2].done()
+        )
+        if deadline is not None and self._service_time is not None:
+            # Each slot frees up about once per service time
+            expected_wait = (ahead + 1) * self._service_time / self.current_limit
+            if now + expected_wait > deadline:
+                raise self._reject(
+                    f"Deadline would pass in the queue ({ahead} calls ahead)"
+                )
+        if self.max_queue is not None and self.waiting >= self.max_queue:
+            self._shed(priority)
+
+        entry = (
+            priority,
+            next(self._arrivals),
+            asyncio.get_running_loop().create_future(),
+        )
+        self._queue.append(entry)
+        self.stats.queued += 1
+        try:
+            if deadline is None:
+                await entry[2]
+            else:
+                async with asyncio.timeout(deadline - now):
+                    await entry[2]
+        except (asyncio.CancelledError, TimeoutError) as e:
+            future = entry[2]
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # Admitted just before being cancelled
+                self.in_flight -= 1
+                self._admit()
+            elif entry in self._queue:
+                self._queue.remove(entry)
+            if isinstance(e, TimeoutError):
+                raise self._reject(
+                    "Deadline passed while waiting in the queue"
+                ) from None
+            raise
+
+    def _shed(self, priority: int) -> None:
+        """Make room in a full queue for a call of ``priority``
+
+        The least urgent, latest waiting call is rejected if it is less urgent
+        than the new one; otherwise the new one is.
+        """
+        pending = [entry for entry in self._queue if not entry[2].done()]
+        victim = max(pending, key=lambda entry: (entry[0], entry[1]))
+        if victim[0] <= priority:
+            raise self._reject(f"Queue full ({self.max_queue} calls waiting)")
+        self._queue.remove(victim)
+        victim[2].set_exception(
+            self._reject("Shed from a full queue for a more urgent call")
+        )
+
+    def _release(self, permit: Permit) -> None:
+        self.in_flight -= 1
+        self._adapt(permit)
+        self._admit()
+
+    def _admit(self) -> None:
+        """Admit the most urgent waiting calls while there are free slots"""
+        # Calls cancelled while waiting have not been removed yet
+        self._queue = [entry for entry in self._queue if not entry[2].done()]
+        while self._queue and self.in_flight < self.current_limit:
+            entry = min(self._queue, key=lambda entry: (entry[0], entry[1]))
+            self._queue.remove(entry)
+            self.in_flight += 1
+            entry[2].set_result(None)
+
+    def _adapt(self, permit: Permit) -> None:
+        """Grow or shrink the limit after a call"""
+        now = time.monotonic()
+        held = now - permit.admitted
+        self._service_time = (
+            held
+            if self._service_time is None
+            else (1 - SERVICE_TIME_WEIGHT) * self._service_time
+            + SERVICE_TIME_WEIGHT * held
+        )
+
+        congested = permit.congested
+        if permit.latency is not None:
+            latencies = self._latencies[permit.model]
+            if latencies:
+                unloaded = min(latencies)
+                congested = congested or (
+                    permit.latency > unloaded * self.tolerance
+                    and permit.latency - unloaded > MIN_QUEUE_DELAY
+                )
+            latencies.append(permit.latency)
+
+        if congested:
+            self.stats.congested += 1
+            # Calls sent before the last decrease saw the old limit, so they
+            # do not shrink it again
+            if permit.admitted >= self._last_decrease:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        elif permit.saturated:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
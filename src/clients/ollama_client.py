@@ -1,10 +1,22 @@
+import asyncio
 import json
+import threading
+from contextlib import aclosing, asynccontextmanager, nullcontext
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Tuple
 
-import requests
+import httpx
 from pydantic import BaseModel
 
+from .balancer import Lease, LoadBalancer
+from .cache import ResponseCache, is_cacheable, make_key
+from .json_stream import read_json_stream
+from .limiter import OVERLOAD_STATUS_CODES, AdaptiveLimiter, Permit
+from .run_context import RunContext, current_run
+from .runner import iterate_sync, run_sync
+from .session import RETRY_STATUS_CODES, SessionConfig, get_session
+from .telemetry import CallTimer
+
 
 class Model(BaseModel):
     name: str
@@ -15,40 +27,595 @@ class Model(BaseModel):
     details: Dict[str, Any]
 
 
-class OllamaClient:
-    """Ollama API Client"""
+class AsyncOllamaClient:
+    """Asynchronous Ollama API Client"""
 
-    def __init__(self, base_url: str = "http://localhost:11434"):
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        config: SessionConfig | None = None,
+        cache: ResponseCache | None = None,
+        limiter: AdaptiveLimiter | None = None,
+        balancer: LoadBalancer | None = None,
+    ):
         self.base_url = base_url
+        self.config = config or SessionConfig()
+        self.cache = cache
+        # Admission control for the server's completions, shared by the
+        # clients of one server; without it every call is sent at once
+        self.limiter = limiter
+        # Spreads calls over several servers; base_url is then unused
+        self.balancer = balancer
+        self._digests: Dict[str, str] = {}
 
-    def models(self) -> List[Model]:
-        """Get all available models"""
-        url = f"{self.base_url}/api/tags"
+    @property
+    def session(self) -> httpx.AsyncClient:
+        """Pooled HTTP client for the running event loop"""
+        return get_session(self.config)
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        timeout: float | None = None,
+        stream: bool = False,
+        permit: Permit | None = None,
+        lease: Lease | None = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Send a request, retrying connection errors and retryable statuses
+
+        With ``stream=True`` the body is left unread and the caller must close
+        the response. Busy answers and timeouts are reported to ``permit``.
+        With a ``lease`` the request goes to the lease's node, and a failed
+        attempt, including any server error, is retried on another node right
+        away.
+        """
+
+        def build() -> httpx.Request:
+            base_url = self.base_url if lease is None else lease.base_url
+            return self.session.build_request(
+                method,
+                f"{base_url}{path}",
+                timeout=self.config.timeout(timeout),
+                **kwargs,
+            )
+
+        for attempt in range(self.config.max_retries):
+            try:
+                response = await self.session.send(build(), stream=stream)
+            except httpx.TransportError as e:
+                if permit is not None and isinstance(e, httpx.TimeoutException):
+                    permit.overloaded()
+            else:
+                status = response.status_code
+                retryable = status in RETRY_STATUS_CODES
+                # Any server error may be the node's own, so another may answer
+                if not retryable and (lease is None or status < 500):
+                    break
+                if permit is not None and status in OVERLOAD_STATUS_CODES:
+                    permit.overloaded()
+                if not retryable and not lease.failed():
+                    break
+                await response.aclose()
+                if not retryable:
+                    continue
+            if lease is not None and lease.failed():
+                continue
+            await asyncio.sleep(self.config.backoff(attempt))
+        else:
+            response = await self.session.send(build(), stream=stream)
+
+        if lease is not None and not response.is_error:
+            lease.succeeded()
+        if response.is_error:
+            await response.aread()
+            await response.aclose()
+            response.raise_for_status()
+        return response
 
-        response = requests.get(url)
-        response.raise_for_status()
+    async def models(self, timeout: float | None = None) -> List[Model]:
+        """Get all available models"""
+        async with self._lease(None) as lease:
+            response = await self._request("GET", "/api/tags", timeout, lease=lease)
 
         return [
             Model.model_validate(model_data) for model_data in response.json()["models"]
         ]
 
-    def generate(self, model_name: str, prompt: str, system: str = None) -> str:
-        """Generate text using Ollama API"""
-        url = f"{self.base_url}/api/generate"
+    async def load(
+        self,
+        model_name: str,
+        keep_alive: str | float | None = None,
+        timeout: float | None = None,
+    ) -> None:
+        """Load a model into memory without generating anything
+
+        The call returns once the model is loaded; it is recorded in the
+        current telemetry scope with the load time Ollama reports.
+        """
+        # A request without a prompt only loads the model
+        payload = self._payload(model_name, None, stream=False, keep_alive=keep_alive)
+        timeout = self._fit(timeout)
+        timer = CallTimer(model_name, "/api/generate")
+        data: Dict[str, Any] | None = None
+        try:
+            async with (
+                self._slot(model_name, timer) as permit,
+                self._lease(model_name) as lease,
+            ):
+                response = await self._request(
+                    "POST",
+                    "/api/generate",
+                    timeout,
+                    permit=permit,
+                    lease=lease,
+                    json=payload,
+                )
+                data = response.json()
+                if permit is not None:
+                    permit.responded(discount=data.get("load_duration", 0) / 1e9)
+        finally:
+            timer.finish(data)
+
+    async def embed(
+        self,
+        model_name: str,
+        texts: List[str],
+        keep_alive: str | float | None = None,
+        timeout: float | None = None,
+    ) -> List[List[float]]:
+        """Embed texts with an embedding model, one vector per text"""
+        payload = self._payload(
+            model_name, None, stream=False, keep_alive=keep_alive, input=texts
+        )
+        timeout = self._fit(timeout)
+        timer = CallTimer(model_name, "/api/embed")
+        data: Dict[str, Any] | None = None
+        try:
+            async with (
+                self._slot(model_name, timer) as permit,
+                self._lease(model_name) as lease,
+            ):
+                response = await self._request(
+                    "POST",
+                    "/api/embed",
+                    timeout,
+                    permit=permit,
+                    lease=lease,
+                    json=payload,
+                )
+                data = response.json()
+                if permit is not None:
+                    permit.responded(discount=data.get("load_duration", 0) / 1e9)
+        finally:
+            # Embeddings come in one response, without a "done" flag
+            timer.finish({**data, "done": True} if data is not None else None)
+        return data["embeddings"]
+
+    def _slot(self, model_name: str, timer: CallTimer) -> Any:
+        """Context manager holding a limiter slot for one call, if there is a limiter
+
+        It yields the call's ``Permit`` (None without a limiter), and the time
+        spent waiting for the slot is recorded by ``timer``.
+        """
+        if self.limiter is None:
+            return nullcontext()
+        return self._limited(model_name, timer)
+
+    @asynccontextmanager
+    async def _limited(
+        self, model_name: str, timer: CallTimer
+    ) -> AsyncIterator[Permit]:
+        async with self.limiter.slot(model_name) as permit:
+            timer.queued(permit.queue_time)
+            yield permit
+
+    @staticmethod
+    def _fit(timeout: float | None) -> float | None:
+        """Check the current run's limits and shorten ``timeout`` to its deadline"""
+        run = current_run()
+        if run is None:
+            return timeout
+        run.check()
+        return run.timeout(timeout)
+
+    @staticmethod
+    def _begin(
+        payload: Dict[str, Any], timeout: float | None
+    ) -> Tuple[RunContext | None, float | None]:
+        """Fit a completion to the current run's limits (see ``RunContext``)
+
+        The run's remaining tokens cap ``num_predict`` in the payload.
+
+        Returns:
+            The run context (None outside a run) and the call's timeout
+        """
+        run = current_run()
+        if run is None:
+            return None, timeout
+        limit = run.begin_call()
+        options = payload.get("options") or {}
+        current = options.get("num_predict")
+        if limit is not None and (current is None or current < 0 or current > limit):
+            payload["options"] = {**options, "num_predict": limit}
+        return run, run.timeout(timeout)
+
+    def _lease(self, model_name: str | None) -> Any:
+        """Context manager choosing the server of one call, if there is a balancer
+
+        It yields the call's ``Lease`` (None without a balancer).
+        """
+        if self.balancer is None:
+            return nullcontext()
+        return self.balancer.lease(model_name)
+
+    async def _model_digest(self, model_name: str) -> str:
+        """Digest of the installed model, so cached responses die with updates"""
+        if model_name not in self._digests:
+            for model in await self.models():
+                self._digests[model.name] = model.digest
+                if model.name.endswith(":latest"):
+                    self._digests[model.name.removesuffix(":latest")] = model.digest
+            # Unknown models are cached under an empty digest
+            self._digests.setdefault(model_name, "")
+        return self._digests[model_name]
+
+    async def _cache_key(
+        self,
+        kind: str,
+        model_name: str,
+        options: Dict[str, Any] | None,
+        use_cache: bool,
+        **parts: Any,
+    ) -> str | None:
+        """Cache key for a request, or None if it must not be cached"""
+        if self.cache is None or not use_cache or not is_cacheable(options):
+            return None
+        return make_key(
+            kind=kind,
+            model=model_name,
+            digest=await self._model_digest(model_name),
+            options=options,
+            **parts,
+        )
+
+    async def _cache_get(self, key: str | None) -> str | None:
+        if key is None:
+            return None
+        return await asyncio.to_thread(self.cache.get, key)
+
+    async def _cache_put(self, key: str | None, value: str) -> None:
+        if key is not None:
+            await asyncio.to_thread(self.cache.put, key, value)
+
+    @staticmethod
+    def _payload(
+        model_name: str,
+        options: Dict[str, Any] | None,
+        stream: bool,
+        keep_alive: str | float | None = None,
+        **fields: Any,
+    ) -> Dict[str, Any]:
+        payload = {"model": model_name, "stream": stream}
+        payload.update({key: value for key, value in fields.items() if value})
+        # 0 is meaningful: unload the model right after the request
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+
+        if options:
+            payload["options"] = options
+        return payload
+
+    async def _stream(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        extract: Callable[[Dict[str, Any]], str],
+        timeout: float | None,
+        cache_key: str | None,
+    ) -> AsyncIterator[str]:
+        """Stream a completion, yielding the text ``extract`` takes from each chunk
+
+        The call is timed and recorded in the current telemetry scope.
+        """
+        timer = CallTimer(payload["model"], path)
+        run: RunContext | None = None
+        final: Dict[str, Any] | None = None
+        try:
+            cached = await self._cache_get(cache_key)
+            if cached is not None:
+                timer.token()
+                timer.finish(cached=True)
+                yield cached
+                return
 
-        payload = {"model": model_name, "prompt": prompt, "stream": False}
+            run, timeout = self._begin(payload, timeout)
+            async with (
+                self._slot(payload["model"], timer) as permit,
+                self._lease(payload["model"]) as lease,
+            ):
+                response = await self._request(
+                    "POST",
+                    path,
+                    timeout,
+                    stream=True,
+                    permit=permit,
+                    lease=lease,
+                    json=payload,
+                )
+                tokens = []
+                try:
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if permit is not None:
+                            permit.responded()
+                        token = extract(chunk)
+                        if token:
+                            timer.token()
+                            tokens.append(token)
+                            yield token
+                        if chunk.get("done"):
+                            if permit is not None:
+                                # The wait for the first token included the load
+                                permit.discount(chunk.get("load_duration", 0) / 1e9)
+                            timer.finish(chunk)
+                            final = chunk
+                            # A reply cut short by the run's budget is not cached
+                            if run is None or chunk.get("done_reason") != "length":
+                                await self._cache_put(cache_key, "".join(tokens))
+                            break
+                finally:
+                    await response.aclose()
+        finally:
+            # Closed early or failed: record what was received
+            timer.finish()
+            if run is not None:
+                run.end_call(final, timer.tokens, timer.generation_time())
 
-        if system:
-            payload["system"] = system
+    async def generate(
+        self,
+        model_name: str,
+        prompt: str,
+        system: str = None,
+        timeout: float | None = None,
+        options: Dict[str, Any] | None = None,
+        use_cache: bool = True,
+        format: Dict[str, Any] | str | None = None,
+        keep_alive: str | float | None = None,
+    ) -> str:
+        """Generate text using Ollama API
 
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
+        Deterministic requests (temperature 0 or a fixed seed) are served from
+        the response cache when one is configured, unless ``use_cache`` is off.
+        ``format`` is passed to Ollama: ``"json"`` or a JSON schema that
+        constrains the output. ``keep_alive`` sets how long Ollama keeps the
+        model loaded afterwards ("30m", seconds, negative for ever).
+        """
+        timer = CallTimer(model_name, "/api/generate")
+        cache_key = await self._cache_key(
+            "generate",
+            model_name,
+            options,
+            use_cache,
+            system=system,
+            prompt=prompt,
+            format=format,
+        )
+        cached = await self._cache_get(cache_key)
+        if cached is not None:
+            timer.finish(cached=True)
+            return cached
+
+        payload = self._payload(
+            model_name,
+            options,
+            stream=False,
+            keep_alive=keep_alive,
+            prompt=prompt,
+            system=system,
+            format=format,
+        )
+        run, timeout = self._begin(payload, timeout)
+        data: Dict[str, Any] | None = None
+        try:
+            async with (
+                self._slot(model_name, timer) as permit,
+                self._lease(model_name) as lease,
+            ):
+                response = await self._request(
+                    "POST",
+                    "/api/generate",
+                    timeout,
+                    permit=permit,
+                    lease=lease,
+                    json=payload,
+                )
+                data = response.json()
+                if permit is not None:
+                    # Only the time before generation started can be queueing
+                    permit.responded(
+                        discount=(
+                            data.get("load_duration", 0) + data.get("eval_duration", 0)
+                        )
+                        / 1e9
+                    )
+        finally:
+            timer.finish(data)
+            if run is not None:
+                run.end_call(data, 0, 0.0)
 
-        response_text = response.json()["response"]
+        response_text = data["response"]
         # Remove code block markers if they exist
         response_text = self._remove_code_block_markers(response_text)
+        # A reply cut short by the run's budget is not cached
+        if run is None or data.get("done_reason") != "length":
+            await self._cache_put(cache_key, response_text)
         return response_text
 
+    async def generate_stream(
+        self,
+        model_name: str,
+        prompt: str,
+        system: str = None,
+        timeout: float | None = None,
+        options: Dict[str, Any] | None = None,
+        use_cache: bool = True,
+        format: Dict[str, Any] | str | None = None,
+        keep_alive: str | float | None = None,
+    ) -> AsyncIterator[str]:
+        """Generate text using Ollama API, yielding tokens as they arrive
+
+        Closing the iterator early closes the connection, which makes Ollama
+        stop generating the rest of the completion. Opening the stream is
+        retried like any other request; a stream that fails mid-way is not.
+        Only completions streamed to the end are cached; a cache hit is
+        yielded as a single chunk. ``format`` and ``keep_alive`` are passed as
+        in ``generate``.
+        """
+        cache_key = await self._cache_key(
+            "generate",
+            model_name,
+            options,
+            use_cache,
+            system=system,
+            prompt=prompt,
+            format=format,
+        )
+        payload = self._payload(
+            model_name,
+            options,
+            stream=True,
+            keep_alive=keep_alive,
+            prompt=prompt,
+            system=system,
+            format=format,
+        )
+        # Close the inner stream (and the connection) as soon as this one closes
+        async with aclosing(
+            self._stream(
+                "/api/generate",
+                payload,
+                lambda chunk: chunk.get("response", ""),
+                timeout,
+                cache_key,
+            )
+        ) as stream:
+            async for token in stream:
+                yield token
+
+    async def generate_json(
+        self,
+        model_name: str,
+        prompt: str,
+        system: str = None,
+        on_field: Callable[[str, Any], None] | None = None,
+        timeout: float | None = None,
+        options: Dict[str, Any] | None = None,
+        use_cache: bool = True,
+        format: Dict[str, Any] | str | None = None,
+        keep_alive: str | float | None = None,
+    ) -> Dict[str, Any]:
+        """Generate a JSON object, stopping as soon as the object is complete
+
+        Args:
+            model_name: The model to generate with
+            prompt: The prompt asking for a JSON object
+            system: Optional system prompt
+            on_field: Called with each top-level field as soon as it closes
+            timeout: Optional per-call read timeout in seconds
+            options: Ollama model options (temperature, seed, ...)
+            use_cache: Set to False to bypass the response cache
+            format: JSON schema the object must follow (constrained decoding);
+                by default the model is only asked for JSON by the prompt
+            keep_alive: How long Ollama keeps the model loaded afterwards
+
+        Returns:
+            The parsed object; one recovered from a completion that ended
+            before the object did is not cached
+
+        Raises:
+            ValueError: If the completion ends without an object that can be
+                recovered
+        """
+        cache_key = await self._cache_key(
+            "json",
+            model_name,
+            options,
+            use_cache,
+            system=system,
+            prompt=prompt,
+            format=format,
+        )
+        cached = await self._cache_get(cache_key)
+        if cached is not None:
+            CallTimer(model_name, "/api/generate").finish(cached=True)
+            result = json.loads(cached)
+            for field, value in result.items():
+                if on_field:
+                    on_field(field, value)
+            return result
+
+        tokens = self.generate_stream(
+            model_name,
+            prompt,
+            system,
+            timeout,
+            options,
+            use_cache=False,
+            format=format,
+            keep_alive=keep_alive,
+        )
+        result, complete = await read_json_stream(tokens, on_field)
+        # An object recovered from a reply cut short (e.g. by num_predict or
+        # the run's budget) is used once but never replayed from the cache
+        if complete:
+            await self._cache_put(cache_key, json.dumps(result, ensure_ascii=False))
+        return result
+
+    async def chat_stream(
+        self,
+        model_name: str,
+        messages: List[Dict[str, str]],
+        timeout: float | None = None,
+        options: Dict[str, Any] | None = None,
+        use_cache: bool = True,
+        format: Dict[str, Any] | str | None = None,
+        keep_alive: str | float | None = None,
+    ) -> AsyncIterator[str]:
+        """Continue a conversation using Ollama's chat API, yielding tokens
+
+        Sending the same message prefix on consecutive calls lets Ollama reuse
+        the evaluated prompt state instead of re-reading the whole prefix.
+        Caching, cancellation, ``format`` and ``keep_alive`` behave as in
+        ``generate_stream``.
+        """
+        cache_key = await self._cache_key(
+            "chat", model_name, options, use_cache, messages=messages, format=format
+        )
+        payload = self._payload(
+            model_name,
+            options,
+            stream=True,
+            keep_alive=keep_alive,
+            messages=messages,
+            format=format,
+        )
+        # Close the inner stream (and the connection) as soon as this one closes
+        async with aclosing(
+            self._stream(
+                "/api/chat",
+                payload,
+                lambda chunk: chunk.get("message", {}).get("content", ""),
+                timeout,
+                cache_key,
+            )
+        ) as stream:
+            async for token in stream:
+                yield token
+
     def _remove_code_block_markers(self, text: str) -> str:
         """Remove code block markers with or without language specification from the text.
 
@@ -58,10 +625,88 @@ class OllamaClient:
         Returns:
             The text with code block markers removed
         """
-        # Remove code blocks with language specification (e.g. ```python)
-        if text.startswith("```") and text.endswith("```"):
-            lines = text.split("\n")
-            # Remove first and last line if they only contain ```
-            if lines[0].startswith("```") and lines[-1] == "```":
-                text = "\n".join(lines[1:-1])
-        return text
+        # Only a reply that is one code block is unwrapped; code blocks inside
+        # prose are part of the text
+        stripped = text.strip()
+        if not stripped.startswith("```"):
+            return text
+        lines = stripped.split("\n")
+        # Remove the opening fence (e.g. ```python) and the closing one, which
+        # is missing when the reply was cut off
+        if lines[-1].strip() == "```" and len(lines) > 1:
+            lines = lines[:-1]
+        return "\n".join(lines[1:])
+
+
+class OllamaClient:
+    """Ollama API Client
+
+    Blocking wrapper around ``AsyncOllamaClient``; calls run on a shared
+    background event loop. Keyword arguments are passed through unchanged.
+    """
+
+    def __init__(self, base_url: str = "http://localhost:11434", **kwargs: Any):
+        self.aclient = AsyncOllamaClient(base_url=base_url, **kwargs)
+
+    @property
+    def base_url(self) -> str:
+        return self.aclient.base_url
+
+    @property
+    def config(self) -> SessionConfig:
+        return self.aclient.config
+
+    def models(self, timeout: float | None = None) -> List[Model]:
+        """Get all available models"""
+        return run_sync(self.aclient.models(timeout))
+
+    def generate(
+        self, model_name: str, prompt: str, system: str = None, **kwargs: Any
+    ) -> str:
+        """Generate text using Ollama API"""
+        return run_sync(self.aclient.generate(model_name, prompt, system, **kwargs))
+
+    def generate_stream(
+        self, model_name: str, prompt: str, system: str = None, **kwargs: Any
+    ) -> Iterator[str]:
+        """Generate text using Ollama API, yielding tokens as they arrive"""
+        return iterate_sync(
+            self.aclient.generate_stream(model_name, prompt, system, **kwargs)
+        )
+
+    def generate_json(
+        self, model_name: str, prompt: str, system: str = None, **kwargs: Any
+    ) -> Dict[str, Any]:
+        """Generate a JSON object, stopping as soon as the object is complete"""
+        return run_sync(
+            self.aclient.generate_json(model_name, prompt, system, **kwargs)
+        )
+
+    def load(self, model_name: str, **kwargs: Any) -> None:
+        """Load a model into memory without generating anything"""
+        return run_sync(self.aclient.load(model_name, **kwargs))
+
+    def embed(
+        self, model_name: str, texts: List[str], **kwargs: Any
+    ) -> List[List[float]]:
+        """Embed texts with an embedding model, one vector per text"""
+        return run_sync(self.aclient.embed(model_name, texts, **kwargs))
+
+    def chat_stream(
+        self, model_name: str, messages: List[Dict[str, str]], **kwargs: Any
+    ) -> Iterator[str]:
+        """Continue a conversation using Ollama's chat API, yielding tokens"""
+        return iterate_sync(self.aclient.chat_stream(model_name, messages, **kwargs))
+
+
+_default_client: AsyncOllamaClient | None = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> AsyncOllamaClient:
+    """Get the process-wide client shared by paradigms that are not given one"""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = AsyncOllamaClient()
+        return _default_client
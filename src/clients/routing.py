@@ -0,0 +1,185 @@
+import asyncio
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Deque, Dict, List, Mapping, Tuple
+
+from .limiter import admission
+from .telemetry import scope
+
+if TYPE_CHECKING:
+    from .ollama_client import AsyncOllamaClient
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def keep_alive_seconds(keep_alive: str | float | None) -> float | None:
+    """Seconds a model stays loaded for an Ollama ``keep_alive`` value
+
+    Numbers are seconds and strings are Go-style durations such as "30m" or
+    "1h30m". Negative values keep the model loaded forever (``inf``). None
+    means Ollama's own default, which is unknown here.
+    """
+    if keep_alive is None:
+        return None
+    if isinstance(keep_alive, str):
+        text = keep_alive.strip()
+        sign = -1 if text.startswith("-") else 1
+        text = text.lstrip("+-")
+        try:
+            seconds = float(text)
+        except ValueError:
+            parts = DURATION_PATTERN.findall(text)
+            if not parts or "".join(value + unit for value, unit in parts) != text:
+                raise ValueError(f"Invalid keep_alive duration: {keep_alive!r}")
+            seconds = sum(float(value) * DURATION_UNITS[unit] for value, unit in parts)
+        keep_alive = sign * seconds
+    return float("inf") if keep_alive < 0 else float(keep_alive)
+
+
+def parse_routes(routes: List[str]) -> Dict[str, str]:
+    """Parse ``PHASE=MODEL`` strings, e.g. from repeated CLI options"""
+    parsed = {}
+    for route in routes:
+        phase, separator, model = route.partition("=")
+        if not separator or not phase.strip() or not model.strip():
+            raise ValueError(f"Invalid route {route!r}, expected PHASE=MODEL")
+        parsed[phase.strip()] = model.strip()
+    return parsed
+
+
+class ModelRouter:
+    """Chooses the model of each LLM call by phase and keeps the models warm
+
+    Phases without a route use the paradigm's own model, e.g. with
+    ``{"act": "llama3.2:1b", "execute": "llama3.2:1b"}`` plans and thoughts go
+    to the large model and actions to the small one. Every routed call asks
+    Ollama to keep its model loaded for ``keep_alive``, and ``preload`` loads
+    the models before the first call needs them.
+
+    With ``exclusive=True`` (a server that can hold only one of the models at
+    a time, e.g. ``OLLAMA_MAX_LOADED_MODELS=1`` or too little VRAM) calls are
+    grouped by model: while calls to one model run, calls to another wait,
+    and they are admitted together once the running ones finish. Concurrent
+    runs sharing the router then share each load instead of swapping models
+    back and forth. New calls to the running model are admitted until a call
+    to another one has waited ``patience`` seconds, so no model is starved.
+
+    One router can be shared by paradigms running on the same event loop.
+    """
+
+    def __init__(
+        self,
+        phases: Mapping[str, str] | None = None,
+        keep_alive: str | float | None = "30m",
+        exclusive: bool = False,
+        patience: float = 1.0,
+    ):
+        self.phases = dict(phases or {})
+        self.keep_alive = keep_alive
+        self.exclusive = exclusive
+        self.patience = patience
+        self._keep_alive_seconds = keep_alive_seconds(keep_alive)
+        # When each model was last used or preloaded (monotonic)
+        self._last_used: Dict[str, float] = {}
+        # Exclusive mode: the model being served, its calls in flight and the
+        # calls waiting for another model with their arrival time, oldest first
+        self._active: str | None = None
+        self._running = 0
+        self._queue: Deque[Tuple[str, asyncio.Future, float]] = deque()
+
+    def model_for(self, phase: str | None, default: str) -> str:
+        """The model for calls made in ``phase``"""
+        return self.phases.get(phase, default) if phase is not None else default
+
+    def models(self, default: str) -> List[str]:
+        """Every model the router may use, ``default`` first"""
+        return list(dict.fromkeys([default, *self.phases.values()]))
+
+    def is_warm(self, model: str) -> bool:
+        """Whether ``model`` was used recently enough to still be loaded"""
+        last_used = self._last_used.get(model)
+        if last_used is None or self._keep_alive_seconds is None:
+            return False
+        return time.monotonic() - last_used < self._keep_alive_seconds
+
+    async def preload(self, llm: "AsyncOllamaClient", default: str) -> None:
+        """Load the models that are not warm, so no call waits for a load
+
+        In exclusive mode only ``default`` is loaded, as loading the others
+        would evict it, and the load waits its turn like any call. Loads are
+        background work for a concurrency limiter. Failures are ignored; a
+        missing model is reported by the first call using it.
+        """
+        models = [default] if self.exclusive else self.models(default)
+        cold = [model for model in models if not self.is_warm(model)]
+        for model in cold:
+            self._last_used[model] = time.monotonic()
+        with scope(phase="preload"), admission("background"):
+            await asyncio.gather(
+                *(self._load(llm, model) for model in cold), return_exceptions=True
+            )
+
+    async def _load(self, llm: "AsyncOllamaClient", model: str) -> None:
+        async with self.use(model):
+            await llm.load(model, keep_alive=self.keep_alive)
+
+    @asynccontextmanager
+    async def use(self, model: str) -> AsyncIterator[None]:
+        """Hold ``model`` for the duration of one call"""
+        if self.exclusive:
+            await self._acquire(model)
+        try:
+            yield
+        finally:
+            self._last_used[model] = time.monotonic()
+            if self.exclusive:
+                self._release()
+
+    async def _acquire(self, model: str) -> None:
+        if self._active is None or (
+            self._active == model
+            and not (
+                self._queue and time.monotonic() - self._queue[0][2] >= self.patience
+            )
+        ):
+            self._active = model
+            self._running += 1
+            return
+        entry = (model, asyncio.get_running_loop().create_future(), time.monotonic())
+        self._queue.append(entry)
+        try:
+            await entry[1]
+        except asyncio.CancelledError:
+            if entry[1].done() and not entry[1].cancelled():
+                # Admitted just before being cancelled
+                self._release()
+            elif entry in self._queue:
+                self._queue.remove(entry)
+            raise
+
+    def _release(self) -> None:
+        self._running -= 1
+        if self._running == 0:
+            self._active = None
+            self._admit()
+
+    def _admit(self) -> None:
+        """Switch to the model of the oldest waiting call and admit its calls"""
+        if self._running:
+            return
+        # Calls cancelled while waiting have not been removed yet
+        self._queue = deque(entry for entry in self._queue if not entry[1].done())
+        if not self._queue:
+            return
+        self._active = self._queue[0][0]
+        waiting = self._queue
+        self._queue = deque()
+        for entry in waiting:
+            if entry[0] == self._active:
+                self._running += 1
+                entry[1].set_result(None)
+            else:
+                self._queue.append(entry)
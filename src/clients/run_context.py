@@ -0,0 +1,195 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator
+
+# Generation rate assumed until a call of the run reports one (tokens/second)
+DEFAULT_TOKEN_RATE = 20.0
+
+# Calls that could generate fewer tokens than this before the deadline or
+# the token budget runs out are not sent
+MIN_CALL_TOKENS = 8
+
+
+class RunStopped(RuntimeError):
+    """A run was stopped by its context before it finished
+
+    ``reason`` is ``"deadline"``, ``"calls"``, ``"tokens"`` or ``"cancelled"``.
+    """
+
+    def __init__(self, reason: str, detail: str):
+        super().__init__(detail)
+        self.reason = reason
+
+
+_current: ContextVar["RunContext | None"] = ContextVar("run_context", default=None)
+
+
+def current_run() -> "RunContext | None":
+    """The context of the run the current task belongs to, if any"""
+    return _current.get()
+
+
+class RunContext:
+    """Limits of one agent run: a deadline, a budget and a cancellation switch
+
+    ``timeout`` is the wall-clock time the run may take, from when the
+    context is created; ``max_calls`` and ``max_tokens`` bound the LLM calls
+    sent and the tokens generated (cached replies are free). Inside
+    ``activate`` the client fits every call to what is left: the read
+    timeout never outlasts the deadline, and ``num_predict`` is capped by the
+    remaining tokens and by what the model can generate before the deadline
+    at the rate the run's calls have shown. A call for which nothing is left
+    is not sent and raises ``RunStopped``.
+
+    When the deadline passes or ``cancel`` is called (from any thread, e.g. on
+    Ctrl-C), the run's task is cancelled, which closes the connections of its
+    calls so Ollama stops generating, and ``activate`` raises ``RunStopped``.
+    """
+
+    def __init__(
+        self,
+        timeout: float | None = None,
+        max_calls: int | None = None,
+        max_tokens: int | None = None,
+    ):
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.max_calls = max_calls
+        self.max_tokens = max_tokens
+        self.calls = 0
+        self.tokens = 0
+        # Why the run was stopped, once it was
+        self.stopped: str | None = None
+        self._eval_tokens = 0
+        self._eval_time = 0.0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task | None = None
+
+    def remaining(self) -> float | None:
+        """Seconds left before the deadline, if there is one"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    @property
+    def token_rate(self) -> float:
+        """Tokens per second generated by the run's calls so far"""
+        if self._eval_time <= 0:
+            return DEFAULT_TOKEN_RATE
+        return self._eval_tokens / self._eval_time
+
+    def check(self) -> None:
+        """Raise ``RunStopped`` if the run must not make another call"""
+        if self.stopped == "cancelled":
+            raise RunStopped("cancelled", "The run was cancelled")
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise RunStopped("deadline", "The run's deadline has passed")
+        if self.max_calls is not None and self.calls >= self.max_calls:
+            raise RunStopped("calls", f"The run used its {self.max_calls} LLM calls")
+        if self.max_tokens is not None and self.tokens >= self.max_tokens:
+            raise RunStopped(
+                "tokens", f"The run generated its {self.max_tokens} tokens"
+            )
+
+    def begin_call(self) -> int | None:
+        """Count a call about to be sent and return its ``num_predict`` cap
+
+        Returns:
+            The most tokens the call may generate, or None without limits
+
+        Raises:
+            RunStopped: If the run has no call, time or tokens left for it
+        """
+        self.check()
+        limits = []
+        if self.max_tokens is not None:
+            limits.append(self.max_tokens - self.tokens)
+        remaining = self.remaining()
+        if remaining is not None:
+            limits.append(int(remaining * self.token_rate))
+        limit = min(limits, default=None)
+        if limit is not None and limit < MIN_CALL_TOKENS:
+            reason = (
+                "tokens"
+                if self.max_tokens is not None and limit == limits[0]
+                else "deadline"
+            )
+            raise RunStopped(reason, f"Only {limit} tokens left for the next call")
+        self.calls += 1
+        return limit
+
+    def end_call(
+        self, response: Dict[str, Any] | None, tokens: int, seconds: float
+    ) -> None:
+        """Charge a finished call
+
+        Ollama's final ``response`` gives the tokens generated and how long
+        that took; a stream closed before it (e.g. once a JSON object was
+        complete) is charged the ``tokens`` received over the ``seconds``
+        since the first one.
+        """
+        response = response or {}
+        if response.get("eval_duration"):
+            tokens = response.get("eval_count", tokens)
+            seconds = response["eval_duration"] / 1e9
+        self.tokens += tokens
+        if tokens > 1 and seconds > 0:
+            self._eval_tokens += tokens
+            self._eval_time += seconds
+
+    def timeout(self, timeout: float | None) -> float | None:
+        """``timeout`` shortened to the time left before the deadline"""
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def cancel(self) -> None:
+        """Stop the run; safe to call from any thread"""
+        if self._loop is None or self._loop.is_closed():
+            self.stopped = self.stopped or "cancelled"
+            return
+        self._loop.call_soon_threadsafe(self._stop, "cancelled")
+
+    def _stop(self, reason: str) -> None:
+        if self.stopped is None:
+            self.stopped = reason
+            if self._task is not None:
+                self._task.cancel()
+
+    @contextmanager
+    def activate(self) -> Iterator["RunContext"]:
+        """Apply the context to the LLM calls of the current task
+
+        Like telemetry scopes, it follows the tasks started inside the block.
+
+        Raises:
+            RunStopped: If the run is stopped inside the block
+        """
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        remaining = self.remaining()
+        expiry = (
+            self._loop.call_later(remaining, self._stop, "deadline")
+            if remaining is not None
+            else None
+        )
+        token = _current.set(self)
+        try:
+            self.check()
+            yield self
+        except asyncio.CancelledError:
+            if self.stopped is None:
+                raise
+            # Cancelled by the context, not by whoever awaits the run
+            self._task.uncancel()
+            if self.stopped == "deadline":
+                raise RunStopped("deadline", "The run's deadline has passed") from None
+            raise RunStopped("cancelled", "The run was cancelled") from None
+        finally:
+            _current.reset(token)
+            if expiry is not None:
+                expiry.cancel()
+            self._task = None
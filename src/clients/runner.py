@@ -0,0 +1,90 @@
+import asyncio
+import threading
+from typing import AsyncIterator, Coroutine, Iterator, TypeVar
+
+T = TypeVar("T")
+
+# Seconds an interrupted caller waits for the cancelled coroutine to wind
+# down, so its requests are closed before the process exits
+CANCEL_GRACE = 2.0
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Get the background event loop that drives the sync API
+
+    The loop runs in a daemon thread and is shared by every sync caller in the
+    process, so pooled connections survive across sync calls.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=_loop.run_forever, name="ollama-event-loop", daemon=True
+            )
+            thread.start()
+        return _loop
+
+
+async def _tracked(coro: Coroutine[None, None, T], finished: threading.Event) -> T:
+    try:
+        return await coro
+    finally:
+        finished.set()
+
+
+def run_sync(coro: Coroutine[None, None, T]) -> T:
+    """Run a coroutine on the background loop and wait for its result
+
+    If the waiting thread is interrupted (e.g. Ctrl-C), the coroutine is
+    cancelled and given ``CANCEL_GRACE`` seconds to close its requests, so
+    none is left generating on the server.
+
+    Raises:
+        RuntimeError: If called from a running event loop, where the async
+            API should be awaited instead
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        coro.close()
+        raise RuntimeError(
+            "run_sync() cannot be called from a running event loop; "
+            "await the async method instead"
+        )
+
+    finished = threading.Event()
+    future = asyncio.run_coroutine_threadsafe(_tracked(coro, finished), get_loop())
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        finished.wait(CANCEL_GRACE)
+        raise
+
+
+async def _anext(iterator: AsyncIterator[T]) -> T:
+    return await iterator.__anext__()
+
+
+async def _aclose(iterator: AsyncIterator[T]) -> None:
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+def iterate_sync(iterator: AsyncIterator[T]) -> Iterator[T]:
+    """Iterate an async iterator from sync code via the background loop"""
+    try:
+        while True:
+            try:
+                yield run_sync(_anext(iterator))
+            except StopAsyncIteration:
+                return
+    finally:
+        run_sync(_aclose(iterator))
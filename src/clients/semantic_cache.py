@@ -0,0 +1,347 @@
+import array
+import asyncio
+import itertools
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Set, Tuple
+
+import httpx
+from pydantic import BaseModel
+
+from .cache import make_key
+from .limiter import Overloaded
+
+try:
+    import numpy as np
+except ImportError:  # Optional extra: searches fall back to plain Python
+    np = None
+
+if TYPE_CHECKING:
+    from .ollama_client import AsyncOllamaClient
+
+# Misses whose best match was this close to the threshold are near misses
+NEAR_MISS_MARGIN = 0.05
+
+# Share of max_entries evicted at once, so a full cache does not evict on
+# every store
+EVICTION_BATCH = 0.1
+
+
+class SemanticCacheStats(BaseModel):
+    """Lookups of a semantic cache and the quality of its hits"""
+
+    lookups: int = 0
+    hits: int = 0
+    near_misses: int = 0
+    invalid_hits: int = 0
+    stores: int = 0
+    evictions: int = 0
+    errors: int = 0
+    # Summed over hits
+    hit_similarity: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    @property
+    def mean_hit_similarity(self) -> float | None:
+        return self.hit_similarity / self.hits if self.hits else None
+
+
+class SemanticMatch:
+    """Outcome of a lookup, passed back to ``store`` or ``invalidate``
+
+    ``value`` is the cached reply when a stored prompt was similar enough.
+    """
+
+    __slots__ = ("scope", "text", "vector", "value", "similarity", "entry_id")
+
+    def __init__(self, scope: str, text: str):
+        self.scope = scope
+        self.text = text
+        self.vector: array.array | None = None
+        self.value: str | None = None
+        self.similarity = 0.0
+        self.entry_id: int | None = None
+
+
+def _normalize(vector: Iterable[float]) -> array.array:
+    """The vector scaled to unit length, as float32"""
+    values = list(vector)
+    norm = math.sqrt(sum(value * value for value in values)) or 1.0
+    return array.array("f", (value / norm for value in values))
+
+
+class _Index:
+    """Unit vectors of one scope and their cached values"""
+
+    def __init__(self) -> None:
+        self.ids: List[int] = []
+        self.values: List[str] = []
+        self.vectors: List[array.array] = []
+        self.created: List[float] = []
+        self.accessed: List[float] = []
+        # Vectors stacked for numpy, rebuilt after changes
+        self._matrix = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(
+        self,
+        entry_id: int,
+        value: str,
+        vector: array.array,
+        created: float,
+        accessed: float,
+    ) -> None:
+        self.ids.append(entry_id)
+        self.values.append(value)
+        self.vectors.append(vector)
+        self.created.append(created)
+        self.accessed.append(accessed)
+        self._matrix = None
+
+    def remove(self, position: int) -> None:
+        columns = (self.ids, self.values, self.vectors, self.created, self.accessed)
+        for column in columns:
+            del column[position]
+        self._matrix = None
+
+    def search(self, vector: array.array) -> Tuple[int | None, float]:
+        """Position and cosine similarity of the closest vector"""
+        if not self.vectors or len(vector) != len(self.vectors[0]):
+            return None, 0.0
+        if np is not None:
+            if self._matrix is None:
+                self._matrix = np.vstack(
+                    [np.frombuffer(row, dtype=np.float32) for row in self.vectors]
+                )
+            similarities = self._matrix @ np.frombuffer(vector, dtype=np.float32)
+            position = int(similarities.argmax())
+            return position, float(similarities[position])
+        similarities = [sum(a * b for a, b in zip(row, vector)) for row in self.vectors]
+        position = max(range(len(similarities)), key=similarities.__getitem__)
+        return position, similarities[position]
+
+
+class SemanticCache:
+    """Reuse the replies to earlier prompts that mean the same thing
+
+    The text that identifies a request (e.g. the goal of a plan, not the
+    instructions around it) is embedded with ``embedding_model`` and compared
+    by cosine similarity with the texts whose replies were stored in the same
+    scope; callers put everything else that shapes the reply (model, prompt
+    template, options) in the scope. The closest reply is reused when its
+    similarity reaches ``threshold``. Only requests made in one of
+    ``phases`` are meant to be looked up.
+
+    Vectors are kept in memory per scope and searched with numpy when it is
+    installed (the ``semantic-cache`` extra), in plain Python otherwise. With
+    a ``directory`` entries are also stored in SQLite, shared between
+    processes; a process loads a scope's entries on its first lookup in it.
+    Beyond ``max_entries`` the least recently used entries are evicted, and
+    entries expire after ``max_age`` seconds.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path | None = None,
+        embedding_model: str = "nomic-embed-text",
+        threshold: float = 0.92,
+        phases: Iterable[str] = ("plan", "act"),
+        max_entries: int = 10_000,
+        max_age: float | None = 7 * 24 * 3600,
+    ):
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self.phases = frozenset(phases)
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.stats = SemanticCacheStats()
+        self._indexes: Dict[str, _Index] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.path: Path | None = None
+        if directory is not None:
+            self.path = Path(directory).expanduser() / "semantic.sqlite3"
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connect().execute(
+                """CREATE TABLE IF NOT EXISTS entries (
+                    id INTEGER PRIMARY KEY,
+                    scope TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )"""
+            )
+            self._connect().execute(
+                "CREATE INDEX IF NOT EXISTS entries_scope ON entries (scope)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection to the store"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.max_age is not None and now - created > self.max_age
+
+    def __len__(self) -> int:
+        """Entries in memory"""
+        return sum(len(index) for index in self._indexes.values())
+
+    async def lookup(
+        self, llm: "AsyncOllamaClient", scope: str, text: str
+    ) -> SemanticMatch:
+        """Find the stored reply whose text is closest to ``text`` in ``scope``
+
+        The match's ``value`` is None unless the reply is similar enough. An
+        embedding that fails (e.g. the model is not pulled) is counted as an
+        error and the lookup as a miss.
+        """
+        match = SemanticMatch(
+            make_key(embedding_model=self.embedding_model, scope=scope), text
+        )
+        try:
+            [vector] = await llm.embed(self.embedding_model, [text])
+        except (httpx.HTTPError, Overloaded, KeyError, ValueError):
+            with self._lock:
+                self.stats.lookups += 1
+                self.stats.errors += 1
+            return match
+        match.vector = _normalize(vector)
+        await asyncio.to_thread(self._search, match)
+        return match
+
+    def _search(self, match: SemanticMatch) -> None:
+        now = time.time()
+        with self._lock:
+            self.stats.lookups += 1
+            index = self._index(match.scope, now)
+            position, similarity = index.search(match.vector)
+            # Evict expired best matches until a live one, or none, is left
+            while position is not None and self._expired(index.created[position], now):
+                index.remove(position)
+                position, similarity = index.search(match.vector)
+            if position is None or similarity < self.threshold:
+                if similarity >= self.threshold - NEAR_MISS_MARGIN:
+                    self.stats.near_misses += 1
+                return
+            index.accessed[position] = now
+            match.value = index.values[position]
+            match.similarity = similarity
+            match.entry_id = index.ids[position]
+            self.stats.hits += 1
+            self.stats.hit_similarity += similarity
+        if self.path is not None:
+            self._connect().execute(
+                "UPDATE entries SET accessed = ? WHERE id = ?", (now, match.entry_id)
+            )
+
+    def _index(self, scope: str, now: float) -> _Index:
+        """The scope's index, loaded from the store on first use"""
+        index = self._indexes.get(scope)
+        if index is None:
+            index = self._indexes[scope] = _Index()
+            if self.path is not None:
+                rows = self._connect().execute(
+                    "SELECT id, value, vector, created, accessed FROM entries"
+                    " WHERE scope = ? ORDER BY id",
+                    (scope,),
+                )
+                for entry_id, value, blob, created, accessed in rows:
+                    if not self._expired(created, now):
+                        vector = array.array("f")
+                        vector.frombytes(blob)
+                        index.add(entry_id, value, vector, created, accessed)
+        return index
+
+    async def store(self, match: SemanticMatch, value: str) -> None:
+        """Remember ``value`` as the reply to the match's text"""
+        if match.vector is None or match.value is not None:
+            return
+        await asyncio.to_thread(self._store, match, value)
+
+    def _store(self, match: SemanticMatch, value: str) -> None:
+        now = time.time()
+        if self.path is not None:
+            connection = self._connect()
+            entry_id = connection.execute(
+                "INSERT INTO entries (scope, value, vector, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (match.scope, value, match.vector.tobytes(), now, now),
+            ).lastrowid
+            self._evict_disk(connection, now)
+        else:
+            entry_id = next(self._ids)
+        with self._lock:
+            self._index(match.scope, now).add(entry_id, value, match.vector, now, now)
+            self.stats.stores += 1
+            if len(self) > self.max_entries:
+                self._evict_memory()
+
+    def _evict_memory(self) -> None:
+        """Drop the least recently used entries, down to below the limit"""
+        keep = int(self.max_entries * (1 - EVICTION_BATCH))
+        entries = sorted(
+            (index.accessed[position], scope, index.ids[position])
+            for scope, index in self._indexes.items()
+            for position in range(len(index))
+        )
+        doomed: Dict[str, Set[int]] = {}
+        for _, scope, entry_id in entries[: len(entries) - keep]:
+            doomed.setdefault(scope, set()).add(entry_id)
+        for scope, entry_ids in doomed.items():
+            index = self._indexes[scope]
+            for position in reversed(range(len(index))):
+                if index.ids[position] in entry_ids:
+                    index.remove(position)
+            self.stats.evictions += len(entry_ids)
+
+    def _evict_disk(self, connection: sqlite3.Connection, now: float) -> None:
+        """Drop expired entries, then least recently used ones over the limit"""
+        if self.max_age is not None:
+            connection.execute(
+                "DELETE FROM entries WHERE created < ?", (now - self.max_age,)
+            )
+        connection.execute(
+            """DELETE FROM entries WHERE id IN (
+                SELECT id FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entries,),
+        )
+
+    def invalidate(self, match: SemanticMatch) -> None:
+        """Forget the entry of a hit whose reply turned out to be unusable"""
+        if match.entry_id is None:
+            return
+        with self._lock:
+            index = self._indexes.get(match.scope)
+            if index is not None and match.entry_id in index.ids:
+                index.remove(index.ids.index(match.entry_id))
+            self.stats.invalid_hits += 1
+        if self.path is not None:
+            self._connect().execute(
+                "DELETE FROM entries WHERE id = ?", (match.entry_id,)
+            )
+        match.value = None
+        match.entry_id = None
+
+    def clear(self) -> None:
+        """Remove every entry, in memory and on disk"""
+        with self._lock:
+            self._indexes.clear()
+        if self.path is not None:
+            self._connect().execute("DELETE FROM entries")
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import weakref
+from typing import Dict
+
+import httpx
+from pydantic import BaseModel, ConfigDict
+
+
+class SessionConfig(BaseModel):
+    """Connection pool, timeout and retry settings for Ollama HTTP sessions"""
+
+    model_config = ConfigDict(frozen=True)
+
+    pool_size: int = 10
+    connect_timeout: float = 5.0
+    read_timeout: float | None = 300.0
+    max_retries: int = 3
+    backoff_factor: float = 0.5
+
+    def timeout(self, read_timeout: float | None = None) -> httpx.Timeout:
+        """Build a timeout, optionally overriding the read timeout for one call"""
+        return httpx.Timeout(
+            read_timeout if read_timeout is not None else self.read_timeout,
+            connect=self.connect_timeout,
+            # Wait for a free pooled connection instead of failing
+            pool=None,
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Seconds to wait before retry number ``attempt`` (0-based)"""
+        return self.backoff_factor * (2**attempt)
+
+
+# Transient errors worth retrying: server overloaded or restarting
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+# httpx async clients are bound to the event loop they were created on, so
+# pools are shared per loop and dropped together with it
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[SessionConfig, httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+_sessions_lock = threading.Lock()
+
+
+def _create_session(config: SessionConfig) -> httpx.AsyncClient:
+    """Create a keep-alive client with a bounded connection pool"""
+    limits = httpx.Limits(
+        max_connections=config.pool_size,
+        max_keepalive_connections=config.pool_size,
+    )
+    return httpx.AsyncClient(limits=limits, timeout=config.timeout())
+
+
+def get_session(config: SessionConfig | None = None) -> httpx.AsyncClient:
+    """Get the pooled client for the running event loop, creating it on first use
+
+    Args:
+        config: Pool and timeout settings. Defaults to ``SessionConfig()``
+
+    Returns:
+        An ``httpx.AsyncClient`` shared by every client on this loop using the
+        same config
+    """
+    config = config or SessionConfig()
+    loop = asyncio.get_running_loop()
+    with _sessions_lock:
+        sessions = _sessions.setdefault(loop, {})
+        session = sessions.get(config)
+        if session is None or session.is_closed:
+            session = _create_session(config)
+            sessions[config] = session
+        return session
+
+
+async def close_sessions() -> None:
+    """Close the pooled clients of the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _sessions_lock:
+        sessions = _sessions.pop(loop, {})
+    for session in sessions.values():
+        await session.aclose()
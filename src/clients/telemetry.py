@@ -0,0 +1,297 @@
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Tuple
+
+from pydantic import BaseModel, computed_field
+
+# Calls whose model load took longer than this count as load stalls (seconds)
+LOAD_STALL_THRESHOLD = 0.5
+
+# Server metrics reported in Ollama's final response chunk; durations are in
+# nanoseconds on the wire and in seconds here
+SERVER_DURATIONS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_duration",
+    "eval_duration",
+)
+SERVER_COUNTS = ("prompt_eval_count", "eval_count")
+
+
+class CallMetrics(BaseModel):
+    """Timing of one LLM call, tagged with where in a run it was made
+
+    ``wall_time``, ``first_token_time`` and ``queue_time`` (waiting for the
+    client's concurrency limiter) are measured by the client; the other
+    durations are reported by Ollama and are missing when the call was
+    served from the cache or the stream was closed before Ollama finished.
+    """
+
+    model: str
+    endpoint: str
+    paradigm: str | None = None
+    phase: str | None = None
+    step: str | None = None
+    wall_time: float
+    first_token_time: float | None = None
+    queue_time: float = 0.0
+    tokens_received: int = 0
+    cached: bool = False
+    completed: bool = True
+    total_duration: float | None = None
+    load_duration: float | None = None
+    prompt_eval_count: int | None = None
+    prompt_eval_duration: float | None = None
+    eval_count: int | None = None
+    eval_duration: float | None = None
+
+
+class TimeSummary(BaseModel):
+    """Aggregated calls; times are summed over calls, in seconds
+
+    Calls without server metrics because their stream was closed early (e.g.
+    once a JSON object was complete) are split at the first token as seen by
+    the client: the wait counts as prompt evaluation, the rest as generation.
+    """
+
+    calls: int = 0
+    cached_calls: int = 0
+    wall_time: float = 0.0
+    queue_time: float = 0.0
+    load_time: float = 0.0
+    prompt_eval_time: float = 0.0
+    eval_time: float = 0.0
+    prompt_tokens: int = 0
+    eval_tokens: int = 0
+    load_stalls: int = 0
+
+    @computed_field
+    @property
+    def tokens_per_second(self) -> float | None:
+        """Generation speed reported by the server"""
+        return self.eval_tokens / self.eval_time if self.eval_time else None
+
+    @computed_field
+    @property
+    def prompt_tokens_per_second(self) -> float | None:
+        """Prompt evaluation speed reported by the server"""
+        return (
+            self.prompt_tokens / self.prompt_eval_time
+            if self.prompt_eval_time
+            else None
+        )
+
+    @computed_field
+    @property
+    def other_time(self) -> float:
+        """Wall time not spent loading, reading the prompt or generating
+
+        Covers queueing (``queue_time`` in the client, the rest in the
+        server), transport and the client itself.
+        """
+        return max(
+            0.0,
+            self.wall_time - self.load_time - self.prompt_eval_time - self.eval_time,
+        )
+
+    def add(self, call: CallMetrics) -> None:
+        self.calls += 1
+        self.cached_calls += call.cached
+        self.wall_time += call.wall_time
+        self.queue_time += call.queue_time
+        self.load_time += call.load_duration or 0.0
+        if call.eval_duration is not None:
+            self.prompt_eval_time += call.prompt_eval_duration or 0.0
+            self.eval_time += call.eval_duration
+        elif not call.cached and call.first_token_time is not None:
+            self.prompt_eval_time += call.first_token_time
+            self.eval_time += call.wall_time - call.first_token_time
+        self.prompt_tokens += call.prompt_eval_count or 0
+        # Streams closed early still generated the tokens that were received
+        self.eval_tokens += (
+            call.eval_count if call.eval_count is not None else call.tokens_received
+        )
+        self.load_stalls += (call.load_duration or 0.0) > LOAD_STALL_THRESHOLD
+
+
+class TelemetryReport(TimeSummary):
+    """Per-run totals, broken down by phase and by step"""
+
+    phases: Dict[str, TimeSummary] = {}
+    steps: Dict[str, TimeSummary] = {}
+
+
+class Telemetry:
+    """Collects the metrics of the LLM calls made within ``scope(telemetry)``"""
+
+    def __init__(self) -> None:
+        self.calls: List[CallMetrics] = []
+
+    def record(self, call: CallMetrics) -> None:
+        self.calls.append(call)
+
+    def clear(self) -> None:
+        self.calls.clear()
+
+    def report(self) -> TelemetryReport:
+        """Aggregate the calls recorded so far"""
+        report = TelemetryReport()
+        phases: Dict[str, TimeSummary] = defaultdict(TimeSummary)
+        steps: Dict[str, TimeSummary] = defaultdict(TimeSummary)
+        for call in self.calls:
+            report.add(call)
+            phases[call.phase or "other"].add(call)
+            if call.step is not None:
+                steps[call.step].add(call)
+        report.phases = dict(phases)
+        report.steps = dict(steps)
+        return report
+
+    def to_json(self, indent: int | None = 2) -> str:
+        """The report and every call as JSON"""
+        return json.dumps(
+            {
+                "report": self.report().model_dump(mode="json"),
+                "calls": [call.model_dump(mode="json") for call in self.calls],
+            },
+            indent=indent,
+            ensure_ascii=False,
+        )
+
+    def to_prometheus(self, prefix: str = "ollama") -> str:
+        """Counters per paradigm, phase and model in Prometheus text format"""
+        groups: Dict[Tuple[str, str, str], TimeSummary] = defaultdict(TimeSummary)
+        for call in self.calls:
+            groups[(call.paradigm or "", call.phase or "", call.model)].add(call)
+
+        metrics = (
+            ("calls_total", "LLM calls", "calls"),
+            ("cached_calls_total", "LLM calls served from the cache", "cached_calls"),
+            ("wall_seconds_total", "Client-side wall time", "wall_time"),
+            ("queue_seconds_total", "Concurrency limiter wait", "queue_time"),
+            ("load_seconds_total", "Model load time", "load_time"),
+            ("prompt_eval_seconds_total", "Prompt evaluation time", "prompt_eval_time"),
+            ("eval_seconds_total", "Generation time", "eval_time"),
+            ("prompt_tokens_total", "Prompt tokens evaluated", "prompt_tokens"),
+            ("eval_tokens_total", "Tokens generated", "eval_tokens"),
+            ("load_stalls_total", "Calls that waited for a model load", "load_stalls"),
+        )
+        lines = []
+        for name, description, field in metrics:
+            lines.append(f"# HELP {prefix}_{name} {description}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for (paradigm, phase, model), summary in sorted(groups.items()):
+                labels = ",".join(
+                    f'{label}="{_escape_label(value)}"'
+                    for label, value in (
+                        ("paradigm", paradigm),
+                        ("phase", phase),
+                        ("model", model),
+                    )
+                )
+                lines.append(f"{prefix}_{name}{{{labels}}} {getattr(summary, field)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_collector: ContextVar[Telemetry | None] = ContextVar("telemetry", default=None)
+_tags: ContextVar[Dict[str, Any]] = ContextVar("telemetry_tags", default={})
+
+
+@contextmanager
+def scope(collector: Telemetry | None = None, **tags: Any) -> Iterator[None]:
+    """Tag the LLM calls made inside the block
+
+    Tags (``paradigm``, ``phase``, ``step``) add to those of enclosing
+    scopes. Calls are recorded in the innermost ``collector`` given; without
+    one nothing is recorded. Scopes follow the asyncio task they were entered
+    in, and tasks started inside inherit them.
+    """
+    collector_token = _collector.set(collector) if collector is not None else None
+    tags_token = _tags.set({**_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _tags.reset(tags_token)
+        if collector_token is not None:
+            _collector.reset(collector_token)
+
+
+def current_tags() -> Dict[str, Any]:
+    """Tags of the innermost scope (``paradigm``, ``phase``, ``step``)"""
+    return dict(_tags.get())
+
+
+class CallTimer:
+    """Measures one LLM call and records it in the current scope's collector"""
+
+    def __init__(self, model: str, endpoint: str):
+        self.model = model
+        self.endpoint = endpoint
+        self.collector = _collector.get()
+        self.tags = _tags.get()
+        self.started = time.perf_counter()
+        self.first_token_time: float | None = None
+        self.queue_time = 0.0
+        self.tokens = 0
+        self.finished = False
+
+    def queued(self, seconds: float) -> None:
+        """Note time spent waiting for the concurrency limiter"""
+        self.queue_time += seconds
+
+    def token(self) -> None:
+        """Note a received token"""
+        if self.first_token_time is None:
+            self.first_token_time = time.perf_counter() - self.started
+        self.tokens += 1
+
+    def generation_time(self) -> float:
+        """Seconds since the first token, as seen by the client"""
+        if self.first_token_time is None:
+            return 0.0
+        return time.perf_counter() - self.started - self.first_token_time
+
+    def finish(
+        self, response: Dict[str, Any] | None = None, cached: bool = False
+    ) -> None:
+        """Record the call once
+
+        Args:
+            response: Ollama's final response object, with its server metrics;
+                None if the call ended before Ollama finished
+            cached: Whether the call was served from the response cache
+        """
+        if self.finished or self.collector is None:
+            self.finished = True
+            return
+        self.finished = True
+        response = response or {}
+        step = self.tags.get("step")
+        self.collector.record(
+            CallMetrics(
+                model=self.model,
+                endpoint=self.endpoint,
+                paradigm=self.tags.get("paradigm"),
+                phase=self.tags.get("phase"),
+                step=None if step is None else str(step),
+                wall_time=time.perf_counter() - self.started,
+                first_token_time=self.first_token_time,
+                queue_time=self.queue_time,
+                tokens_received=self.tokens,
+                cached=cached,
+                completed=cached or bool(response.get("done")),
+                **{
+                    name: response[name] / 1e9
+                    for name in SERVER_DURATIONS
+                    if name in response
+                },
+                **{name: response[name] for name in SERVER_COUNTS if name in response},
+            )
+        )
@@ -0,0 +1 @@
+"""Development tools: a fake Ollama server and benchmarks built on it"""
@@ -0,0 +1,470 @@
+import asyncio
+import contextlib
+import math
+import platform
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+import click
+from pydantic import BaseModel
+
+from src.agents.registry import PARADIGMS, get_paradigm
+
+from .fake_ollama import FakeOllama, FakeOllamaConfig, ServerStats
+
+# Metrics compared between runs, and whether higher values are better
+COMPARED_METRICS = {
+    "step_p50": False,
+    "step_p90": False,
+    "throughput": True,
+    "llm_calls_per_goal": False,
+    "bytes_per_goal": False,
+}
+
+
+class ScenarioResult(BaseModel):
+    """Measurements of one benchmark scenario
+
+    Latencies are in seconds. A "goal" is one paradigm run, or one completion
+    in the client scenario; a "step" is one paradigm step or one completion.
+    """
+
+    name: str
+    goals: int
+    concurrency: int
+    errors: int = 0
+    duration: float
+    throughput: float
+    llm_calls_per_goal: float
+    step_p50: float
+    step_p90: float
+    step_p99: float
+    requests: int
+    bytes_sent: int
+    bytes_received: int
+
+    @property
+    def bytes_per_goal(self) -> float:
+        return (self.bytes_sent + self.bytes_received) / max(self.goals, 1)
+
+
+class BenchReport(BaseModel):
+    """A saved benchmark run"""
+
+    commit: str
+    created: datetime
+    python: str
+    # Server and workload settings; only runs with equal settings are compared
+    settings: Dict[str, Any]
+    results: List[ScenarioResult]
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile (``q`` in 0-100) of ``values``; 0 when empty"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered), max(1, math.ceil(q / 100 * len(ordered))))
+    return ordered[index - 1]
+
+
+def current_commit() -> str:
+    """Short hash of the checked-out commit, marked if the tree is dirty"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+async def measure(
+    name: str,
+    server: FakeOllama,
+    goals: int,
+    concurrency: int,
+    run_goal: Callable[[int], Awaitable[tuple[List[float], int]]],
+) -> ScenarioResult:
+    """Run ``goals`` goals at most ``concurrency`` at a time
+
+    ``run_goal`` returns the step latencies and LLM call count of one goal.
+    One untimed goal is run first to open connections and fill caches.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    steps: List[float] = []
+    llm_calls = 0
+    errors = 0
+
+    async def one(index: int) -> None:
+        nonlocal llm_calls, errors
+        async with semaphore:
+            try:
+                durations, calls = await run_goal(index)
+            except Exception:
+                errors += 1
+            else:
+                steps.extend(durations)
+                llm_calls += calls
+
+    with contextlib.suppress(Exception):
+        await run_goal(-1)
+    server.reset_stats()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(goals)))
+    duration = time.perf_counter() - started
+    stats: ServerStats = server.reset_stats()
+
+    completed = max(goals - errors, 1)
+    return ScenarioResult(
+        name=name,
+        goals=goals,
+        concurrency=concurrency,
+        errors=errors,
+        duration=duration,
+        throughput=(goals - errors) / duration,
+        llm_calls_per_goal=llm_calls / completed,
+        step_p50=percentile(steps, 50),
+        step_p90=percentile(steps, 90),
+        step_p99=percentile(steps, 99),
+        requests=sum(stats.requests.values()),
+        # From the client's point of view
+        bytes_sent=stats.bytes_received,
+        bytes_received=stats.bytes_sent,
+    )
+
+
+async def run_benchmarks(
+    server: FakeOllama,
+    paradigms: Sequence[Tuple[str, str, Dict[str, Any]]],
+    goals: int,
+    concurrency_levels: Sequence[int],
+    max_steps: int,
+    chat_session: bool,
+    concurrency_limit: int | None = None,
+) -> List[ScenarioResult]:
+    """Benchmark the raw client, then each paradigm, at each concurrency level
+
+    ``paradigms`` lists ``(label, registered name, constructor kwargs)``. With
+    ``concurrency_limit`` every scenario is also run ("+limited") with a
+    client whose adaptive limiter starts at that limit, fresh for each level.
+    """
+    from rich.console import Console
+
+    from src.clients.limiter import AdaptiveLimiter
+    from src.clients.ollama_client import AsyncOllamaClient
+    from src.clients.session import close_sessions
+
+    model_name = server.config.models[0]
+    quiet = Console(quiet=True)
+
+    def completion(
+        client: AsyncOllamaClient,
+    ) -> Callable[[int], Awaitable[tuple[List[float], int]]]:
+        async def run_completion(index: int) -> tuple[List[float], int]:
+            started = time.perf_counter()
+            async for _ in client.generate_stream(
+                model_name, f"Benchmark prompt {index}"
+            ):
+                pass
+            return [time.perf_counter() - started], 1
+
+        return run_completion
+
+    def paradigm_goal(
+        client: AsyncOllamaClient, name: str, kwargs: Dict[str, Any]
+    ) -> Callable[[int], Awaitable[tuple[List[float], int]]]:
+        paradigm_class = get_paradigm(name)
+
+        async def run_goal(index: int) -> tuple[List[float], int]:
+            paradigm = paradigm_class(
+                model_name,
+                llm=client,
+                console=quiet,
+                chat_session=chat_session,
+                **kwargs,
+            )
+            result = await paradigm.arun(
+                f"Benchmark goal {index}", max_steps=max_steps, interactive=False
+            )
+            return result.step_durations, result.llm_calls
+
+        return run_goal
+
+    suffix = "+chat" if chat_session else ""
+    results = []
+    try:
+        for concurrency in concurrency_levels:
+            clients = [("", AsyncOllamaClient(base_url=server.base_url))]
+            if concurrency_limit:
+                limiter = AdaptiveLimiter(concurrency_limit)
+                limited = AsyncOllamaClient(base_url=server.base_url, limiter=limiter)
+                clients.append(("+limited", limited))
+            for variant, client in clients:
+                results.append(
+                    await measure(
+                        f"client{variant}@{concurrency}",
+                        server,
+                        goals,
+                        concurrency,
+                        completion(client),
+                    )
+                )
+                for label, name, kwargs in paradigms:
+                    results.append(
+                        await measure(
+                            f"{label}{suffix}{variant}@{concurrency}",
+                            server,
+                            goals,
+                            concurrency,
+                            paradigm_goal(client, name, kwargs),
+                        )
+                    )
+    finally:
+        await close_sessions()
+    return results
+
+
+def save_report(report: BenchReport, directory: Path) -> Path:
+    """Write the report as ``<timestamp>-<commit>.json`` in ``directory``"""
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{report.created:%Y%m%d-%H%M%S}-{report.commit}.json"
+    path.write_text(report.model_dump_json(indent=2))
+    return path
+
+
+def load_previous(directory: Path, settings: Dict[str, Any]) -> BenchReport | None:
+    """The most recent saved report with the same settings, if any"""
+    for path in sorted(directory.glob("*.json"), reverse=True):
+        try:
+            report = BenchReport.model_validate_json(path.read_text())
+        except ValueError:
+            continue
+        if report.settings == settings:
+            return report
+    return None
+
+
+def compare(
+    current: List[ScenarioResult], previous: List[ScenarioResult], threshold: float
+) -> List[str]:
+    """Describe metrics that got worse by more than ``threshold`` (a fraction)"""
+    before = {result.name: result for result in previous}
+    regressions = []
+    for result in current:
+        if result.name not in before:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old = getattr(before[result.name], metric)
+            new = getattr(result, metric)
+            if not old:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(f"{result.name} {metric}: {old:.4g} -> {new:.4g}")
+    return regressions
+
+
+def print_results(results: List[ScenarioResult], previous: BenchReport | None) -> None:
+    from rich.console import Console
+    from rich.table import Table
+
+    before = {result.name: result for result in previous.results} if previous else {}
+    table = Table(title="Benchmark results")
+    for column in (
+        "scenario",
+        "goals/s",
+        "p50 ms",
+        "p90 ms",
+        "p99 ms",
+        "calls/goal",
+        "KiB/goal",
+        "errors",
+    ):
+        table.add_column(column, justify="left" if column == "scenario" else "right")
+
+    for result in results:
+        throughput = f"{result.throughput:.1f}"
+        if result.name in before and before[result.name].throughput:
+            change = result.throughput / before[result.name].throughput - 1
+            throughput += f" ({change:+.0%})"
+        table.add_row(
+            result.name,
+            throughput,
+            f"{result.step_p50 * 1000:.1f}",
+            f"{result.step_p90 * 1000:.1f}",
+            f"{result.step_p99 * 1000:.1f}",
+            f"{result.llm_calls_per_goal:.1f}",
+            f"{result.bytes_per_goal / 1024:.1f}",
+            str(result.errors),
+        )
+    Console().print(table)
+
+
+@click.command()
+@click.option(
+    "--paradigm",
+    "paradigms",
+    type=click.Choice(list(PARADIGMS.keys())),
+    multiple=True,
+    help="Paradigm to benchmark (repeatable; default: all)",
+)
+@click.option("--goals", default=20, help="Goals per scenario")
+@click.option(
+    "--concurrency",
+    default="1,8",
+    help="Comma-separated numbers of goals run at once",
+)
+@click.option("--max-steps", default=3, help="Maximum number of steps per goal")
+@click.option("--chat-session", is_flag=True, help="Run paradigms in chat session mode")
+@click.option(
+    "--fused", is_flag=True, help="Also benchmark ReAct with fused think/act calls"
+)
+@click.option(
+    "--route",
+    "routes",
+    multiple=True,
+    metavar="PHASE=MODEL",
+    help="Also benchmark each paradigm with this phase routed to another model",
+)
+@click.option("--exclusive-models", is_flag=True, help="Group routed calls by model")
+@click.option("--ttft", default=0.0, help="Fake server time to first token (s)")
+@click.option(
+    "--tokens-per-second", default=0.0, help="Fake server token rate (0: unlimited)"
+)
+@click.option(
+    "--load-time",
+    default=0.0,
+    help="Fake server time to load a model that is not loaded",
+)
+@click.option(
+    "--max-loaded-models", default=3, help="Models the fake server keeps loaded"
+)
+@click.option(
+    "--num-parallel",
+    default=0,
+    help="Completions the fake server serves at once (0: all)",
+)
+@click.option(
+    "--concurrency-limit",
+    type=int,
+    help="Also benchmark with an adaptive client concurrency limit starting at N",
+)
+@click.option(
+    "--failure-rate", default=0.0, help="Share of requests failed by the server"
+)
+@click.option(
+    "--output-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=Path(".benchmarks"),
+    help="Directory where results are saved and compared",
+)
+@click.option("--no-save", is_flag=True, help="Do not save the results")
+@click.option(
+    "--threshold",
+    default=0.2,
+    help="Relative change reported as a regression against the previous run",
+)
+@click.option(
+    "--fail-on-regression", is_flag=True, help="Exit with status 1 on regressions"
+)
+def main(
+    paradigms: Sequence[str],
+    goals: int,
+    concurrency: str,
+    max_steps: int,
+    chat_session: bool,
+    fused: bool,
+    routes: Sequence[str],
+    exclusive_models: bool,
+    concurrency_limit: int | None,
+    output_dir: Path,
+    no_save: bool,
+    threshold: float,
+    fail_on_regression: bool,
+    **server_settings: Any,
+) -> None:
+    """Benchmark the client and paradigms against the fake Ollama server
+
+    By default the server answers instantly, so the numbers measure the
+    overhead of this code rather than of a model. Results are saved under
+    the output directory and compared with the previous saved run.
+    """
+    levels = [int(level) for level in concurrency.split(",") if level.strip()]
+    scenarios = [(name, name, {}) for name in paradigms or PARADIGMS.keys()]
+    if fused and any(name == "react" for _, name, _ in scenarios):
+        scenarios.append(("react+fused", "react", {"fused": True}))
+    models = ["fake:latest"]
+    if routes:
+        from src.clients.routing import ModelRouter, parse_routes
+
+        try:
+            phases = parse_routes(list(routes))
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--route")
+        models = list(dict.fromkeys([*models, *phases.values()]))
+        for label, name, kwargs in list(scenarios):
+            router = ModelRouter(phases, exclusive=exclusive_models)
+            scenarios.append((f"{label}+routed", name, {**kwargs, "router": router}))
+    config = FakeOllamaConfig(seed=0, models=models, **server_settings)
+    with FakeOllama(config) as server:
+        results = asyncio.run(
+            run_benchmarks(
+                server,
+                scenarios,
+                goals,
+                levels,
+                max_steps,
+                chat_session,
+                concurrency_limit,
+            )
+        )
+
+    settings = {
+        **config.model_dump(mode="json", exclude={"rules"}),
+        "goals": goals,
+        "max_steps": max_steps,
+        "routes": sorted(routes),
+        "exclusive_models": exclusive_models,
+        "concurrency_limit": concurrency_limit,
+    }
+    report = BenchReport(
+        commit=current_commit(),
+        created=datetime.now(),
+        python=platform.python_version(),
+        settings=settings,
+        results=results,
+    )
+    previous = load_previous(output_dir, settings) if output_dir.is_dir() else None
+    print_results(results, previous)
+    if not no_save:
+        path = save_report(report, output_dir)
+        click.echo(f"Saved results to {path}", err=True)
+
+    if previous is None:
+        return
+    regressions = compare(results, previous.results, threshold)
+    if regressions:
+        click.echo(f"Regressions against {previous.commit}:", err=True)
+        for regression in regressions:
+            click.echo(f"  {regression}", err=True)
+        if fail_on_regression:
+            raise SystemExit(1)
+    else:
+        click.echo(f"No regressions against {previous.commit}", err=True)
+
+
+if __name__ == "__main__":
+    main()
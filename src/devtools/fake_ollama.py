@@ -0,0 +1,698 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+import click
+from pydantic import BaseModel
+
+# Roughly one token per word, keeping the whitespace in front of it
+TOKEN_PATTERN = re.compile(r"\s*\S+|\s+")
+
+# Size of the fake embedding vectors
+EMBEDDING_DIMENSIONS = 256
+
+
+class Rule(BaseModel):
+    """Scripted response for prompts matching ``pattern``
+
+    The pattern is searched in the prompt of ``/api/generate`` requests and in
+    the last message of ``/api/chat`` requests. Rules are tried in order.
+    """
+
+    pattern: str
+    response: str
+    endpoint: str | None = None
+
+
+# Answers shaped like the prompts of the bundled paradigms
+DEFAULT_RULES = [
+    Rule(
+        pattern=r'"done"',
+        response='{"done": false, "answer": ""}',
+    ),
+    Rule(
+        pattern=r'"steps"',
+        response=json.dumps(
+            {
+                "steps": [
+                    {"id": "E1", "description": "Gather the facts", "depends_on": []},
+                    {"id": "E2", "description": "Check the sources", "depends_on": []},
+                    {
+                        "id": "E3",
+                        "description": "Summarize #E1 and #E2",
+                        "depends_on": ["E1", "E2"],
+                    },
+                ]
+            }
+        ),
+    ),
+    Rule(
+        pattern=r'"thought"',
+        response=json.dumps(
+            {
+                "thought": {
+                    "content": "I think the next step is to look up the facts."
+                },
+                "action": {"name": "search", "args": {"query": "facts"}},
+            }
+        ),
+    ),
+    Rule(
+        pattern=r'"content"',
+        response='{"content": "I think the next step is to look up the facts."}',
+    ),
+    Rule(
+        pattern=r'"name"',
+        response='{"name": "search", "args": {"query": "facts"}}',
+    ),
+    Rule(
+        pattern=r"",
+        response="The search returned three relevant documents about the topic.",
+    ),
+]
+
+
+class FakeOllamaConfig(BaseModel):
+    """Behaviour of the fake server
+
+    Timing: the first token is sent ``ttft`` seconds after the request, then
+    ``tokens_per_second`` tokens per second (0 means as fast as possible).
+
+    Models: with ``load_time`` set, a request for a model that is not loaded
+    waits that long (one load at a time) and reports it as ``load_duration``.
+    At most ``max_loaded_models`` stay loaded; the least recently used one is
+    evicted first, and ``keep_alive: 0`` unloads a model after its request.
+
+    Capacity: with ``num_parallel`` set, only that many completions are
+    served at once, like ``OLLAMA_NUM_PARALLEL``; the others wait, and once
+    ``max_queue`` are waiting new ones are answered 503 (server busy), like
+    ``OLLAMA_MAX_QUEUE``. Waiting counts in ``total_duration`` only.
+
+    Failures: ``failure_rate`` of the completion requests are answered with
+    ``failure_status``, and ``disconnect_rate`` of the scripted streams are
+    cut off half-way. ``stall_rate`` of the completions are stragglers that
+    wait another ``stall_time`` seconds before their first token.
+
+    Record/replay: with ``upstream`` set, completions are forwarded to a real
+    Ollama server and each exchange is appended to ``record_path``. With
+    ``replay_path`` set, recorded responses are served (with the configured
+    timing) and unknown requests get a 404.
+    """
+
+    models: List[str] = ["fake:latest"]
+    rules: List[Rule] = DEFAULT_RULES
+    ttft: float = 0.0
+    tokens_per_second: float = 0.0
+    load_time: float = 0.0
+    max_loaded_models: int = 3
+    num_parallel: int = 0
+    max_queue: int = 512
+    failure_rate: float = 0.0
+    failure_status: int = 503
+    disconnect_rate: float = 0.0
+    stall_rate: float = 0.0
+    stall_time: float = 5.0
+    seed: int | None = None
+    upstream: str | None = None
+    record_path: Path | None = None
+    replay_path: Path | None = None
+
+
+class ServerStats(BaseModel):
+    """Traffic seen by the fake server"""
+
+    requests: Dict[str, int] = {}
+    bytes_received: int = 0
+    bytes_sent: int = 0
+    failures: int = 0
+    disconnects: int = 0
+    loads: int = 0
+    busy: int = 0
+    max_waiting: int = 0
+
+
+def request_key(path: str, body: Dict[str, Any]) -> str:
+    """Key of a completion request for replay; streaming mode does not matter"""
+    request = {key: value for key, value in body.items() if key != "stream"}
+    canonical = json.dumps([path, request], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def prompt_text(path: str, body: Dict[str, Any], whole: bool = False) -> str:
+    """The prompt of a completion request
+
+    For chat requests this is the last message, or every message with
+    ``whole=True``.
+    """
+    if path == "/api/chat":
+        messages = body.get("messages") or [{}]
+        if whole:
+            return "\n".join(message.get("content", "") for message in messages)
+        return messages[-1].get("content", "")
+    if whole:
+        return f"{body.get('system') or ''}\n{body.get('prompt', '')}"
+    return body.get("prompt", "")
+
+
+def embed_text(text: str) -> List[float]:
+    """A hashed bag-of-words unit vector: texts sharing words are similar"""
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.sha256(word.encode()).digest()
+        index = int.from_bytes(digest[:4], "big") % EMBEDDING_DIMENSIONS
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = sum(value * value for value in vector) ** 0.5 or 1.0
+    return [value / norm for value in vector]
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into word-sized tokens that join back to the text"""
+    return TOKEN_PATTERN.findall(text)
+
+
+class _Timing:
+    """Ollama-style server metrics of one fake completion"""
+
+    def __init__(self, prompt: str):
+        self.started = time.perf_counter()
+        self.first_token: float | None = None
+        self.prompt_tokens = len(tokenize(prompt))
+        self.eval_count = 0
+        self.load_duration = 0.0
+        self.queue_duration = 0.0
+
+    def count(self, tokens: Iterable[str]) -> Iterator[str]:
+        for token in tokens:
+            if self.first_token is None:
+                self.first_token = time.perf_counter()
+            self.eval_count += 1
+            yield token
+
+    def metrics(self) -> Dict[str, int]:
+        now = time.perf_counter()
+        first_token = self.first_token or now
+        return {
+            "total_duration": int((now - self.started) * 1e9),
+            "load_duration": int(self.load_duration * 1e9),
+            "prompt_eval_count": self.prompt_tokens,
+            "prompt_eval_duration": int(
+                (first_token - self.started - self.queue_duration - self.load_duration)
+                * 1e9
+            ),
+            "eval_count": self.eval_count,
+            "eval_duration": int((now - first_token) * 1e9),
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _write(self, data: bytes) -> None:
+        self.wfile.write(data)
+        self.server.fake.count(sent=len(data))
+
+    def _send_json(self, status: int, obj: Any) -> None:
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self._write(body)
+
+    def _send_chunk(self, obj: Dict[str, Any]) -> None:
+        line = json.dumps(obj).encode() + b"\n"
+        self._write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def do_GET(self) -> None:
+        fake = self.server.fake
+        fake.count(path=self.path)
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": fake.model_list()})
+        elif self.path == "/api/ps":
+            self._send_json(200, {"models": fake.model_list(fake.loaded())})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        fake = self.server.fake
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        fake.count(path=self.path, received=len(raw))
+        if self.path not in ("/api/generate", "/api/chat", "/api/embed"):
+            self._send_json(404, {"error": "not found"})
+            return
+        body = json.loads(raw)
+
+        if fake.roll("failure_rate"):
+            fake.count(failures=1)
+            self._send_json(fake.config.failure_status, {"error": "injected failure"})
+            return
+
+        timing = _Timing(prompt_text(self.path, body, whole=True))
+        if not fake.enter():
+            fake.count(busy=1)
+            self._send_json(503, {"error": "server busy, please try again"})
+            return
+        try:
+            timing.queue_duration = time.perf_counter() - timing.started
+            timing.load_duration = fake.load(body.get("model", ""))
+            if self.path == "/api/embed":
+                self._embed(body, timing)
+                return
+            if "prompt" not in body and "messages" not in body:
+                # A load request: answer once the model is loaded
+                fake.unload_if_asked(body)
+                chunk = fake.chunk(
+                    self.path == "/api/chat", "", metrics=timing.metrics()
+                )
+                self._send_json(200, {**chunk, "done_reason": "load"})
+                return
+            try:
+                self._complete(body, timing)
+            finally:
+                fake.unload_if_asked(body)
+        finally:
+            fake.leave()
+
+    def _embed(self, body: Dict[str, Any], timing: _Timing) -> None:
+        texts = body.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        metrics = timing.metrics()
+        self._send_json(
+            200,
+            {
+                "model": body.get("model", ""),
+                "embeddings": [embed_text(text) for text in texts],
+                "total_duration": metrics["total_duration"],
+                "load_duration": metrics["load_duration"],
+                "prompt_eval_count": metrics["prompt_eval_count"],
+            },
+        )
+
+    def _complete(self, body: Dict[str, Any], timing: _Timing) -> None:
+        fake = self.server.fake
+        cut_at: int | None = None
+        if fake.config.upstream:
+            tokens = fake.forward(self.path, body)
+        else:
+            text = fake.respond(self.path, body)
+            if text is None:
+                self._send_json(404, {"error": "no recorded response"})
+                return
+            token_list = tokenize(text)
+            if fake.roll("disconnect_rate"):
+                cut_at = len(token_list) // 2
+            tokens = fake.pace(token_list)
+        tokens = timing.count(tokens)
+
+        chat = self.path == "/api/chat"
+        if not body.get("stream", True):
+            text = "".join(tokens)
+            self._send_json(200, fake.chunk(chat, text, metrics=timing.metrics()))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for index, token in enumerate(tokens):
+                if index == cut_at:
+                    fake.count(disconnects=1)
+                    self.close_connection = True
+                    return
+                self._send_chunk(fake.chunk(chat, token))
+            self._send_chunk(fake.chunk(chat, "", metrics=timing.metrics()))
+            self._write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading, e.g. once its JSON object was complete
+            self.close_connection = True
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: "FakeOllama"
+
+
+class FakeOllama:
+    """Local stand-in for the Ollama endpoints used by the clients
+
+    Serves ``/api/tags``, ``/api/ps``, ``/api/generate`` and ``/api/chat``
+    from scripted rules or recorded traffic, on a background thread.
+    ``/api/embed`` returns bag-of-words vectors, so texts sharing most words
+    come out similar::
+
+        with FakeOllama(FakeOllamaConfig(ttft=0.2)) as server:
+            client = AsyncOllamaClient(base_url=server.base_url)
+    """
+
+    def __init__(
+        self,
+        config: FakeOllamaConfig | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.config = config or FakeOllamaConfig()
+        self.stats = ServerStats()
+        self._lock = threading.Lock()
+        self._random = random.Random(self.config.seed)
+        self._rules = [(re.compile(rule.pattern), rule) for rule in self.config.rules]
+        self._recorded: Dict[str, str] = {}
+        # Loaded models, least recently used first; one load at a time
+        self._loaded: Dict[str, None] = {}
+        self._load_lock = threading.Lock()
+        # Completion slots (num_parallel) and the requests waiting for one
+        self._slots = (
+            threading.BoundedSemaphore(self.config.num_parallel)
+            if self.config.num_parallel
+            else None
+        )
+        self._waiting = 0
+        if self.config.replay_path is not None:
+            self._recorded = self.load_recording(self.config.replay_path)
+        self._server = _Server((host, port), _Handler)
+        self._server.fake = self
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        """Serve on a daemon thread"""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-ollama", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve on the calling thread until interrupted"""
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeOllama":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def reset_stats(self) -> ServerStats:
+        """Return the stats so far and start counting from zero"""
+        with self._lock:
+            stats, self.stats = self.stats, ServerStats()
+        return stats
+
+    def count(
+        self,
+        path: str | None = None,
+        received: int = 0,
+        sent: int = 0,
+        failures: int = 0,
+        disconnects: int = 0,
+        busy: int = 0,
+    ) -> None:
+        with self._lock:
+            if path is not None:
+                self.stats.requests[path] = self.stats.requests.get(path, 0) + 1
+            self.stats.bytes_received += received
+            self.stats.bytes_sent += sent
+            self.stats.failures += failures
+            self.stats.disconnects += disconnects
+            self.stats.busy += busy
+
+    def roll(self, rate_name: str) -> bool:
+        """Decide whether to inject the failure configured by ``rate_name``"""
+        rate = getattr(self.config, rate_name)
+        if not rate:
+            return False
+        with self._lock:
+            return self._random.random() < rate
+
+    def enter(self) -> bool:
+        """Wait for a completion slot; False if the queue is full"""
+        if self._slots is None:
+            return True
+        if self._slots.acquire(blocking=False):
+            return True
+        with self._lock:
+            if self._waiting >= self.config.max_queue:
+                return False
+            self._waiting += 1
+            self.stats.max_waiting = max(self.stats.max_waiting, self._waiting)
+        try:
+            self._slots.acquire()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        return True
+
+    def leave(self) -> None:
+        """Free the completion slot taken by ``enter``"""
+        if self._slots is not None:
+            self._slots.release()
+
+    def load(self, model: str) -> float:
+        """Make ``model`` the most recently used one, loading it if needed
+
+        Returns the seconds spent loading (0 without ``load_time``).
+        """
+        if not self.config.load_time:
+            return 0.0
+        with self._load_lock:
+            if model in self._loaded:
+                self._loaded[model] = self._loaded.pop(model)
+                return 0.0
+            time.sleep(self.config.load_time)
+            self._loaded[model] = None
+            while len(self._loaded) > self.config.max_loaded_models:
+                del self._loaded[next(iter(self._loaded))]
+        with self._lock:
+            self.stats.loads += 1
+        return self.config.load_time
+
+    def unload_if_asked(self, body: Dict[str, Any]) -> None:
+        """Unload the request's model if it asked for ``keep_alive`` 0"""
+        if body.get("keep_alive") in (0, "0", "0s"):
+            with self._load_lock:
+                self._loaded.pop(body.get("model", ""), None)
+
+    def loaded(self) -> List[str]:
+        """Models currently loaded, least recently used first"""
+        with self._load_lock:
+            return list(self._loaded)
+
+    def model_list(self, names: List[str] | None = None) -> List[Dict[str, Any]]:
+        """Model entries as listed by ``/api/tags`` (all models) or ``/api/ps``"""
+        return [
+            {
+                "name": name,
+                "model": name,
+                "modified_at": "2024-01-01T00:00:00Z",
+                "size": 0,
+                "digest": hashlib.sha256(name.encode()).hexdigest(),
+                "details": {},
+            }
+            for name in (self.config.models if names is None else names)
+        ]
+
+    def respond(self, path: str, body: Dict[str, Any]) -> str | None:
+        """The scripted or recorded response text for a completion request"""
+        if self.config.replay_path is not None:
+            return self._recorded.get(request_key(path, body))
+        prompt = prompt_text(path, body)
+        for pattern, rule in self._rules:
+            if rule.endpoint in (None, path) and pattern.search(prompt):
+                return rule.response
+        return ""
+
+    def pace(self, tokens: List[str]) -> Iterator[str]:
+        """Yield tokens with the configured time-to-first-token and rate"""
+        if self.config.ttft:
+            time.sleep(self.config.ttft)
+        if self.roll("stall_rate"):
+            time.sleep(self.config.stall_time)
+        rate = self.config.tokens_per_second
+        interval = 1 / rate if rate else 0
+        for index, token in enumerate(tokens):
+            if index and interval:
+                time.sleep(interval)
+            yield token
+
+    @staticmethod
+    def chunk(
+        chat: bool, text: str, metrics: Dict[str, int] | None = None
+    ) -> Dict[str, Any]:
+        """One response object in Ollama's format; the last one has ``metrics``"""
+        chunk: Dict[str, Any] = (
+            {"message": {"role": "assistant", "content": text}}
+            if chat
+            else {"response": text}
+        )
+        chunk["done"] = metrics is not None
+        chunk.update(metrics or {})
+        return chunk
+
+    def forward(self, path: str, body: Dict[str, Any]) -> Iterator[str]:
+        """Stream a completion from the upstream server, recording the exchange"""
+        import httpx
+
+        chat = path == "/api/chat"
+        started = time.perf_counter()
+        first_token: float | None = None
+        tokens: List[str] = []
+        with httpx.stream(
+            "POST",
+            f"{self.config.upstream}{path}",
+            json={**body, "stream": True},
+            timeout=None,
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                token = (
+                    chunk.get("message", {}).get("content", "")
+                    if chat
+                    else chunk.get("response", "")
+                )
+                if token:
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                    tokens.append(token)
+                    yield token
+                if chunk.get("done"):
+                    break
+
+        if self.config.record_path is not None:
+            self.record(
+                {
+                    "key": request_key(path, body),
+                    "path": path,
+                    "request": body,
+                    "response": "".join(tokens),
+                    "ttft": first_token,
+                    "duration": time.perf_counter() - started,
+                    "tokens": len(tokens),
+                }
+            )
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        with self._lock, open(self.config.record_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def load_recording(path: Path) -> Dict[str, str]:
+        """Map request keys to responses from a recording (last one wins)"""
+        recorded = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    recorded[entry["key"]] = entry["response"]
+        return recorded
+
+
+def load_rules(path: Path) -> List[Rule]:
+    """Read rules from a JSON list of ``{"pattern", "response", "endpoint"}``"""
+    return [Rule.model_validate(rule) for rule in json.loads(path.read_text())]
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", help="Address to listen on")
+@click.option("--port", default=11434, help="Port to listen on")
+@click.option(
+    "--models",
+    default="fake:latest",
+    help="Comma-separated model names reported by /api/tags",
+)
+@click.option(
+    "--rules",
+    "rules_path",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="JSON file of scripted responses (pattern, response, endpoint)",
+)
+@click.option("--ttft", default=0.0, help="Seconds before the first token")
+@click.option(
+    "--tokens-per-second", default=0.0, help="Token rate after the first (0: unlimited)"
+)
+@click.option(
+    "--load-time", default=0.0, help="Seconds to load a model that is not loaded"
+)
+@click.option(
+    "--max-loaded-models",
+    default=3,
+    help="Models kept loaded at once (with --load-time)",
+)
+@click.option(
+    "--num-parallel", default=0, help="Completions served at once (0: unlimited)"
+)
+@click.option(
+    "--max-queue",
+    default=512,
+    help="Completions waiting before 503 (with --num-parallel)",
+)
+@click.option(
+    "--failure-rate", default=0.0, help="Share of requests answered with an error"
+)
+@click.option("--failure-status", default=503, help="HTTP status of injected failures")
+@click.option(
+    "--disconnect-rate", default=0.0, help="Share of streams cut off half-way"
+)
+@click.option("--stall-rate", default=0.0, help="Share of completions that stall")
+@click.option(
+    "--stall-time", default=5.0, help="Extra seconds before a stalled first token"
+)
+@click.option("--seed", type=int, help="Seed for failure injection")
+@click.option("--upstream", help="Real Ollama URL to forward completions to")
+@click.option(
+    "--record",
+    "record_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Append forwarded exchanges to this JSONL file (needs --upstream)",
+)
+@click.option(
+    "--replay",
+    "replay_path",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Serve responses recorded with --record",
+)
+def main(
+    host: str, port: int, models: str, rules_path: Path | None, **settings: Any
+) -> None:
+    """Serve a fake Ollama API for development and benchmarks"""
+    if settings["record_path"] and not settings["upstream"]:
+        raise click.UsageError("--record needs --upstream")
+    config = FakeOllamaConfig(
+        models=[name.strip() for name in models.split(",") if name.strip()],
+        **({"rules": load_rules(rules_path)} if rules_path else {}),
+        **settings,
+    )
+    server = FakeOllama(config, host=host, port=port)
+    click.echo(f"Fake Ollama listening on {server.base_url}", err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import pytest
+from rich.console import Console
+
+from src.agents.paradigms import ReActParadigm
+from src.agents.tools import ToolRegistry
+from src.clients.ollama_client import AsyncOllamaClient
+from src.devtools.fake_ollama import FakeOllama, FakeOllamaConfig
+
+
+@pytest.fixture
+def fake_config():
+    """Configuration of the ``server`` fixture; override it to script replies"""
+    return FakeOllamaConfig()
+
+
+@pytest.fixture
+def server(fake_config):
+    with FakeOllama(fake_config) as fake:
+        yield fake
+
+
+@pytest.fixture
+def make_paradigm(server):
+    """Build a paradigm that talks to ``server``, without tools or output"""
+
+    def make(paradigm_class=ReActParadigm, **kwargs):
+        kwargs.setdefault("console", Console(quiet=True))
+        return paradigm_class(
+            "fake",
+            llm=AsyncOllamaClient(base_url=server.base_url),
+            tools=ToolRegistry(),
+            **kwargs,
+        )
+
+    return make
@@ -0,0 +1,33 @@
+import json
+
+from click.testing import CliRunner
+
+from src import batch
+
+
+def test_bad_lines_become_error_records_and_the_batch_goes_on(server):
+    lines = [
+        '"first goal"',
+        "{not json",
+        "42",
+        '{"id": "g4", "goal": "last goal"}',
+        '{"id": "g5", "paradigm": "react"}',
+    ]
+    result = CliRunner().invoke(
+        batch.main,
+        ["--model", "fake", "--base-url", server.base_url, "--max-steps", "1"],
+        input="\n".join(lines) + "\n",
+    )
+    assert result.exit_code == 0, result.output
+    records = {
+        record["id"]: record for record in map(json.loads, result.stdout.splitlines())
+    }
+    assert records[1]["status"] == records["g4"]["status"] == "ok"
+    assert records[2]["status"] == records[3]["status"] == "error"
+    assert records[2]["error"].startswith("Line 2: invalid JSON")
+    assert records[3]["error"] == "Line 3: expected a goal string or object, got int"
+    assert records["g5"]["status"] == "error"
+    assert records["g5"]["error"] == (
+        'Line 5: expected a goal string in the "goal" field'
+    )
+    assert "Completed 5 goals (3 failed)" in result.stderr
@@ -0,0 +1,45 @@
+import time
+
+import pytest
+
+from src.agents.tools.builtin import MAX_DIGITS, calculate
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "((9**999)**999)**99",
+        "9**9**9",
+        "(10**2000)*(10**2001)",
+        "2**(2**20)",
+    ],
+)
+def test_calculate_refuses_huge_integers_without_computing_them(expression):
+    started = time.perf_counter()
+    with pytest.raises(ValueError, match="too large"):
+        calculate(expression)
+    assert time.perf_counter() - started < 0.5
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        ("2**1000", 2**1000),
+        ("(10**2000)*(10**2000)", 10**4000),
+        ("1**10**100", 1),
+        ("2**-10", 2**-10),
+        ("sqrt(16) * (3 + 4) ** 2", 196.0),
+    ],
+)
+def test_calculate_allows_results_within_the_limit(expression, expected):
+    assert calculate(expression) == expected
+
+
+def test_limit_stays_below_the_int_to_text_limit():
+    # Tool results are returned as text
+    assert len(str(calculate(f"10**{MAX_DIGITS - 1}"))) == MAX_DIGITS
+
+
+def test_float_powers_overflow_instead_of_growing():
+    with pytest.raises(OverflowError):
+        calculate("2.5**2000")
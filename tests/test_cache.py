@@ -0,0 +1,63 @@
+import asyncio
+
+from src.clients.cache import ResponseCache, is_cacheable
+from src.clients.ollama_client import AsyncOllamaClient
+
+OPTIONS = {"temperature": 0}
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert cache.stats.evictions == 1
+
+
+def test_disk_tier_outlives_the_memory_tier(tmp_path):
+    ResponseCache(tmp_path).put("key", "value")
+    cache = ResponseCache(tmp_path)
+    assert cache.get("key") == "value"
+    assert cache.stats.disk_hits == 1
+    assert cache.get("key") == "value"
+    assert cache.stats.memory_hits == 1
+
+
+def test_expired_entries_are_misses():
+    cache = ResponseCache(max_age=0)
+    cache.put("key", "value")
+    assert cache.get("key") is None
+    assert cache.stats.misses == 1
+
+
+def test_only_deterministic_options_are_cacheable():
+    assert is_cacheable({"temperature": 0})
+    assert is_cacheable({"seed": 1})
+    assert not is_cacheable({"temperature": 0.7})
+    assert not is_cacheable(None)
+
+
+def test_responses_are_not_reused_once_the_model_changes(server):
+    cache = ResponseCache()
+
+    async def run(digest=None):
+        client = AsyncOllamaClient(base_url=server.base_url, cache=cache)
+        if digest is not None:
+            installed = client.models
+
+            async def updated(timeout=None):
+                models = await installed(timeout)
+                return [model.model_copy(update={"digest": digest}) for model in models]
+
+            client.models = updated
+        return await client.generate("fake", "hello", options=OPTIONS)
+
+    first = asyncio.run(run())
+    assert asyncio.run(run()) == first
+    assert server.stats.requests["/api/generate"] == 1
+    assert asyncio.run(run(digest="updated")) == first
+    assert server.stats.requests["/api/generate"] == 2
@@ -0,0 +1,43 @@
+import json
+
+from src.agents.paradigms.checkpoint import EventLog
+
+
+def _torn_log(path, events, torn='{"event": "item", "kind": "thou'):
+    path.write_text(
+        "".join(json.dumps(event) + "\n" for event in events) + torn, encoding="utf-8"
+    )
+
+
+def test_torn_last_line_is_cut_so_later_events_stay_readable(tmp_path):
+    path = tmp_path / "run.jsonl"
+    _torn_log(path, [{"event": "start", "paradigm": "react", "goal": "g"}])
+    log = EventLog(path)
+    log.append("resume", completed=0)
+    assert [event["event"] for event in log.events()] == ["start", "resume"]
+
+
+def test_unreadable_lines_are_skipped(tmp_path):
+    path = tmp_path / "run.jsonl"
+    path.write_text('{"event": "start"}\nnot json\n{"event": "resume"}\n')
+    assert [event["event"] for event in EventLog(path).events()] == [
+        "start",
+        "resume",
+    ]
+
+
+def test_run_resumes_from_a_torn_log(make_paradigm, tmp_path):
+    path = tmp_path / "run.jsonl"
+    make_paradigm(event_log=path).run("goal", max_steps=2, interactive=False)
+    # A crash in the third step, in the middle of writing an event
+    events = [json.loads(line) for line in path.read_text().splitlines()]
+    _torn_log(path, events)
+
+    result = make_paradigm(event_log=path).run("goal", max_steps=3, interactive=False)
+    assert result.llm_calls == 3
+    assert len(result.steps) == 9
+    logged = EventLog(path)
+    assert logged.completed_steps() == [1, 2, 3]
+    # Resumed again, nothing is left to do
+    again = make_paradigm(event_log=path).run("goal", max_steps=3, interactive=False)
+    assert again.llm_calls == 0
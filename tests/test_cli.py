@@ -0,0 +1,38 @@
+import pytest
+from click.testing import CliRunner
+
+from src import cli
+
+MODELS = ["llama3:70b", "llama3.2:1b", "mistral:latest"]
+
+
+@pytest.fixture(autouse=True)
+def available_models(monkeypatch):
+    monkeypatch.setattr(cli, "get_available_models", lambda refresh=False: MODELS)
+
+
+@pytest.mark.parametrize(
+    "model, available",
+    [
+        ("llama3.2:1b", True),
+        ("mistral:latest", True),
+        ("mistral", True),
+        ("llama3", False),
+        ("llama3:8b", False),
+        ("phi3", False),
+    ],
+)
+def test_bare_names_mean_the_latest_tag(model, available):
+    assert cli.is_available(model, MODELS) is available
+
+
+def test_routes_accept_tagged_models():
+    runner = CliRunner()
+    result = runner.invoke(
+        cli.main,
+        ["--model", "llama3:70b", "--route", "act=llama3.2:1b", "--route", "x=nope"],
+    )
+    assert (
+        "'nope' is not one of llama3:70b, llama3.2:1b, mistral:latest" in result.output
+    )
+    assert "llama3.2:1b' is not" not in result.output
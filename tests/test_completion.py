@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from src.agents.paradigms import ReActParadigm, ReWOOParadigm
+from src.devtools.fake_ollama import FakeOllamaConfig, Rule
+
+FINAL = json.dumps({"name": "final_answer", "args": {"answer": "42"}})
+SEARCH = json.dumps({"name": "search", "args": {"query": "facts"}})
+PLAN = json.dumps(
+    {
+        "steps": [
+            {"id": "E1", "description": "Search the facts", "depends_on": []},
+            {"id": "E2", "description": "Give the answer from #E1"},
+            {"id": "E3", "description": "Double-check #E2"},
+        ]
+    }
+)
+
+
+def _rules(*rules):
+    return FakeOllamaConfig(
+        rules=[
+            Rule(pattern='"done"', response='{"done": true, "answer": "done early"}'),
+            *rules,
+            Rule(pattern='"content"', response='{"content": "I know the answer."}'),
+            Rule(pattern='"name"', response=SEARCH),
+            Rule(pattern="", response="Three documents were found."),
+        ]
+    )
+
+
+@pytest.fixture
+def fake_config(request):
+    return request.param
+
+
+@pytest.mark.parametrize(
+    "fake_config", [_rules(Rule(pattern='"name"', response=FINAL))], indirect=True
+)
+def test_react_stops_at_a_final_answer(server, make_paradigm):
+    result = make_paradigm(ReActParadigm).run("goal", max_steps=5, interactive=False)
+    assert result.goal_achieved
+    assert result.final_answer == "42"
+    # Think and act, without observing the final answer
+    assert result.llm_calls == server.stats.requests["/api/generate"] == 2
+
+
+@pytest.mark.parametrize("fake_config", [_rules()], indirect=True)
+def test_react_stops_once_the_completion_check_says_done(make_paradigm):
+    paradigm = make_paradigm(ReActParadigm, check_completion=True)
+    result = paradigm.run("goal", max_steps=5, interactive=False)
+    assert result.goal_achieved
+    assert result.final_answer == "done early"
+    assert len(result.step_durations) == 1
+
+
+@pytest.mark.parametrize("fake_config", [_rules()], indirect=True)
+def test_react_without_an_answer_runs_every_step(make_paradigm):
+    result = make_paradigm(ReActParadigm).run("goal", max_steps=3, interactive=False)
+    assert not result.goal_achieved
+    assert len(result.step_durations) == 3
+
+
+@pytest.mark.parametrize(
+    "fake_config",
+    [
+        _rules(
+            Rule(pattern='"steps"', response=PLAN),
+            Rule(pattern="Give the answer", response=FINAL),
+        )
+    ],
+    indirect=True,
+)
+def test_rewoo_skips_the_steps_after_a_final_answer(make_paradigm):
+    result = make_paradigm(ReWOOParadigm).run("goal", max_steps=5, interactive=False)
+    assert result.goal_achieved
+    assert result.final_answer == "42"
+    actions = [step["name"] for step in result.steps if step["type"] == "action"]
+    assert actions == ["search", "final_answer"]
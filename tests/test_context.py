@@ -0,0 +1,56 @@
+import pytest
+
+from src.agents.paradigms.context import ContextWindow
+
+# Each line is nine tokens long
+LINES = [f"line {n} " + "x" * 30 for n in range(6)]
+
+
+def _window(**kwargs):
+    window = ContextWindow(**kwargs)
+    for line in LINES:
+        window.append(line)
+    return window
+
+
+def test_oldest_lines_are_dropped_to_fit_the_budget():
+    window = ContextWindow(max_tokens=30, keep_recent=2)
+    window.pin("PINNED")
+    for line in LINES:
+        window.append(line)
+    assert window.tokens <= 30
+    assert window.dropped == 3
+    assert window.render() == "\n".join(
+        ["PINNED", "(3 earlier entries omitted)", *LINES[3:]]
+    )
+
+
+def test_recent_lines_are_kept_over_the_budget():
+    window = _window(max_tokens=10, keep_recent=3)
+    assert len(window) == 3
+    assert window.tokens > 10
+    assert window.render().endswith("\n".join(LINES[3:]))
+
+
+def test_without_a_budget_nothing_is_dropped():
+    window = _window(max_tokens=None)
+    assert window.dropped == 0
+    assert window.render() == "\n".join(LINES)
+
+
+def test_summary_replaces_the_lines_it_covers():
+    window = _window(max_tokens=100, keep_recent=2, summarize_at=40)
+    summary, lines, upto = window.take_summary_batch()
+    assert summary is None
+    assert lines == LINES[:4]
+    # Only one batch is summarized at a time
+    assert window.take_summary_batch() is None
+    window.apply_summary(upto, "Looked things up.")
+    assert window.render() == "\n".join(
+        ["Summary of earlier steps: Looked things up.", *LINES[4:]]
+    )
+
+
+def test_summarize_at_must_be_below_the_budget():
+    with pytest.raises(ValueError, match="summarize_at"):
+        ContextWindow(max_tokens=100, summarize_at=100)
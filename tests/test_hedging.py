@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+import pytest
+
+from src.agents.paradigms.react import Action, Thought
+from src.clients.hedging import Hedging
+from src.devtools.fake_ollama import FakeOllamaConfig
+
+
+@pytest.fixture
+def fake_config():
+    # With this seed the first request stalls and the second does not
+    return FakeOllamaConfig(stall_rate=0.5, stall_time=5.0, seed=1)
+
+
+def test_delay_is_the_percentile_of_recent_durations():
+    hedging = Hedging(percentile=50, initial_delay=2.0, min_delay=0.5, min_samples=4)
+    assert hedging.delay("fake", "act") == 2.0
+    for seconds in (1.0, 3.0, 2.0, 4.0):
+        hedging.observe("fake", "act", seconds)
+    assert hedging.delay("fake", "act") == 3.0
+    # Durations are kept per model and phase
+    assert hedging.delay("fake", "think") == 2.0
+    for _ in range(4):
+        hedging.observe("fake", "think", 0.1)
+    assert hedging.delay("fake", "think") == 0.5
+
+
+def test_percentile_must_be_in_range():
+    with pytest.raises(ValueError, match="Percentile"):
+        Hedging(percentile=0)
+
+
+def _hedged(make_paradigm, call):
+    hedging = Hedging(initial_delay=0.2)
+    paradigm = make_paradigm(hedging=hedging)
+    paradigm._start_run("system", interactive=False)
+    started = time.perf_counter()
+    result = asyncio.run(call(paradigm))
+    return result, hedging.stats, time.perf_counter() - started
+
+
+def test_slow_json_call_is_hedged_and_the_loser_cancelled(server, make_paradigm):
+    action, stats, elapsed = _hedged(
+        make_paradigm, lambda paradigm: paradigm.aact(Thought(content="look it up"))
+    )
+    assert action == Action(name="search", args={"query": "facts"})
+    assert elapsed < 2.0
+    assert stats.model_dump() == {
+        "calls": 1,
+        "hedges": 1,
+        "hedge_wins": 1,
+        "cancelled": 1,
+    }
+    assert server.stats.requests["/api/generate"] == 2
+
+
+def test_slow_text_call_is_hedged_and_the_loser_cancelled(server, make_paradigm):
+    observation, stats, elapsed = _hedged(
+        make_paradigm,
+        lambda paradigm: paradigm.aobserve(Action(name="search", args={})),
+    )
+    assert observation.content.startswith("The search returned")
+    assert elapsed < 2.0
+    assert stats.model_dump() == {
+        "calls": 1,
+        "hedges": 1,
+        "hedge_wins": 1,
+        "cancelled": 1,
+    }
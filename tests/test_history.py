@@ -0,0 +1,51 @@
+import pytest
+from pydantic import BaseModel
+
+from src.agents.paradigms.history import HistoryStore
+
+
+class Note(BaseModel):
+    text: str
+
+
+def _store(**kwargs):
+    store = HistoryStore(**kwargs)
+    for n in range(5):
+        store.append(Note(text=f"note {n}"), step=n // 2, phase="think")
+    return store
+
+
+def test_oldest_records_spill_to_disk_and_stay_readable(tmp_path):
+    store = _store(max_records=2, spill_path=tmp_path / "spill.jsonl")
+    assert len(store) == 5
+    assert store.evicted == 3
+    assert [record.fields()["text"] for record in store] == ["note 3", "note 4"]
+    assert [item["text"] for item in store.to_list()] == [f"note {n}" for n in range(5)]
+    assert store.to_list()[0] == {"type": "note", "text": "note 0"}
+
+
+def test_without_a_spill_file_evicted_records_are_dropped():
+    store = _store(max_records=2)
+    assert [item["text"] for item in store.to_list()] == ["note 3", "note 4"]
+
+
+def test_byte_limit_keeps_at_least_the_newest_record():
+    store = _store(max_records=None, max_bytes=1)
+    assert [record.fields()["text"] for record in store] == ["note 4"]
+    assert store.nbytes > 1
+
+
+def test_find_matches_every_criterion_among_records_in_memory():
+    store = _store(max_records=4)
+    store.append(Note(text="act"), step=2, phase="act")
+    assert [record.seq for record in store.find(step=1)] == [2, 3]
+    assert [record.seq for record in store.find(step=2, phase="think")] == [4]
+    assert [record.seq for record in store.find(kind="note", phase="act")] == [5]
+    # Records that left memory are not indexed any more
+    assert store.find(step=0) == []
+    assert store.last("note").seq == 5
+
+
+def test_find_rejects_unindexed_fields():
+    with pytest.raises(ValueError, match="text"):
+        HistoryStore().find(text="note 0")
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from src.clients.json_stream import extract_json, parse_json_stream, read_json_stream
+
+
+async def _tokens(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def _read(*chunks, on_field=None):
+    return asyncio.run(read_json_stream(_tokens(*chunks), on_field))
+
+
+def test_complete_object_is_reported_field_by_field():
+    fields = []
+    result, complete = _read(
+        'Sure:\n```json\n{"name": "sea',
+        'rch", "args": {"q": 1}}',
+        " trailing text",
+        on_field=lambda key, value: fields.append((key, value)),
+    )
+    assert complete
+    assert result == {"name": "search", "args": {"q": 1}}
+    assert fields == [("name", "search"), ("args", {"q": 1})]
+
+
+def test_stream_is_closed_once_the_object_is_complete():
+    sent = []
+
+    async def tokens():
+        for chunk in ('{"a": 1}', " more", " text"):
+            sent.append(chunk)
+            yield chunk
+
+    asyncio.run(parse_json_stream(tokens()))
+    assert sent == ['{"a": 1}']
+
+
+@pytest.mark.parametrize(
+    "chunks, expected",
+    [
+        (('{"content": "cut off mid-sen',), {"content": "cut off mid-sen"}),
+        (
+            ('{"steps": [{"id": "E1"}, {"id": "E',),
+            {"steps": [{"id": "E1"}, {"id": "E"}]},
+        ),
+        (('```json\n{"a": 1, "b": [1, 2',), {"a": 1, "b": [1, 2]}),
+        (('{"a": 1, "b": tr',), {"a": 1}),
+    ],
+)
+def test_truncated_object_is_recovered_but_marked_incomplete(chunks, expected):
+    result, complete = _read(*chunks)
+    assert not complete
+    assert result == expected
+
+
+def test_stream_without_an_object_raises():
+    with pytest.raises(ValueError, match="Incomplete JSON"):
+        _read("I cannot answer that.")
+
+
+def test_extract_json_skips_prose_and_non_objects():
+    assert extract_json('[1, 2] then {"a": {"b": 2}} and {"c": 3}') == {"a": {"b": 2}}
+    assert extract_json("no object here") is None
@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import pytest
+
+from src.clients.limiter import AdaptiveLimiter, Overloaded, _admission, admission
+
+
+async def _call(limiter, order=None, name=None, hold=None, congested=False):
+    async with limiter.slot("fake") as permit:
+        if order is not None:
+            order.append(name)
+        if hold is not None:
+            await hold.wait()
+        permit.responded()
+        if congested:
+            permit.overloaded()
+
+
+def test_limit_grows_when_full_and_shrinks_on_congestion():
+    async def run():
+        limiter = AdaptiveLimiter(initial_limit=1, backoff=0.5)
+        await _call(limiter)
+        assert limiter.limit == 2.0
+        await _call(limiter, congested=True)
+        assert limiter.limit == 1.0
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.stats.congested == 1
+
+
+def test_calls_sent_before_a_decrease_do_not_shrink_the_limit_again():
+    async def run():
+        limiter = AdaptiveLimiter(initial_limit=4, backoff=0.5)
+        hold = asyncio.Event()
+        calls = [
+            asyncio.ensure_future(_call(limiter, hold=hold, congested=True))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        hold.set()
+        await asyncio.gather(*calls)
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.limit == 2.0
+    assert limiter.stats.congested == 3
+
+
+def test_most_urgent_waiting_call_goes_first():
+    async def run():
+        limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+        order, hold = [], asyncio.Event()
+        first = asyncio.ensure_future(_call(limiter, order, "first", hold))
+        await asyncio.sleep(0)
+        waiting = []
+        for priority in ("background", "batch", "interactive"):
+            with admission(priority):
+                waiting.append(asyncio.ensure_future(_call(limiter, order, priority)))
+        await asyncio.sleep(0)
+        hold.set()
+        await asyncio.gather(first, *waiting)
+        return order
+
+    assert asyncio.run(run()) == ["first", "interactive", "batch", "background"]
+
+
+def test_full_queue_sheds_the_least_urgent_call():
+    async def run():
+        limiter = AdaptiveLimiter(initial_limit=1, max_limit=1, max_queue=1)
+        hold = asyncio.Event()
+        first = asyncio.ensure_future(_call(limiter, hold=hold))
+        await asyncio.sleep(0)
+        with admission("background"):
+            shed = asyncio.ensure_future(_call(limiter))
+        await asyncio.sleep(0)
+        urgent = asyncio.ensure_future(_call(limiter))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded, match="Shed"):
+            await shed
+        # A call no more urgent than those waiting is rejected itself
+        with admission("background"), pytest.raises(Overloaded, match="Queue full"):
+            await _call(limiter)
+        hold.set()
+        await asyncio.gather(first, urgent)
+        return limiter
+
+    assert asyncio.run(run()).stats.rejected == 2
+
+
+def test_calls_are_rejected_once_their_deadline_passes():
+    async def run():
+        limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+        with admission(deadline=time.monotonic() - 1):
+            with pytest.raises(Overloaded, match="before the call was sent"):
+                await _call(limiter)
+        hold = asyncio.Event()
+        first = asyncio.ensure_future(_call(limiter, hold=hold))
+        await asyncio.sleep(0)
+        with admission(deadline=time.monotonic() + 0.05):
+            with pytest.raises(Overloaded, match="while waiting"):
+                await _call(limiter)
+        hold.set()
+        await first
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.in_flight == 0
+    assert limiter.waiting == 0
+
+
+def test_nested_admission_keeps_the_least_urgent_priority_and_first_deadline():
+    with admission("background", deadline=10.0):
+        with admission("interactive", deadline=20.0):
+            assert _admission.get() == ("background", 10.0)
+    with pytest.raises(ValueError, match="Unknown priority"):
+        with admission("urgent"):
+            pass
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from src.clients.balancer import LoadBalancer
+from src.clients.cache import ResponseCache
+from src.clients.ollama_client import AsyncOllamaClient
+from src.devtools.fake_ollama import FakeOllama, FakeOllamaConfig, Rule
+
+# Replies are only cached for deterministic options
+OPTIONS = {"temperature": 0}
+
+
+@pytest.fixture
+def fake_config():
+    rules = [
+        Rule(pattern="complete", response='{"content": "a whole object"}'),
+        Rule(pattern="truncated", response='{"content": "cut off befo'),
+    ]
+    return FakeOllamaConfig(rules=rules)
+
+
+def _generate_json_twice(server, prompt):
+    async def run():
+        client = AsyncOllamaClient(base_url=server.base_url, cache=ResponseCache())
+        first = await client.generate_json("fake", prompt, options=OPTIONS)
+        second = await client.generate_json("fake", prompt, options=OPTIONS)
+        return first, second
+
+    return asyncio.run(run())
+
+
+def test_complete_json_reply_is_cached(server):
+    first, second = _generate_json_twice(server, "complete")
+    assert first == second == {"content": "a whole object"}
+    assert server.stats.requests["/api/generate"] == 1
+
+
+def test_truncated_json_reply_is_recovered_but_not_cached(server):
+    first, second = _generate_json_twice(server, "truncated")
+    assert first == second == {"content": "cut off befo"}
+    assert server.stats.requests["/api/generate"] == 2
+
+
+def test_any_server_error_moves_the_call_to_another_node():
+    broken = FakeOllamaConfig(failure_rate=1.0, failure_status=500)
+    with FakeOllama(broken) as bad, FakeOllama(FakeOllamaConfig()) as good:
+
+        async def run():
+            balancer = LoadBalancer([bad.base_url, good.base_url])
+            client = AsyncOllamaClient(balancer=balancer)
+            return await client.generate("fake", "hello")
+
+        assert asyncio.run(run())
+        assert bad.stats.requests["/api/generate"] == 1
+        assert good.stats.requests["/api/generate"] == 1
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+
+import pytest
+from rich.console import Console
+
+from src.agents.paradigms import ReActParadigm, ReWOOParadigm
+from src.agents.paradigms.base import BaseParadigm
+from src.agents.paradigms.react import Thought
+from src.clients.run_context import RunContext
+
+
+@pytest.mark.parametrize("paradigm_class", [ReActParadigm, ReWOOParadigm])
+def test_second_run_starts_with_an_empty_history(
+    make_paradigm, paradigm_class, tmp_path
+):
+    paradigm = make_paradigm(
+        paradigm_class, max_history=2, history_path=tmp_path / "spill.jsonl"
+    )
+    first = paradigm.run("first goal", max_steps=2, interactive=False)
+    second = paradigm.run("second goal", max_steps=2, interactive=False)
+    assert len(second.steps) == len(first.steps)
+    assert paradigm._build_context().count("Action:") == 2
+
+
+@pytest.mark.parametrize("answer, expected", [("", True), ("q", False)])
+def test_confirm_continue_reads_stdin_on_a_daemon_thread(monkeypatch, answer, expected):
+    daemon = []
+
+    def fake_input(prompt):
+        daemon.append(threading.current_thread().daemon)
+        return answer
+
+    monkeypatch.setattr("builtins.input", fake_input)
+    assert asyncio.run(BaseParadigm._confirm_continue()) is expected
+    assert daemon == [True]
+
+
+def test_confirm_continue_passes_on_input_errors(monkeypatch):
+    def fake_input(prompt):
+        raise EOFError
+
+    monkeypatch.setattr("builtins.input", fake_input)
+    with pytest.raises(EOFError):
+        asyncio.run(BaseParadigm._confirm_continue())
+
+
+def test_failed_summary_keeps_the_full_history(make_paradigm, monkeypatch):
+    paradigm = make_paradigm(summarize_at=20)
+
+    async def fail(prompt, phase):
+        raise ValueError("bad reply")
+
+    monkeypatch.setattr(paradigm, "_generate_text", fail)
+    lines = [f"Step {n}: " + "x" * 40 for n in range(6)]
+    for line in lines:
+        paradigm.context.append(line)
+    batch = paradigm.context.take_summary_batch()
+    assert batch is not None
+
+    asyncio.run(paradigm._summarize(*batch))
+    assert paradigm.context.render() == "\n".join(lines)
+    assert paradigm.context.take_summary_batch() is not None
+
+
+@pytest.mark.parametrize("paradigm_class", [ReActParadigm, ReWOOParadigm])
+def test_calls_refused_by_the_budget_are_not_counted(
+    server, make_paradigm, paradigm_class
+):
+    paradigm = make_paradigm(paradigm_class)
+    result = paradigm.run(
+        "goal", max_steps=10, interactive=False, run_context=RunContext(max_calls=4)
+    )
+    assert result.stopped == "calls"
+    assert result.llm_calls <= 4
+    assert server.stats.requests["/api/generate"] <= 4
+
+
+def test_action_fields_are_passed_on_as_they_close(make_paradigm):
+    fields = []
+    paradigm = make_paradigm()
+    paradigm._start_run("system", interactive=False)
+    action = asyncio.run(
+        paradigm.aact(
+            Thought(content="look it up"),
+            on_field=lambda field, value: fields.append((field, value)),
+        )
+    )
+    assert fields == [("name", action.name), ("args", action.args)]
+
+
+@pytest.mark.parametrize("fused", [False, True])
+def test_react_prints_each_streamed_field_once(make_paradigm, fused):
+    console = Console(record=True, width=200)
+    paradigm = make_paradigm(console=console, fused=fused)
+    paradigm.run("goal", max_steps=1, interactive=False)
+    output = console.export_text()
+    thought = "I think the next step is to look up the facts."
+    assert output.count(thought) == 1
+    assert output.index("Thought:") < output.index(thought)
+    assert output.index(thought) < output.index("Action:")
+    assert output.count("Name: search") == 1
+    assert output.count("Args: {'query': 'facts'}") == 1
@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+import pytest
+
+from src.agents.paradigms.react import Action, Thought
+from src.devtools.fake_ollama import FakeOllamaConfig, Rule
+
+THOUGHT = {"content": "I should search."}
+ACTION = {"name": "search", "args": {"query": "facts"}}
+
+
+@pytest.fixture
+def fake_config():
+    return FakeOllamaConfig(
+        rules=[
+            # Repairs of the fused reply ask for the missing action only
+            Rule(
+                pattern="only these fields, corrected: action",
+                response=json.dumps({"action": ACTION}),
+            ),
+            Rule(pattern="missing action", response=json.dumps({"thought": THOUGHT})),
+            Rule(
+                pattern='"thought"',
+                response=json.dumps({"thought": THOUGHT, "action": ACTION}),
+            ),
+            Rule(pattern="", response="Three documents were found."),
+        ]
+    )
+
+
+def test_fused_steps_take_two_calls(server, make_paradigm):
+    result = make_paradigm(fused=True).run("goal", max_steps=2, interactive=False)
+    assert result.llm_calls == server.stats.requests["/api/generate"] == 4
+    kinds = [step["type"] for step in result.steps]
+    assert kinds == ["thought", "action", "observation"] * 2
+
+
+def test_fused_reply_is_parsed_into_thought_and_action(make_paradigm):
+    paradigm = make_paradigm(fused=True)
+    paradigm._start_run("system", interactive=False)
+    thought, action = asyncio.run(paradigm.athink_act("goal"))
+    assert thought == Thought(**THOUGHT)
+    assert action == Action(**ACTION)
+
+
+def test_fused_reply_without_an_action_is_repaired(server, make_paradigm):
+    paradigm = make_paradigm(fused=True)
+    paradigm._start_run("system", interactive=False)
+    thought, action = asyncio.run(paradigm.athink_act("missing action"))
+    assert thought == Thought(**THOUGHT)
+    assert action == Action(**ACTION)
+    assert server.stats.requests["/api/generate"] == 2
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.clients.ollama_client import AsyncOllamaClient
+from src.clients.run_context import RunContext, RunStopped
+from src.devtools.fake_ollama import FakeOllamaConfig
+
+
+@pytest.fixture
+def fake_config():
+    # Every completion takes a while, so runs are stopped mid-call
+    return FakeOllamaConfig(ttft=2.0)
+
+
+def test_calls_are_capped_by_the_tokens_left():
+    run = RunContext(max_tokens=100)
+    assert run.begin_call() == 100
+    run.end_call({"eval_count": 60, "eval_duration": 3e9}, tokens=0, seconds=0)
+    assert run.begin_call() == 40
+    run.end_call(None, tokens=35, seconds=1.0)
+    with pytest.raises(RunStopped) as stopped:
+        run.begin_call()
+    assert stopped.value.reason == "tokens"
+    assert run.calls == 2
+
+
+def test_calls_are_capped_by_what_fits_before_the_deadline():
+    run = RunContext(timeout=10)
+    run.end_call({"eval_count": 10, "eval_duration": 1e9}, tokens=0, seconds=0)
+    assert run.token_rate == 10
+    assert 90 <= run.begin_call() <= 100
+    assert run.timeout(None) <= 10
+    assert run.timeout(1.0) == 1.0
+
+
+def test_call_budget_is_checked_before_sending():
+    run = RunContext(max_calls=1)
+    run.begin_call()
+    with pytest.raises(RunStopped) as stopped:
+        run.check()
+    assert stopped.value.reason == "calls"
+
+
+def _generate(server, run):
+    async def main():
+        client = AsyncOllamaClient(base_url=server.base_url)
+        with run.activate():
+            await client.generate("fake", "hello")
+
+    started = time.perf_counter()
+    with pytest.raises(RunStopped) as stopped:
+        asyncio.run(main())
+    return stopped.value.reason, time.perf_counter() - started
+
+
+def test_deadline_stops_a_call_in_flight(server):
+    reason, elapsed = _generate(server, RunContext(timeout=0.3))
+    assert reason == "deadline"
+    assert elapsed < 1.5
+
+
+def test_cancel_from_another_thread_stops_the_run(server):
+    run = RunContext()
+    threading.Timer(0.3, run.cancel).start()
+    reason, elapsed = _generate(server, run)
+    assert reason == "cancelled"
+    assert run.stopped == "cancelled"
+    assert elapsed < 1.5
+
+
+def test_run_cancelled_before_it_starts_sends_nothing(server):
+    run = RunContext()
+    run.cancel()
+    reason, _ = _generate(server, run)
+    assert reason == "cancelled"
+    assert "/api/generate" not in server.stats.requests
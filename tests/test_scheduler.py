@@ -0,0 +1,69 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import List
+
+import pytest
+
+from src.agents.paradigms.scheduler import DAGScheduler
+
+
+@dataclass
+class Step:
+    id: str
+    depends_on: List[str] = field(default_factory=list)
+
+
+def _collect(tasks, execute, **kwargs):
+    async def run():
+        scheduler = DAGScheduler(max_workers=4)
+        return [
+            (task.id, result)
+            async for task, result in scheduler.run(tasks, execute, **kwargs)
+        ]
+
+    return asyncio.run(run())
+
+
+def test_dependencies_get_the_results_they_wait_for():
+    async def execute(task, evidence):
+        return task.id + "".join(evidence[dep] for dep in task.depends_on)
+
+    results = _collect(
+        [Step("c", ["a", "b"]), Step("a"), Step("b", ["a"])],
+        execute,
+        done={"a": "A"},
+    )
+    assert results == [("b", "bA"), ("c", "cAbA")]
+
+
+def test_cycles_are_reported():
+    async def execute(task, evidence):
+        return task.id
+
+    with pytest.raises(ValueError, match="Circular"):
+        _collect([Step("a", ["b"]), Step("b", ["a"])], execute)
+
+
+def test_closing_the_iterator_early_cancels_running_tasks():
+    cancelled = []
+
+    async def execute(task, evidence):
+        if task.id == "fast":
+            return task.id
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(task.id)
+            raise
+
+    async def run():
+        scheduler = DAGScheduler(max_workers=4)
+        steps = [Step("fast"), Step("slow"), Step("slower")]
+        iterator = scheduler.run(steps, execute)
+        first = await anext(iterator)
+        await iterator.aclose()
+        return first
+
+    task, result = asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert (task.id, result) == ("fast", "fast")
+    assert sorted(cancelled) == ["slow", "slower"]
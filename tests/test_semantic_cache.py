@@ -0,0 +1,24 @@
+import time
+
+from src.clients.semantic_cache import SemanticCache, SemanticMatch, _normalize
+
+
+def _match(vector):
+    match = SemanticMatch("scope", "text")
+    match.vector = _normalize(vector)
+    return match
+
+
+def test_lookup_skips_every_expired_match():
+    cache = SemanticCache(threshold=0.5, max_age=60)
+    for value, vector in [("live", [1, 0.3]), ("old", [1, 0.1]), ("older", [1, 0])]:
+        cache._store(_match(vector), value)
+    index = cache._indexes["scope"]
+    for position, value in enumerate(index.values):
+        if value != "live":
+            index.created[position] = time.time() - 120
+
+    match = _match([1, 0])
+    cache._search(match)
+    assert match.value == "live"
+    assert index.values == ["live"]
@@ -0,0 +1,92 @@
+import pytest
+
+from src.clients.telemetry import CallMetrics, CallTimer, Telemetry, scope
+
+
+def _call(**fields):
+    return CallMetrics(model="fake", endpoint="/api/generate", **fields)
+
+
+def test_report_sums_calls_by_phase_and_step():
+    telemetry = Telemetry()
+    telemetry.record(
+        _call(
+            phase="think",
+            step="1",
+            wall_time=2.0,
+            load_duration=1.0,
+            prompt_eval_count=10,
+            prompt_eval_duration=0.25,
+            eval_count=20,
+            eval_duration=0.5,
+        )
+    )
+    # Closed early: split at the first token, tokens received count
+    telemetry.record(
+        _call(
+            phase="act",
+            step="1",
+            wall_time=1.0,
+            first_token_time=0.25,
+            tokens_received=6,
+            completed=False,
+        )
+    )
+    telemetry.record(_call(phase="think", step="2", wall_time=0.5, cached=True))
+
+    report = telemetry.report()
+    assert report.calls == 3
+    assert report.cached_calls == 1
+    assert report.wall_time == 3.5
+    assert report.load_time == 1.0
+    assert report.load_stalls == 1
+    assert report.prompt_eval_time == 0.5
+    assert report.eval_time == 1.25
+    assert report.eval_tokens == 26
+    assert report.tokens_per_second == 26 / 1.25
+    assert report.other_time == 0.75
+    assert set(report.phases) == {"think", "act"}
+    assert report.phases["think"].calls == 2
+    assert report.steps["1"].wall_time == 3.0
+
+
+def test_prometheus_output_has_counters_per_label_set():
+    telemetry = Telemetry()
+    telemetry.record(_call(paradigm="react", phase="think", wall_time=1.5))
+    telemetry.record(_call(paradigm="react", phase='say "hi"', wall_time=0.5))
+
+    lines = telemetry.to_prometheus().splitlines()
+    assert "# TYPE ollama_calls_total counter" in lines
+    assert (
+        'ollama_wall_seconds_total{paradigm="react",phase="think",model="fake"} 1.5'
+        in lines
+    )
+    assert (
+        'ollama_calls_total{paradigm="react",phase="say \\"hi\\"",model="fake"} 1'
+        in lines
+    )
+
+
+def test_calls_are_recorded_in_the_innermost_scope_with_its_tags():
+    outer, inner = Telemetry(), Telemetry()
+    with scope(outer, paradigm="react"):
+        with scope(inner, phase="think", step=3):
+            CallTimer("fake", "/api/generate").finish({"done": True})
+        CallTimer("fake", "/api/generate").finish(cached=True)
+    CallTimer("fake", "/api/generate").finish()
+
+    [call] = inner.calls
+    assert (call.paradigm, call.phase, call.step) == ("react", "think", "3")
+    assert call.completed
+    [cached] = outer.calls
+    assert cached.cached and cached.phase is None
+
+
+@pytest.mark.parametrize("response", [None, {"done": True, "eval_duration": 2e9}])
+def test_a_call_is_recorded_once(response):
+    telemetry = Telemetry()
+    with scope(telemetry):
+        timer = CallTimer("fake", "/api/generate")
+        timer.finish(response)
+        timer.finish()
+    assert len(telemetry.calls) == 1